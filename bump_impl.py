@@ -11,6 +11,7 @@ a hard error rather than a warning.
 
 Usage:
     python bump.py [--module-file MODULE.bazel]
+    python bump.py --workspace DIR [--workspace DIR ...] [--workspaces-file F]
 
 Run via Bazel:
     bazelisk run //:bump
@@ -18,12 +19,15 @@ Run via Bazel:
 
 import argparse
 import base64
+import concurrent.futures
 import hashlib
+import io
 import json
 import os
 import re
 import subprocess
 import sys
+import threading
 import urllib.error
 import urllib.request
 
@@ -49,6 +53,19 @@ class BumpError(RuntimeError):
     """
 
 
+# Batch mode bumps workspaces on threads; each sets ``stream`` so its
+# summary and warnings end up in its own section of the report.
+_thread_log = threading.local()
+
+
+def _say(msg):
+    print(msg, file=getattr(_thread_log, "stream", None) or sys.stdout)
+
+
+def _warn(msg):
+    print(f"WARNING: {msg}", file=getattr(_thread_log, "stream", None) or sys.stderr)
+
+
 def _expect(condition, description, ignore_errors=False):
     """Assert that ``condition`` is truthy, or fail (or warn under --ignore).
 
@@ -64,7 +81,7 @@ def _expect(condition, description, ignore_errors=False):
         return
     msg = f"Expected {description} in MODULE.bazel but found no match"
     if ignore_errors:
-        print(f"WARNING: {msg}", file=sys.stderr)
+        _warn(msg)
         return
     raise BumpError(msg)
 
@@ -311,12 +328,96 @@ def github_archive_strip_prefix(github_repo, commit):
     return f"{repo_basename}-{commit}"
 
 
-def compute_integrity(url):
-    """Download URL and return SRI integrity (``sha256-<base64>``).
+class _SingleFlight:
+    """Thread-safe memo: concurrent calls with the same key share one
+    computation (the first caller runs it inline, the others wait).
+    Failures are not remembered: callers already waiting get the
+    exception, later calls retry."""
 
-    Streams the response in chunks so the full archive (potentially tens of
-    MB for ORFS) never materializes in memory.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def call(self, key, fn, *args):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = concurrent.futures.Future()
+        if owner:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                with self._lock:
+                    del self._futures[key]
+                future.set_exception(e)
+        return future.result()
+
+
+class HttpCache:
+    """Persistent cache of GitHub API responses and archive digests.
+
+    One JSON file per URL under ``<cache_dir>/<kind>/``.  Responses for
+    URLs that name a full commit sha (``?ref=<sha>``, ``/archive/<sha>``,
+    ``/compare/<sha>...<sha>``) cannot change and are served without a
+    request; anything else (``commits/main``, BCR metadata) is revalidated
+    with its ``ETag``, which GitHub answers with a 304 that does not count
+    against the rate limit.  Unreadable entries are refetched and write
+    failures are ignored: the cache is only ever an optimization.
     """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, kind, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, kind, key + ".json")
+
+    def load(self, kind, url):
+        try:
+            with open(self._path(kind, url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def store(self, kind, url, entry):
+        path = self._path(kind, url)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(dict(entry, url=url), f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+_COMMIT_SHA_RE = re.compile(r"(?<![0-9a-f])[0-9a-f]{40}(?![0-9a-f])")
+
+# Set by main() (--cache-dir); None disables the on-disk cache.
+_http_cache = None
+_archive_digests = _SingleFlight()
+
+
+def set_http_cache(cache_dir):
+    """Use ``cache_dir`` for GitHub API and archive digest caching, or
+    disable the on-disk cache with None."""
+    global _http_cache
+    _http_cache = HttpCache(cache_dir) if cache_dir else None
+
+
+def _is_immutable(url):
+    """True if the URL pins every ref it names to a full commit sha."""
+    if not _COMMIT_SHA_RE.search(url):
+        return False
+    m = re.search(r"/compare/([^/]+)\.\.\.([^/?]+)", url)
+    if m:
+        return all(_COMMIT_SHA_RE.fullmatch(ref) for ref in m.groups())
+    return True
+
+
+def _download_sha256_hex(url):
     h = hashlib.sha256()
     with urllib.request.urlopen(url) as resp:
         while True:
@@ -324,23 +425,49 @@ def compute_integrity(url):
             if not chunk:
                 break
             h.update(chunk)
-    return "sha256-" + base64.b64encode(h.digest()).decode("ascii")
+    return h.hexdigest()
+
+
+def archive_sha256_hex(url):
+    """sha256 hex digest of the archive at URL, downloaded at most once.
+
+    Streams the response in chunks so the full archive (potentially tens of
+    MB for ORFS) never materializes in memory.  Concurrent and repeated
+    calls for one URL share a single download, and digests of archives
+    pinned to a commit sha are kept in the on-disk cache.
+    """
+
+    def compute():
+        cache = _http_cache
+        if cache is not None and _is_immutable(url):
+            entry = cache.load("archive", url)
+            if entry is not None:
+                return entry["sha256"]
+            digest = _download_sha256_hex(url)
+            cache.store("archive", url, {"sha256": digest})
+            return digest
+        return _download_sha256_hex(url)
+
+    return _archive_digests.call(url, compute)
+
+
+def compute_integrity(url):
+    """Download URL and return SRI integrity (``sha256-<base64>``).
+
+    Shares the download with ``compute_sha256_hex`` via
+    ``archive_sha256_hex``.
+    """
+    digest = bytes.fromhex(archive_sha256_hex(url))
+    return "sha256-" + base64.b64encode(digest).decode("ascii")
 
 
 def compute_sha256_hex(url):
     """Download URL and return sha256 hex digest.
 
     Hex (not SRI) so the value can be fed directly to ``sha256sum -c`` inside
-    a patch_cmds line.  Streams the same way ``compute_integrity`` does.
+    a patch_cmds line.  Shares the download with ``compute_integrity``.
     """
-    h = hashlib.sha256()
-    with urllib.request.urlopen(url) as resp:
-        while True:
-            chunk = resp.read(64 * 1024)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
+    return archive_sha256_hex(url)
 
 
 def fetch_submodule_sha(parent_repo, parent_commit, path):
@@ -1057,13 +1184,28 @@ def inject_non_bcr_deps(content, bazel_orfs_dir):
 
 
 def fetch_json(url):
-    """Fetch JSON from a URL."""
+    """Fetch JSON from a URL, through the on-disk cache if enabled."""
+    cache = _http_cache
+    entry = cache.load("json", url) if cache is not None else None
+    if entry is not None and _is_immutable(url):
+        return entry["body"]
     req = urllib.request.Request(url)
     github_token = os.environ.get("GITHUB_TOKEN")
     if github_token and "api.github.com" in url:
         req.add_header("Authorization", f"Bearer {github_token}")
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read())
+    if entry is not None and entry.get("etag"):
+        req.add_header("If-None-Match", entry["etag"])
+    try:
+        with urllib.request.urlopen(req) as resp:
+            body = json.loads(resp.read())
+            etag = resp.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry is not None:
+            return entry["body"]
+        raise
+    if cache is not None and (etag or _is_immutable(url)):
+        cache.store("json", url, {"etag": etag, "body": body})
+    return body
 
 
 def fetch_latest_commit(github_repo, branch):
@@ -1342,6 +1484,91 @@ def fetch_compare_status(repo, base, head):
     return fetch_json(url).get("status")
 
 
+class _Prefetcher:
+    """Runs lookups ahead of the sequential rewrite on a thread pool.
+
+    ``get(fn, *args)`` returns the (memoized) result of ``fn(*args)``;
+    ``start(fn, *args)`` begins computing it in the background so a later
+    ``get`` finds it done.  Waiting never deadlocks: a computation that has
+    not started yet is run inline by whoever asks for it first.
+    """
+
+    def __init__(self, jobs):
+        self._flight = _SingleFlight()
+        self._pool = concurrent.futures.ThreadPoolExecutor(jobs) if jobs > 1 else None
+
+    def get(self, fn, *args):
+        return self._flight.call((fn, args), fn, *args)
+
+    def start(self, fn, *args):
+        if self._pool is not None:
+            self._pool.submit(self.get, fn, *args)
+
+    def wrap(self, fn):
+        return lambda *args: self.get(fn, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _prefetch(pre, content, project, head_tools, fns):
+    """Start every lookup bump() is going to make, as early as its inputs
+    allow.  Only a speedup: bump() makes the same calls through
+    ``pre.get`` and computes whatever was not (or wrongly) predicted.
+    """
+    commit = fns["commit"]
+    if project != "bazel-orfs":
+        pre.start(commit, "The-OpenROAD-Project/bazel-orfs", "main")
+    if has_bazel_dep(content, "qt-bazel"):
+        pre.start(commit, "The-OpenROAD-Project/qt_bazel_prebuilts", "main")
+    if not has_bazel_dep(content, "orfs"):
+        return
+    pre.start(commit, ORFS_REPO, "master")
+    if has_bazel_dep(content, YOSYS_BCR_MODULE):
+        pre.start(fns["bcr_versions"], YOSYS_BCR_MODULE)
+
+    def orfs_commit():
+        return pre.get(commit, ORFS_REPO, "master")
+
+    def orfs_archive():
+        span = find_archive_override_block(content, "orfs")
+        if span is None:
+            return
+        url = github_archive_url(ORFS_REPO, orfs_commit())
+        if re.search(r'integrity\s*=\s*"', content[span[0] : span[1]]):
+            pre.get(fns["integrity"], url)
+        else:
+            pre.get(fns["sha256_hex"], url)
+
+    def yosys():
+        sha = pre.get(fns["orfs_tool_sha"], orfs_commit(), "yosys")
+        pre.get(fns["yosys_version"], sha)
+
+    def openroad_submodule(sha, path, github_repo):
+        sub_sha = pre.get(fns["submodule_sha"], OPENROAD_REPO, sha, path)
+        sub_url = f"https://github.com/{github_repo}/archive/{sub_sha}.tar.gz"
+        pre.get(fns["sha256_hex"], sub_url)
+
+    def openroad():
+        if "openroad" in head_tools:
+            sha = pre.get(commit, ORFS_TOOLS["OpenROAD"][1], "master")
+        else:
+            sha = pre.get(fns["orfs_tool_sha"], orfs_commit(), "OpenROAD")
+        for path, github_repo in OPENROAD_SUBMODULES:
+            pre.start(openroad_submodule, sha, path, github_repo)
+        pre.get(
+            fns["integrity"],
+            f"https://github.com/{OPENROAD_REPO}/archive/{sha}.tar.gz",
+        )
+
+    pre.start(orfs_archive)
+    if has_bazel_dep(content, YOSYS_BCR_MODULE):
+        pre.start(yosys)
+    if has_bazel_dep(content, "openroad"):
+        pre.start(openroad)
+
+
 def bump(
     module_file,
     fetch_commit_fn=fetch_latest_commit,
@@ -1355,6 +1582,8 @@ def bump(
     workspace_dir=None,
     head_tools=None,
     ignore_errors=False,
+    jobs=8,
+    prefetcher=None,
 ):
     """Main bump orchestrator.
 
@@ -1375,6 +1604,12 @@ def bump(
     (OpenROAD never bumps its own commit: the tools loop below only
     touches an ``openroad`` *bazel_dep*, which OpenROAD's own
     MODULE.bazel doesn't have.)
+
+    The lookups are independent of the rewrites, so with ``jobs`` > 1 they
+    are all started up front on a thread pool (see ``_prefetch``) and the
+    rewrite below just collects their results.  Passing one ``prefetcher``
+    to several bump() calls (``bump_workspaces``) makes them share every
+    lookup, so all workspaces move to the same upstream state.
     """
     if head_tools is None:
         head_tools = set()
@@ -1383,6 +1618,59 @@ def bump(
         content = f.read()
 
     project = detect_project(content)
+    pre = prefetcher or _Prefetcher(jobs)
+    try:
+        _prefetch(
+            pre,
+            content,
+            project,
+            head_tools,
+            {
+                "commit": fetch_commit_fn,
+                "integrity": fetch_integrity_fn,
+                "sha256_hex": fetch_sha256_hex_fn,
+                "orfs_tool_sha": fetch_orfs_tool_sha_fn,
+                "yosys_version": fetch_yosys_makefile_version_fn,
+                "bcr_versions": fetch_bcr_versions_fn,
+                "submodule_sha": fetch_submodule_sha_fn,
+            },
+        )
+        return _bump(
+            module_file,
+            content,
+            project,
+            fetch_commit_fn=pre.wrap(fetch_commit_fn),
+            fetch_integrity_fn=pre.wrap(fetch_integrity_fn),
+            fetch_orfs_tool_sha_fn=pre.wrap(fetch_orfs_tool_sha_fn),
+            fetch_yosys_makefile_version_fn=pre.wrap(fetch_yosys_makefile_version_fn),
+            fetch_bcr_versions_fn=pre.wrap(fetch_bcr_versions_fn),
+            fetch_sha256_hex_fn=pre.wrap(fetch_sha256_hex_fn),
+            fetch_submodule_sha_fn=pre.wrap(fetch_submodule_sha_fn),
+            workspace_dir=workspace_dir,
+            head_tools=head_tools,
+            ignore_errors=ignore_errors,
+        )
+    finally:
+        if prefetcher is None:
+            pre.shutdown()
+
+
+def _bump(
+    module_file,
+    content,
+    project,
+    fetch_commit_fn,
+    fetch_integrity_fn,
+    fetch_orfs_tool_sha_fn,
+    fetch_yosys_makefile_version_fn,
+    fetch_bcr_versions_fn,
+    fetch_sha256_hex_fn,
+    fetch_submodule_sha_fn,
+    workspace_dir,
+    head_tools,
+    ignore_errors,
+):
+    """The sequential MODULE.bazel rewrite behind ``bump``."""
     updated_modules = []
 
     # --- Locate bazel-orfs source (for reading overrides and copying patches) ---
@@ -1529,15 +1817,15 @@ def bump(
     # hard check via the `--check-yosys-abc` entrypoint.
     ok, msg = check_yosys_abc_pair(content)
     if not ok:
-        sys.stderr.write("WARNING: " + msg + "\n")
+        _warn(msg)
 
     with open(module_file, "w") as f:
         f.write(content)
 
     # --- Summary ---
-    print(f"Updated {module_file} ({project} project):")
+    _say(f"Updated {module_file} ({project} project):")
     for entry in updated_modules:
-        print(f"  {entry}")
+        _say(f"  {entry}")
 
     return content
 
@@ -1561,9 +1849,98 @@ def run_mod_tidy(workspace_dir):
         sys.exit(result.returncode)
 
 
+def bump_workspaces(
+    workspaces,
+    jobs=8,
+    head_tools=None,
+    ignore_errors=False,
+    mod_tidy=True,
+    **fetch_fns,
+):
+    """Bump several workspaces against one resolution of upstream state.
+
+    Every lookup (latest ORFS commit, tool submodule shas, archive
+    digests, ...) goes through one shared ``_Prefetcher``, so it is made
+    once no matter how many workspaces need it.  The MODULE.bazel
+    rewrites and ``bazelisk mod tidy`` runs then proceed on ``jobs``
+    threads.  ``fetch_fns`` are passed on to bump().  Returns
+    ``[(workspace, error or None, log text)]`` in input order; one
+    workspace failing does not stop the others.
+    """
+    pre = _Prefetcher(jobs)
+
+    def one(workspace):
+        _thread_log.stream = log = io.StringIO()
+        try:
+            bump(
+                os.path.join(workspace, "MODULE.bazel"),
+                workspace_dir=workspace,
+                head_tools=head_tools,
+                ignore_errors=ignore_errors,
+                prefetcher=pre,
+                **fetch_fns,
+            )
+            if mod_tidy:
+                result = subprocess.run(
+                    ["bazelisk", "mod", "tidy"],
+                    cwd=workspace,
+                    capture_output=True,
+                    text=True,
+                )
+                if result.returncode != 0:
+                    log.write(result.stdout + result.stderr)
+                    return (
+                        workspace,
+                        f"bazelisk mod tidy exited with {result.returncode}",
+                        log.getvalue(),
+                    )
+            return workspace, None, log.getvalue()
+        except Exception as e:
+            return workspace, f"{type(e).__name__}: {e}", log.getvalue()
+        finally:
+            _thread_log.stream = None
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max(1, jobs)) as pool:
+            return list(pool.map(one, workspaces))
+    finally:
+        pre.shutdown()
+
+
+def print_batch_report(results, out=sys.stdout):
+    """Consolidated report for ``bump_workspaces``; returns the number of
+    failed workspaces."""
+    failed = sum(1 for _, error, _ in results if error)
+    print(
+        f"\nBump report: {len(results) - failed} of {len(results)} "
+        "workspaces updated",
+        file=out,
+    )
+    for workspace, error, log in results:
+        print(f"{'FAILED' if error else 'OK':<7} {workspace}", file=out)
+        if error:
+            print(f"        {error}", file=out)
+        for line in log.splitlines():
+            print(f"        {line}", file=out)
+    return failed
+
+
+def read_workspaces_file(path):
+    """Workspace directories listed one per line; blank lines and
+    ``#`` comments are skipped."""
+    with open(path) as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
 _HEAD_TOOLS = {module_name for module_name, _ in ORFS_TOOLS.values()}
 
 
+def _default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "bazel-orfs", "bump")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Bump bazel-orfs and dependency versions"
@@ -1603,7 +1980,43 @@ def main():
         action="store_true",
         help="Only validate yosys/abc lockstep; don't modify MODULE.bazel.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=8,
+        help="Concurrent GitHub/BCR lookups and archive downloads.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("BUMP_CACHE_DIR", _default_cache_dir()),
+        help=(
+            "On-disk cache of GitHub API responses and archive digests "
+            "(default: $BUMP_CACHE_DIR or ~/.cache/bazel-orfs/bump)."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the on-disk cache.",
+    )
+    parser.add_argument(
+        "--workspace",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help=(
+            "Batch mode: bump DIR/MODULE.bazel. Repeatable; upstream state "
+            "is resolved once and the workspaces are rewritten and "
+            "mod-tidied in parallel (--jobs)."
+        ),
+    )
+    parser.add_argument(
+        "--workspaces-file",
+        metavar="FILE",
+        help="Batch mode: workspace directories, one per line.",
+    )
     args = parser.parse_args()
+    set_http_cache(None if args.no_cache else args.cache_dir)
 
     if args.check_yosys_abc:
         with open(args.module_file) as f:
@@ -1615,12 +2028,28 @@ def main():
             sys.stderr.write(msg + "\n")
         return
 
+    workspaces = list(args.workspace)
+    if args.workspaces_file:
+        workspaces += read_workspaces_file(args.workspaces_file)
+    if workspaces:
+        base = os.environ.get("BUILD_WORKSPACE_DIRECTORY", ".")
+        results = bump_workspaces(
+            [os.path.join(base, w) for w in workspaces],
+            jobs=args.jobs,
+            head_tools=set(args.head),
+            ignore_errors=args.ignore,
+        )
+        if print_batch_report(results):
+            sys.exit(1)
+        return
+
     workspace = os.environ.get("BUILD_WORKSPACE_DIRECTORY", ".")
     bump(
         args.module_file,
         workspace_dir=workspace,
         head_tools=set(args.head),
         ignore_errors=args.ignore,
+        jobs=args.jobs,
     )
     run_mod_tidy(workspace)
 
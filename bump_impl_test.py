@@ -1,3 +1,13 @@
+import contextlib
+import hashlib
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 import bump_impl
 
@@ -86,5 +96,215 @@ class TestUpdateOpenroadArchiveOverride(unittest.TestCase):
         strip_idx = new_content.find('strip_prefix = "OpenROAD-67890"')
         self.assertLess(trailing_idx, strip_idx)
 
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+ARCHIVE = b"not really a tarball" * 100
+
+
+class _StandIn(http.server.BaseHTTPRequestHandler):
+    """Local stand-in for github.com / api.github.com."""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path.startswith("/archive/"):
+            self._send(200, ARCHIVE)
+        elif self.path == "/repos/x/commits/main":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, b"")
+            else:
+                self._send(200, json.dumps({"sha": SHA}).encode(), '"v1"')
+        elif self.path == f"/repos/x/contents/sub?ref={SHA}":
+            body = {"type": "submodule", "sha": "f" * 40}
+            self._send(200, json.dumps(body).encode())
+        else:
+            self._send(404, b"")
+
+    def _send(self, code, body, etag=None):
+        self.send_response(code)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        bump_impl.set_http_cache(self.cache_dir)
+        self.addCleanup(bump_impl.set_http_cache, None)
+        bump_impl._archive_digests = bump_impl._SingleFlight()
+        _StandIn.requests.clear()
+
+    def test_one_download_for_both_digests(self):
+        url = f"{self.base}/archive/{SHA}.tar.gz"
+        digest = hashlib.sha256(ARCHIVE).digest()
+        self.assertEqual(bump_impl.compute_sha256_hex(url), digest.hex())
+        self.assertEqual(
+            bump_impl.compute_integrity(url),
+            "sha256-" + bump_impl.base64.b64encode(digest).decode(),
+        )
+        self.assertEqual(len(_StandIn.requests), 1)
+
+        # A new process (fresh memo) reads the digest from disk.
+        bump_impl._archive_digests = bump_impl._SingleFlight()
+        self.assertEqual(bump_impl.compute_sha256_hex(url), digest.hex())
+        self.assertEqual(len(_StandIn.requests), 1)
+
+    def test_failed_download_is_retried(self):
+        url = f"{self.base}/archive/{SHA}.tar.gz"
+        real = bump_impl._download_sha256_hex
+        calls = []
+
+        def flaky(u):
+            calls.append(u)
+            if len(calls) == 1:
+                raise OSError("connection reset")
+            return real(u)
+
+        bump_impl._download_sha256_hex = flaky
+        try:
+            with self.assertRaisesRegex(OSError, "connection reset"):
+                bump_impl.compute_sha256_hex(url)
+            self.assertEqual(
+                bump_impl.compute_sha256_hex(url), hashlib.sha256(ARCHIVE).hexdigest()
+            )
+        finally:
+            bump_impl._download_sha256_hex = real
+        self.assertEqual(len(calls), 2)
+
+    def test_json_immutable_and_revalidated(self):
+        pinned = f"{self.base}/repos/x/contents/sub?ref={SHA}"
+        moving = f"{self.base}/repos/x/commits/main"
+        for _ in range(2):
+            self.assertEqual(bump_impl.fetch_json(pinned)["sha"], "f" * 40)
+            self.assertEqual(bump_impl.fetch_json(moving)["sha"], SHA)
+        # The pinned URL is asked for once; the moving one is revalidated
+        # (answered with a 304 the second time).
+        self.assertEqual(_StandIn.requests.count(f"/repos/x/contents/sub?ref={SHA}"), 1)
+        self.assertEqual(_StandIn.requests.count("/repos/x/commits/main"), 2)
+
+    def test_no_cache(self):
+        bump_impl.set_http_cache(None)
+        url = f"{self.base}/repos/x/commits/main"
+        bump_impl.fetch_json(url)
+        bump_impl.fetch_json(url)
+        self.assertEqual(len(_StandIn.requests), 2)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_immutable_urls(self):
+        self.assertTrue(bump_impl._is_immutable(f"https://x/archive/{SHA}.tar.gz"))
+        self.assertFalse(bump_impl._is_immutable("https://x/commits/main"))
+        self.assertFalse(bump_impl._is_immutable(f"https://x/compare/{SHA}...main"))
+        self.assertTrue(bump_impl._is_immutable(f"https://x/compare/{SHA}...{SHA}"))
+
+
+class _FakeFetches:
+    """Deterministic, slightly slow stand-ins for bump()'s lookups."""
+
+    def _fakes(self, calls):
+        lock = threading.Lock()
+
+        def fake(name, result):
+            def fn(*args):
+                time.sleep(0.01)
+                with lock:
+                    calls.append((name, args))
+                return result(*args)
+
+            return fn
+
+        def sha(*args):
+            return hashlib.sha1(repr(args).encode()).hexdigest()
+
+        return dict(
+            fetch_commit_fn=fake("commit", sha),
+            fetch_integrity_fn=fake("integrity", lambda u: "sha256-" + sha(u)),
+            fetch_sha256_hex_fn=fake("hex", lambda u: sha(u) + "0" * 24),
+            fetch_orfs_tool_sha_fn=fake("tool", sha),
+            fetch_yosys_makefile_version_fn=fake("yosys", lambda s: (0, 64)),
+            fetch_bcr_versions_fn=fake("bcr", lambda m: ["0.62", "0.64"]),
+            fetch_submodule_sha_fn=fake("submodule", sha),
+        )
+
+    def _bump(self, jobs):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        module = os.path.join(tmp, "MODULE.bazel")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "MODULE.bazel"), module)
+        calls = []
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+            io.StringIO()
+        ):
+            content = bump_impl.bump(module, jobs=jobs, **self._fakes(calls))
+        return content, calls
+
+
+class TestConcurrentBump(_FakeFetches, unittest.TestCase):
+    """bump() with prefetching gives the same MODULE.bazel as a serial run
+    and makes each lookup exactly once."""
+
+    def test_matches_serial(self):
+        serial, serial_calls = self._bump(jobs=1)
+        parallel, parallel_calls = self._bump(jobs=8)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(sorted(parallel_calls), sorted(set(serial_calls)))
+        self.assertEqual(len(parallel_calls), len(set(parallel_calls)))
+        self.assertIn(("bcr", ("yosys",)), parallel_calls)
+
+
+class TestBumpWorkspaces(_FakeFetches, unittest.TestCase):
+    def test_upstream_resolved_once(self):
+        serial, _ = self._bump(jobs=1)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        workspaces = [os.path.join(tmp, name) for name in ("a", "b", "missing")]
+        for ws in workspaces[:2]:
+            os.makedirs(ws)
+            shutil.copy(
+                os.path.join(os.path.dirname(__file__), "MODULE.bazel"),
+                os.path.join(ws, "MODULE.bazel"),
+            )
+        calls = []
+        results = bump_impl.bump_workspaces(
+            workspaces, jobs=4, mod_tidy=False, **self._fakes(calls)
+        )
+        self.assertEqual(len(calls), len(set(calls)))
+        self.assertEqual([r[0] for r in results], workspaces)
+        for ws, error, log in results[:2]:
+            self.assertIsNone(error)
+            self.assertIn("Updated", log)
+            with open(os.path.join(ws, "MODULE.bazel")) as f:
+                self.assertEqual(f.read(), serial)
+        self.assertIn("FileNotFoundError", results[2][1])
+
+        out = io.StringIO()
+        self.assertEqual(bump_impl.print_batch_report(results, out), 1)
+        self.assertIn("2 of 3 workspaces updated", out.getvalue())
+        self.assertIn("FAILED  " + workspaces[2], out.getvalue())
+
+    def test_read_workspaces_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("# downstream repos\n../a\n\n../b  # tapeout\n")
+            f.flush()
+            self.assertEqual(bump_impl.read_workspaces_file(f.name), ["../a", "../b"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,10 +8,13 @@ import os
 import tempfile
 import textwrap
 import unittest
+import unittest.mock
 from pathlib import Path
 
+import config_mk_parser
 from config_mk_parser import (
     ConfigMkParser,
+    FsCache,
     ParsedDesign,
     Warning,
     _join_continuation_lines,
@@ -19,6 +22,7 @@ from config_mk_parser import (
     discover_configs,
     generate_orfs_flow,
     lint_report,
+    parse_configs,
 )
 
 # Path to the real flow/designs directory (for integration tests)
@@ -1297,5 +1301,184 @@ class TestDiscoverConfigs(unittest.TestCase):
             self.assertNotIn("/src/", c.split("designs/")[1])
 
 
+class TestIncludeCache(unittest.TestCase):
+    """Included files are compiled once per parser and replayed."""
+
+    def setUp(self):
+        self.parser = ConfigMkParser()
+        tmpdir = tempfile.mkdtemp()
+        self.base_dir = os.path.join(tmpdir, "flow/designs/asap7/parent")
+        os.makedirs(self.base_dir)
+        self.config = os.path.join(self.base_dir, "config.mk")
+        Path(self.config).write_text(
+            "export DESIGN_NAME = parent\nexport BLOCKS = b1 b2 b3\n"
+        )
+        self.block_mk = os.path.join(self.base_dir, "block.mk")
+        Path(self.block_mk).write_text(
+            "export CORE_UTILIZATION ?= 30\n"
+            "ifeq ($(FLOW_VARIANT),x)\n"
+            "export ONLY_X = 1\n"
+            "endif\n"
+        )
+
+    def _compiles(self):
+        compiled = []
+        real = config_mk_parser._compile_ops
+
+        def counting(lines):
+            compiled.append(lines)
+            return real(lines)
+
+        return compiled, unittest.mock.patch.object(
+            config_mk_parser, "_compile_ops", counting
+        )
+
+    def test_shared_block_mk_compiled_once(self):
+        compiled, patch = self._compiles()
+        with patch:
+            result = self.parser.parse(self.config)
+            self.parser.parse(self.config)
+        # parent config.mk + block.mk, despite 3 blocks x 2 parses.
+        self.assertEqual(len(compiled), 2)
+        for block in result.block_configs:
+            self.assertEqual(block.arguments["CORE_UTILIZATION"], "30")
+            self.assertTrue(block.has_conditionals)
+            self.assertEqual(
+                [w.category for w in block.warnings], ["deprecated", "info"]
+            )
+
+    def test_changed_file_recompiled(self):
+        self.parser.parse(self.config)
+        Path(self.block_mk).write_text("export CORE_UTILIZATION ?= 45\n")
+        st = os.stat(self.block_mk)
+        os.utime(self.block_mk, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        result = self.parser.parse(self.config)
+        self.assertEqual(result.block_configs[0].arguments["CORE_UTILIZATION"], "45")
+        self.assertFalse(result.block_configs[0].has_conditionals)
+
+
+class TestFsCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmpdir, "a/b"))
+        Path(self.tmpdir, "a/f.mk").write_text("")
+        os.symlink("missing", os.path.join(self.tmpdir, "a/dangling"))
+
+    def test_matches_os_path_exists(self):
+        fs = FsCache()
+        for rel in [
+            "a",
+            "a/b",
+            "a/f.mk",
+            "a/nope",
+            "a/dangling",
+            "a/b/../f.mk",
+            "x/y/z",
+            "a/f.mk/child",
+        ]:
+            path = os.path.join(self.tmpdir, rel)
+            self.assertEqual(fs.exists(path), os.path.exists(path), rel)
+
+    def test_each_directory_listed_once(self):
+        fs = FsCache()
+        for name in ["f.mk", "nope", "b", "f.mk"]:
+            fs.exists(os.path.join(self.tmpdir, "a", name))
+        self.assertEqual(fs.calls, 1)
+        self.assertEqual(fs.avoided, 4)
+        path = os.path.join(self.tmpdir, "a/f.mk")
+        self.assertEqual(fs.stat(path), fs.stat(path))
+        self.assertEqual((fs.calls, fs.avoided), (2, 5))
+
+
+class TestParseConfigs(unittest.TestCase):
+    """Parallel and cached parsing of many config.mk files."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.designs = os.path.join(self.tmpdir, "flow/designs")
+        self.shared = os.path.join(self.designs, "src/shared/defaults.mk")
+        self.cache = os.path.join(self.tmpdir, "cache")
+        os.makedirs(os.path.dirname(self.shared))
+        Path(self.shared).write_text("export CORE_UTILIZATION ?= 40\n")
+        for i in range(4):
+            block_dir = os.path.join(self.designs, f"asap7/d{i}/blk")
+            os.makedirs(block_dir)
+            Path(block_dir, "..", "config.mk").write_text(
+                f"export DESIGN_NAME = top{i}\n"
+                "export BLOCKS = blk\n"
+                "include designs/src/shared/defaults.mk\n"
+            )
+            Path(block_dir, "config.mk").write_text("export DESIGN_NAME = blk\n")
+        self.configs = discover_configs(self.designs)
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def _dicts(self, **kwargs):
+        return [r.to_dict() for r in parse_configs(self.configs, **kwargs)]
+
+    def test_parallel_matches_serial(self):
+        serial = [ConfigMkParser().parse(c).to_dict() for c in self.configs]
+        self.assertEqual(self._dicts(jobs=3), serial)
+        self.assertEqual(
+            [d["design_name"] for d in serial], [f"top{i}" for i in range(4)]
+        )
+        self.assertEqual(serial[0]["arguments"]["CORE_UTILIZATION"], "40")
+
+    def test_cache_reused_until_include_changes(self):
+        first = self._dicts(jobs=1, cache_dir=self.cache)
+        self.assertEqual(len(os.listdir(self.cache)), 4)
+
+        calls = []
+        real_parse = ConfigMkParser.parse
+
+        def counting_parse(parser, config_path, *args, **kwargs):
+            calls.append(config_path)
+            return real_parse(parser, config_path, *args, **kwargs)
+
+        with unittest.mock.patch.object(ConfigMkParser, "parse", counting_parse):
+            self.assertEqual(self._dicts(jobs=1, cache_dir=self.cache), first)
+            self.assertEqual(calls, [])
+
+            Path(self.configs[2]).parent.joinpath("blk/config.mk").write_text(
+                "export DESIGN_NAME = blk2\n"
+            )
+            changed = self._dicts(jobs=1, cache_dir=self.cache)
+            self.assertEqual(changed[2]["block_configs"][0]["design_name"], "blk2")
+            self.assertEqual(changed[:2], first[:2])
+            self.assertEqual(calls[0], self.configs[2])
+
+            calls.clear()
+            Path(self.shared).write_text("export CORE_UTILIZATION ?= 55\n")
+            changed = self._dicts(jobs=1, cache_dir=self.cache)
+            self.assertEqual(
+                [d["arguments"]["CORE_UTILIZATION"] for d in changed], ["55"] * 4
+            )
+
+    def test_new_block_config_invalidates(self):
+        """A file that was probed but absent counts as a dependency."""
+        Path(self.designs, "asap7/d0/blk/config.mk").unlink()
+        first = self._dicts(jobs=1, cache_dir=self.cache)
+        self.assertEqual(first[0]["block_configs"], [])
+        Path(self.designs, "asap7/d0/block.mk").write_text("export X = 1\n")
+        again = self._dicts(jobs=1, cache_dir=self.cache)
+        self.assertEqual(len(again[0]["block_configs"]), 1)
+
+    def test_fs_stats_reported(self):
+        stats = {}
+        parse_configs(self.configs, jobs=2, stats=stats)
+        self.assertGreater(stats["fs_calls"], 0)
+        self.assertGreater(stats["fs_calls_avoided"], 0)
+
+    def test_from_dict_round_trip(self):
+        for parsed in parse_configs(self.configs, jobs=1):
+            self.assertEqual(
+                ParsedDesign.from_dict(parsed.to_dict()).to_dict(), parsed.to_dict()
+            )
+            self.assertIsInstance(parsed.warnings[0], Warning)
+
+
 if __name__ == "__main__":
     unittest.main()
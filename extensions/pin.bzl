@@ -9,11 +9,47 @@ def _attrs(content):
         "url": url,
     }
 
+def _pinned_files_impl(repository_ctx):
+    """Downloads every file of a manifest lock file by its sha256.
+
+    Blobs are content addressed, so files unchanged since the previous pin
+    come straight from the repository cache.
+    """
+    manifest = json.decode(repository_ctx.read(repository_ctx.attr.artifacts_lock))
+    if manifest.get("version") != 2:
+        fail("{}: unsupported lock file version {}".format(
+            repository_ctx.attr.artifacts_lock,
+            manifest.get("version"),
+        ))
+    repository_ctx.file("REPO.bazel", "")
+    for path, blob in manifest["files"].items():
+        repository_ctx.download(
+            url = blob["url"],
+            output = path,
+            sha256 = blob["sha256"],
+            executable = blob["executable"],
+        )
+
+_pinned_files = repository_rule(
+    implementation = _pinned_files_impl,
+    attrs = {
+        "artifacts_lock": attr.label(mandatory = True),
+    },
+)
+
 def _pin_impl(repository_ctx):
     for mod in repository_ctx.modules:
         for install in mod.tags.artifacts:
             content = repository_ctx.read(install.artifacts_lock)
-            http_archive(name = install.repo_name, **_attrs(content))
+            if content.lstrip().startswith("{"):
+                _pinned_files(
+                    name = install.repo_name,
+                    artifacts_lock = install.artifacts_lock,
+                )
+            else:
+                # Lock files from before content-addressed pinning: one
+                # tarball, "url@sha256".
+                http_archive(name = install.repo_name, **_attrs(content))
 
 pin = module_extension(
     implementation = _pin_impl,
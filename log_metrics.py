@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Per-stage resource metrics from ORFS logs, kept in a SQLite database.
+
+ORFS ends every stage log with a /usr/bin/time summary:
+
+    Elapsed time: 0:04.26[h:]min:sec. CPU time: user 4.08 sys 0.17 (99%). \
+    Peak memory: 671508KB.
+
+and prints "Took N seconds: <step>" for timed substeps. OpenROAD also
+logs how many threads it used. parse_log() extracts all of these;
+monitor_test.py uses it instead of its own line parser.
+
+`record` appends one run (one build) of every stage log under the given
+log directories to the database; `regressions` compares the latest run
+against an older one, e.g. to size remote-execution worker pools or to
+catch "3_3_place_gp peak memory grew 30% since last week".
+
+Usage:
+    log_metrics.py record --db metrics.db [--label NAME] <log_dir>...
+    log_metrics.py regressions --db metrics.db [--metric peak_rss_kb]
+        [--since 7d] [--threshold 30] [--stage S] [--design D]
+    log_metrics.py history --db metrics.db --stage S [--design D]
+        [--metric elapsed_s]
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+_ELAPSED_RE = re.compile(r"Elapsed time: ([\d:.]+)")
+_CPU_RE = re.compile(r"CPU time: user ([\d.]+) sys ([\d.]+)")
+_PEAK_RE = re.compile(r"Peak memory: (\d+)KB")
+TOOK_RE = re.compile(r"Took (\d+) seconds:[ \t]*(.*)")
+_THREADS_RE = re.compile(r"Using (\d+) thread")
+
+METRICS = ("elapsed_s", "cpu_user_s", "cpu_sys_s", "peak_rss_kb", "threads")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    label TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    design TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    substep TEXT NOT NULL DEFAULT '',
+    elapsed_s REAL,
+    cpu_user_s REAL,
+    cpu_sys_s REAL,
+    peak_rss_kb INTEGER,
+    threads INTEGER
+);
+CREATE INDEX IF NOT EXISTS metrics_key ON metrics(stage, design, substep);
+"""
+
+
+@dataclass
+class StepMetrics:
+    """Resource use of one stage (substep "") or one timed substep."""
+
+    design: str
+    stage: str
+    substep: str = ""
+    elapsed_s: float | None = None
+    cpu_user_s: float | None = None
+    cpu_sys_s: float | None = None
+    peak_rss_kb: int | None = None
+    threads: int | None = None
+
+
+def parse_elapsed(text):
+    """Seconds from a /usr/bin/time elapsed value: [h:]m:s[.frac]."""
+    parts = text.rstrip(".").split(":")
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"elapsed time not understood: {text!r}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_log(path, design="", stage=None):
+    """Return [stage metrics, substep metrics...] for one ORFS log.
+
+    The stage row sums the Elapsed/CPU times of every time summary in the
+    log and takes the largest peak memory and thread count; substep rows
+    carry only elapsed_s, from "Took N seconds: <step>" lines (the step
+    name is the text after the colon).
+    """
+    if stage is None:
+        stage = Path(path).name.split(".", 1)[0]
+    total = StepMetrics(design, stage)
+    substeps = []
+    with open(path, errors="replace") as f:
+        for line in f:
+            if "Elapsed time" in line:
+                m = _ELAPSED_RE.search(line)
+                if m:
+                    try:
+                        elapsed = parse_elapsed(m.group(1))
+                    except ValueError:
+                        print("Elapsed time not understood in", line, file=sys.stderr)
+                    else:
+                        total.elapsed_s = (total.elapsed_s or 0.0) + elapsed
+                m = _CPU_RE.search(line)
+                if m:
+                    total.cpu_user_s = (total.cpu_user_s or 0.0) + float(m.group(1))
+                    total.cpu_sys_s = (total.cpu_sys_s or 0.0) + float(m.group(2))
+                m = _PEAK_RE.search(line)
+                if m:
+                    total.peak_rss_kb = max(total.peak_rss_kb or 0, int(m.group(1)))
+            elif "Took" in line:
+                m = TOOK_RE.search(line)
+                if m:
+                    substeps.append(
+                        StepMetrics(
+                            design,
+                            stage,
+                            m.group(2).strip() or "unnamed",
+                            elapsed_s=float(m.group(1)),
+                        )
+                    )
+            elif "thread" in line:
+                m = _THREADS_RE.search(line)
+                if m:
+                    total.threads = max(total.threads or 0, int(m.group(1)))
+    return [total] + substeps
+
+
+def scan_log_dir(log_dir):
+    """parse_log() every finished stage log (*.log, not *.tmp.log) under
+    log_dir; design is the log's directory relative to log_dir."""
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return
+    for log_file in sorted(log_dir.rglob("*.log")):
+        if ".tmp." in log_file.name:
+            continue
+        design = str(log_file.relative_to(log_dir).parent)
+        yield from parse_log(log_file, design, log_file.stem)
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record_run(conn, steps, label="", recorded_at=None):
+    """Append one run with the given StepMetrics; returns the run id."""
+    with conn:
+        run_id = conn.execute(
+            "INSERT INTO runs (recorded_at, label) VALUES (?, ?)",
+            (time.time() if recorded_at is None else recorded_at, label),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO metrics (run_id, design, stage, substep, "
+            + ", ".join(METRICS)
+            + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, s.design, s.stage, s.substep)
+                + tuple(getattr(s, m) for m in METRICS)
+                for s in steps
+            ],
+        )
+    return run_id
+
+
+def _run_before(conn, when, latest):
+    """Id of the newest run other than latest recorded at or before when,
+    else the oldest run; None if latest is the only run."""
+    row = conn.execute(
+        "SELECT id FROM runs WHERE recorded_at <= ? AND id != ? "
+        "ORDER BY recorded_at DESC, id DESC LIMIT 1",
+        (when, latest),
+    ).fetchone()
+    if row is None:
+        row = conn.execute(
+            "SELECT id FROM runs WHERE id != ? ORDER BY recorded_at, id LIMIT 1",
+            (latest,),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _filters(stage, design):
+    clauses, params = [], []
+    if stage:
+        clauses.append("stage = ?")
+        params.append(stage)
+    if design:
+        clauses.append("design = ?")
+        params.append(design)
+    return "".join(f" AND {c}" for c in clauses), params
+
+
+def _values(conn, run_id, metric, stage=None, design=None):
+    where, params = _filters(stage, design)
+    rows = conn.execute(
+        f"SELECT design, stage, substep, {metric} FROM metrics "
+        f"WHERE run_id = ? AND {metric} IS NOT NULL{where}",
+        [run_id] + params,
+    )
+    return {(d, st, sub): v for d, st, sub, v in rows}
+
+
+def find_regressions(
+    conn, metric="peak_rss_kb", since=7 * 86400, threshold=30.0, **filters
+):
+    """Compare the latest run with the run in effect `since` seconds ago.
+
+    Returns [(design, stage, substep, old, new, percent)] for every entry
+    whose metric grew by at least threshold percent, worst first.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r}; one of {', '.join(METRICS)}")
+    latest = conn.execute(
+        "SELECT id, recorded_at FROM runs " "ORDER BY recorded_at DESC, id DESC LIMIT 1"
+    ).fetchone()
+    if latest is None:
+        return []
+    baseline = _run_before(conn, latest[1] - since, latest[0])
+    if baseline is None:
+        return []
+    old = _values(conn, baseline, metric, **filters)
+    new = _values(conn, latest[0], metric, **filters)
+    found = []
+    for key in sorted(old.keys() & new.keys()):
+        if old[key] <= 0:
+            continue
+        percent = (new[key] - old[key]) * 100.0 / old[key]
+        if percent >= threshold:
+            found.append(key + (old[key], new[key], percent))
+    found.sort(key=lambda r: -r[-1])
+    return found
+
+
+def history(conn, stage, metric="elapsed_s", design=None, substep=""):
+    """[(recorded_at, label, design, value)] for one stage, oldest first."""
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r}; one of {', '.join(METRICS)}")
+    where, params = _filters(stage, design)
+    return conn.execute(
+        f"SELECT r.recorded_at, r.label, m.design, m.{metric} FROM metrics m "
+        f"JOIN runs r ON r.id = m.run_id WHERE m.substep = ?{where} "
+        f"AND m.{metric} IS NOT NULL ORDER BY r.recorded_at, r.id, m.design",
+        [substep] + params,
+    ).fetchall()
+
+
+def parse_age(text):
+    """Seconds from "90s", "30m", "12h", "7d" or "2w"."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhdw])", text.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(f"bad age {text!r} (e.g. 7d, 12h)")
+    unit = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}[m.group(2)]
+    return float(m.group(1)) * unit
+
+
+def format_metric(metric, value):
+    if metric == "peak_rss_kb":
+        return f"{value / 1024:.0f}MB"
+    if metric.endswith("_s"):
+        return f"{value:.1f}s"
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="append one run of stage metrics")
+    rec.add_argument("--db", required=True)
+    rec.add_argument("--label", default="", help="e.g. a git revision")
+    rec.add_argument("log_dirs", nargs="+")
+
+    reg = sub.add_parser("regressions", help="latest run vs an older one")
+    reg.add_argument("--db", required=True)
+    reg.add_argument("--metric", default="peak_rss_kb", choices=METRICS)
+    reg.add_argument("--since", type=parse_age, default=parse_age("7d"))
+    reg.add_argument("--threshold", type=float, default=30.0, help="percent")
+    reg.add_argument("--stage")
+    reg.add_argument("--design")
+
+    hist = sub.add_parser("history", help="one stage's metric over time")
+    hist.add_argument("--db", required=True)
+    hist.add_argument("--stage", required=True)
+    hist.add_argument("--design")
+    hist.add_argument("--substep", default="")
+    hist.add_argument("--metric", default="elapsed_s", choices=METRICS)
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    if args.command == "record":
+        steps = [s for d in args.log_dirs for s in scan_log_dir(d)]
+        run_id = record_run(conn, steps, args.label)
+        print(f"Recorded run {run_id}: {len(steps)} entries into {args.db}")
+        return 0
+
+    if args.command == "regressions":
+        found = find_regressions(
+            conn,
+            args.metric,
+            args.since,
+            args.threshold,
+            stage=args.stage,
+            design=args.design,
+        )
+        for design, stage, substep, old, new, percent in found:
+            step = f"{stage} ({substep})" if substep else stage
+            print(
+                f"{design} {step}: {args.metric} grew {percent:.0f}% "
+                f"({format_metric(args.metric, old)} -> "
+                f"{format_metric(args.metric, new)})"
+            )
+        if not found:
+            print("No regressions.")
+        return 1 if found else 0
+
+    for recorded_at, label, design, value in history(
+        conn, args.stage, args.metric, args.design, args.substep
+    ):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(recorded_at))
+        print(
+            f"{when}  {label:<12s}  {design:<40s}  {format_metric(args.metric, value)}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Unit tests for log_metrics.py."""
+
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import log_metrics
+from log_metrics import (
+    StepMetrics,
+    connect,
+    find_regressions,
+    history,
+    parse_age,
+    parse_elapsed,
+    parse_log,
+    record_run,
+    scan_log_dir,
+)
+
+PLACE_LOG = (
+    "OpenROAD v2.0\n"
+    "[INFO GPL-0001] Using 8 thread(s)\n"
+    "Took 201 seconds: global_placement -density 0.2\n"
+    "Elapsed time: 1:02:03.50[h:]min:sec. CPU time: user 3500.25 sys 12.50 "
+    "(95%). Peak memory: 671508KB.\n"
+)
+
+
+class TestParseLog(unittest.TestCase):
+    def test_parse_elapsed(self):
+        self.assertEqual(parse_elapsed("0:04.26"), 4.26)
+        self.assertEqual(parse_elapsed("1:02:03"), 3723)
+        with self.assertRaises(ValueError):
+            parse_elapsed("42")
+
+    def test_stage_and_substeps(self):
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "3_3_place_gp.log"
+            path.write_text(PLACE_LOG)
+            stage, substep = parse_log(path, "asap7/gcd/base")
+        self.assertEqual(
+            stage,
+            StepMetrics(
+                "asap7/gcd/base",
+                "3_3_place_gp",
+                elapsed_s=3723.5,
+                cpu_user_s=3500.25,
+                cpu_sys_s=12.5,
+                peak_rss_kb=671508,
+                threads=8,
+            ),
+        )
+        self.assertEqual(substep.substep, "global_placement -density 0.2")
+        self.assertEqual(substep.elapsed_s, 201)
+        self.assertIsNone(substep.peak_rss_kb)
+
+    def test_several_summaries(self):
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "2_1_floorplan.log"
+            path.write_text(
+                "Elapsed time: 0:10.00[h:]min:sec. CPU time: user 9.00 sys 1.00 "
+                "(99%). Peak memory: 1000KB.\n"
+                "Elapsed time: 0:05.00[h:]min:sec. CPU time: user 4.00 sys 0.50 "
+                "(90%). Peak memory: 3000KB.\n"
+            )
+            (stage,) = parse_log(path)
+        self.assertEqual(stage.stage, "2_1_floorplan")
+        self.assertEqual(stage.elapsed_s, 15)
+        self.assertEqual(stage.cpu_user_s, 13)
+        self.assertEqual(stage.peak_rss_kb, 3000)
+        self.assertIsNone(stage.threads)
+
+    def test_scan_skips_tmp_logs(self):
+        with TemporaryDirectory() as tmpdir:
+            log_dir = Path(tmpdir) / "asap7" / "gcd" / "base"
+            log_dir.mkdir(parents=True)
+            (log_dir / "3_3_place_gp.log").write_text(PLACE_LOG)
+            (log_dir / "3_4_place_resized.tmp.log").write_text(PLACE_LOG)
+            steps = list(scan_log_dir(tmpdir))
+        self.assertEqual(
+            [(s.design, s.stage, s.substep) for s in steps],
+            [
+                ("asap7/gcd/base", "3_3_place_gp", ""),
+                ("asap7/gcd/base", "3_3_place_gp", "global_placement -density 0.2"),
+            ],
+        )
+        self.assertEqual(list(scan_log_dir("/nonexistent/path")), [])
+
+
+def _stage(stage, peak, elapsed=10.0, design="asap7/gcd/base"):
+    return StepMetrics(design, stage, elapsed_s=elapsed, peak_rss_kb=peak)
+
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.conn = connect(":memory:")
+        day = 86400
+        record_run(
+            self.conn,
+            [_stage("3_3_place_gp", 1000), _stage("5_2_route", 4000)],
+            "old",
+            recorded_at=1 * day,
+        )
+        record_run(
+            self.conn,
+            [_stage("3_3_place_gp", 1100), _stage("5_2_route", 4000)],
+            "mid",
+            recorded_at=5 * day,
+        )
+        record_run(
+            self.conn,
+            [_stage("3_3_place_gp", 1400), _stage("5_2_route", 4100, elapsed=30)],
+            "new",
+            recorded_at=9 * day,
+        )
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_regression_since_last_week(self):
+        found = find_regressions(self.conn, "peak_rss_kb", since=7 * 86400)
+        self.assertEqual(
+            found, [("asap7/gcd/base", "3_3_place_gp", "", 1000, 1400, 40.0)]
+        )
+
+    def test_shorter_window_and_filters(self):
+        self.assertEqual(find_regressions(self.conn, since=3 * 86400), [])
+        found = find_regressions(
+            self.conn, "elapsed_s", since=3 * 86400, stage="5_2_route"
+        )
+        self.assertEqual([r[1] for r in found], ["5_2_route"])
+        self.assertEqual(
+            find_regressions(self.conn, since=7 * 86400, design="other"), []
+        )
+
+    def test_single_run_has_no_baseline(self):
+        conn = connect(":memory:")
+        record_run(conn, [_stage("3_3_place_gp", 1000)])
+        self.assertEqual(find_regressions(conn, since=0), [])
+        self.assertEqual(find_regressions(connect(":memory:")), [])
+
+    def test_history(self):
+        rows = history(self.conn, "3_3_place_gp", "peak_rss_kb")
+        self.assertEqual(
+            [(r[1], r[3]) for r in rows], [("old", 1000), ("mid", 1100), ("new", 1400)]
+        )
+        with self.assertRaises(ValueError):
+            history(self.conn, "3_3_place_gp", "area")
+
+    def test_parse_age(self):
+        self.assertEqual(parse_age("7d"), 7 * 86400)
+        self.assertEqual(parse_age("12h"), 12 * 3600)
+
+
+class TestMain(unittest.TestCase):
+    def test_record_then_query(self):
+        with TemporaryDirectory() as tmpdir:
+            log_dir = Path(tmpdir) / "logs" / "asap7" / "gcd" / "base"
+            log_dir.mkdir(parents=True)
+            (log_dir / "3_3_place_gp.log").write_text(PLACE_LOG)
+            db = os.path.join(tmpdir, "metrics.db")
+            logs = str(Path(tmpdir) / "logs")
+
+            out = io.StringIO()
+            with redirect_stdout(out):
+                self.assertEqual(log_metrics.main(["record", "--db", db, logs]), 0)
+                (log_dir / "3_3_place_gp.log").write_text(
+                    PLACE_LOG.replace("671508KB", "999999KB")
+                )
+                log_metrics.main(["record", "--db", db, "--label", "r2", logs])
+                code = log_metrics.main(["regressions", "--db", db, "--since", "0s"])
+            self.assertEqual(code, 1)
+            self.assertIn("Recorded run 1: 2 entries", out.getvalue())
+            self.assertIn(
+                "asap7/gcd/base 3_3_place_gp: peak_rss_kb grew 49% (656MB -> 977MB)",
+                out.getvalue(),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -102,7 +102,23 @@ def _create_fallback_outputs(state):
             )
 
 
-def main(argv=None):
+def make_interpreter():
+    """Create a TclInterpreter with all mock OpenROAD commands registered."""
+    setup_module_path()
+    from tcl_interpreter import TclInterpreter
+    import openroad_commands
+
+    interp = TclInterpreter()
+    openroad_commands.register_all(interp)
+    return interp
+
+
+def main(argv=None, interp=None):
+    """Run mock OpenROAD.
+
+    interp, if given, is a pre-built interpreter from make_interpreter()
+    (used by openroad_server.py, which hands each request a forked copy).
+    """
     if argv is None:
         argv = sys.argv[1:]
 
@@ -116,12 +132,10 @@ def main(argv=None):
             print("Usage: openroad [-version] [-exit] [script.tcl ...]")
             return 0
 
-    setup_module_path()
-    from tcl_interpreter import TclInterpreter
+    if interp is None:
+        interp = make_interpreter()
     import openroad_commands
 
-    interp = TclInterpreter()
-    openroad_commands.register_all(interp)
     openroad_commands.reset_state()
 
     # Load design name from environment
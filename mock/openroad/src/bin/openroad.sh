@@ -1,11 +1,15 @@
 #!/bin/sh
 # Mock openroad binary — delegates to Python implementation.
+# With MOCK_OPENROAD_SOCKET set, runs through a persistent
+# openroad_server.py instead (see openroad_client.py).
 dir="$(cd "$(dirname "$0")" && pwd)"
+main=openroad.py
+[ -n "$MOCK_OPENROAD_SOCKET" ] && main=openroad_client.py
 for py in \
-    "$dir/openroad.py" \
-    "$dir/openroad.runfiles"/*/mock/openroad/src/bin/openroad.py \
+    "$dir/$main" \
+    "$dir/openroad.runfiles"/*/mock/openroad/src/bin/$main \
 ; do
     [ -f "$py" ] && exec python3 "$py" "$@"
 done
-echo "error: cannot find openroad.py" >&2
+echo "error: cannot find $main" >&2
 exit 1
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Thin mock OpenROAD front end for openroad_server.py.
+
+openroad.sh runs this instead of openroad.py when MOCK_OPENROAD_SOCKET
+is set. It forwards argv, environment, working directory, umask and
+stdio to the server and exits with the server's exit code. If the
+server is not reachable it runs openroad.py in-process, so a stale
+MOCK_OPENROAD_SOCKET only costs the normal startup time.
+
+Only the standard library modules needed to talk to the socket are
+imported on the fast path.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+_HEADER = struct.Struct(">Q")
+
+
+def _recv_line(conn):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def run_remote(socket_path, argv):
+    """Run argv on the server. Returns the exit code, or None if the
+    server could not be reached."""
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except OSError:
+        conn.close()
+        return None
+    with conn:
+        umask = os.umask(0)
+        os.umask(umask)
+        payload = json.dumps(
+            {
+                "argv": argv,
+                "env": dict(os.environ),
+                "cwd": os.getcwd(),
+                "umask": umask,
+            }
+        ).encode()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(conn, [_HEADER.pack(len(payload))], [0, 1, 2])
+        conn.sendall(payload)
+        reply = _recv_line(conn)
+    if not reply:
+        print("mock-openroad: server closed connection", file=sys.stderr)
+        return 1
+    return json.loads(reply)["exit"]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    socket_path = os.environ.get("MOCK_OPENROAD_SOCKET", "")
+    if socket_path:
+        code = run_remote(socket_path, argv)
+        if code is not None:
+            return code
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import openroad
+
+    return openroad.main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Persistent mock OpenROAD server (opt-in).
+
+Every mock stage normally starts openroad.py in a fresh Python process,
+which re-imports the mock, re-registers every command and re-parses the
+ORFS Tcl scripts. This server pays for that once: it builds an
+interpreter, pre-parses the given Tcl scripts into the shared parse
+cache, then listens on a Unix socket. openroad_client.py is the thin
+front end that openroad.sh execs when MOCK_OPENROAD_SOCKET is set.
+
+Each request is handled in a forked child, so it sees a private copy of
+the warmed interpreter and of the mock design state, runs with the
+client's argv, environment, working directory and umask, and writes
+straight to the client's stdin/stdout/stderr (passed over the socket).
+Nothing a request does is visible to the next one.
+
+Protocol (one request per connection):
+  client -> server: 8-byte big-endian length with fds 0, 1, 2 attached
+                    (SCM_RIGHTS), then that many bytes of JSON
+                    {"argv": [...], "env": {...}, "cwd": ..., "umask": N}
+  server -> client: {"exit": <code>}\\n
+
+Usage:
+  openroad_server.py --socket <path> [--preload <file.tcl|dir>]...
+
+  bazel test //test/... \\
+      --test_env=MOCK_OPENROAD_SOCKET=<path> \\
+      --action_env=MOCK_OPENROAD_SOCKET=<path>
+
+The socket must be reachable from the sandbox (e.g. under /tmp).
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+import openroad
+
+_HEADER = struct.Struct(">Q")
+
+
+def recv_exact(conn, size):
+    """Read exactly size bytes from conn."""
+    chunks = []
+    while size:
+        chunk = conn.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def preload_scripts(interp, paths):
+    """Parse Tcl files (or every *.tcl under a directory) into the cache.
+
+    Nothing is evaluated; eval_file() of the same file content later
+    skips tokenization. Returns the number of files parsed.
+    """
+    count = 0
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+                if name.endswith(".tcl")
+            )
+        else:
+            files = [path]
+        for tcl in files:
+            with open(tcl) as f:
+                script = f.read()
+            try:
+                interp._compile_script(script)
+            except Exception as e:
+                print(f"mock-openroad-server: skip {tcl}: {e}", file=sys.stderr)
+                continue
+            count += 1
+    return count
+
+
+def handle_request(conn, interp):
+    """Run one request in the current (forked) process. Returns exit code."""
+    header, fds, _, _ = socket.recv_fds(conn, _HEADER.size, 3)
+    if len(header) < _HEADER.size:
+        header += recv_exact(conn, _HEADER.size - len(header))
+    (length,) = _HEADER.unpack(header)
+    request = json.loads(recv_exact(conn, length))
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    os.umask(request["umask"])
+
+    try:
+        code = openroad.main(request["argv"], interp=interp)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code or 0
+
+
+def serve(socket_path, preload=()):
+    """Warm an interpreter and serve requests on socket_path forever."""
+    interp = openroad.make_interpreter()
+    parsed = preload_scripts(interp, preload)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    # Children are never waited for; let the kernel reap them.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(
+        f"mock-openroad-server: listening on {socket_path} "
+        f"({parsed} scripts preloaded)",
+        flush=True,
+    )
+    try:
+        while True:
+            conn, _ = server.accept()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                code = 1
+                try:
+                    code = handle_request(conn, interp)
+                    conn.sendall(json.dumps({"exit": code}).encode() + b"\n")
+                finally:
+                    os._exit(code)
+            conn.close()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    ap.add_argument("--socket", required=True, help="Unix socket path")
+    ap.add_argument(
+        "--preload",
+        action="append",
+        default=[],
+        help="Tcl file, or directory of *.tcl files, to pre-parse",
+    )
+    args = ap.parse_args(argv)
+    serve(args.socket, args.preload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
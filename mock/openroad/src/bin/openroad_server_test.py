@@ -0,0 +1,128 @@
+"""Tests for the persistent mock OpenROAD server and its client."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BIN_DIR)
+from tcl_interpreter import TclInterpreter
+import openroad_server
+
+
+def _client(socket_path, args, cwd, **env):
+    full_env = dict(os.environ, MOCK_OPENROAD_SOCKET=socket_path, **env)
+    return subprocess.run(
+        [sys.executable, os.path.join(BIN_DIR, "openroad_client.py")] + args,
+        cwd=cwd,
+        env=full_env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+@pytest.fixture
+def workdir():
+    with tempfile.TemporaryDirectory() as d:
+        yield d
+
+
+@pytest.fixture
+def server(workdir):
+    socket_path = os.path.join(workdir, "openroad.sock")
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BIN_DIR, "openroad_server.py"),
+            "--socket",
+            socket_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + 30
+    while not os.path.exists(socket_path):
+        assert proc.poll() is None, proc.stderr.read()
+        assert time.time() < deadline, "server did not start"
+        time.sleep(0.05)
+    yield socket_path
+    proc.terminate()
+    proc.wait(timeout=10)
+    assert not os.path.exists(socket_path)
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+class TestServer:
+    def test_runs_script_with_client_env_and_stdio(self, server, workdir):
+        script = _write(
+            os.path.join(workdir, "stage.tcl"),
+            'puts "design $::env(DESIGN_NAME)"\n'
+            "write_db $::env(RESULTS_DIR)/2_floorplan.odb\n",
+        )
+        results = os.path.join(workdir, "results")
+        r = _client(server, [script], workdir, DESIGN_NAME="gcd", RESULTS_DIR=results)
+        assert r.returncode == 0, r.stderr
+        assert "design gcd" in r.stdout
+        assert os.path.exists(os.path.join(results, "2_floorplan.odb"))
+
+    def test_relative_paths_use_client_cwd(self, server, workdir):
+        sub = os.path.join(workdir, "sub")
+        os.makedirs(sub)
+        _write(os.path.join(sub, "rel.tcl"), "write_db out.odb\n")
+        r = _client(server, ["rel.tcl"], sub)
+        assert r.returncode == 0, r.stderr
+        assert os.path.exists(os.path.join(sub, "out.odb"))
+
+    def test_requests_are_isolated(self, server, workdir):
+        first = _write(
+            os.path.join(workdir, "a.tcl"),
+            "set ::leak 1\nproc leaked {} {}\nputs $::env(ONLY_FIRST)\n",
+        )
+        second = _write(
+            os.path.join(workdir, "b.tcl"),
+            "puts [info exists ::leak]\n"
+            "puts [info exists ::env(ONLY_FIRST)]\n"
+            "puts [llength [info procs leaked]]\n",
+        )
+        assert _client(server, [first], workdir, ONLY_FIRST="x").returncode == 0
+        r = _client(server, [second], workdir)
+        assert r.returncode == 0, r.stderr
+        assert r.stdout.split() == ["0", "0", "0"]
+
+    def test_flags_and_exit_code(self, server, workdir):
+        r = _client(server, ["-version"], workdir)
+        assert r.returncode == 0
+        assert "mock" in r.stdout
+
+
+class TestClientFallback:
+    def test_runs_in_process_without_server(self, workdir):
+        missing = os.path.join(workdir, "missing.sock")
+        r = _client(missing, ["-version"], workdir)
+        assert r.returncode == 0
+        assert "mock" in r.stdout
+
+
+class TestPreload:
+    def test_preload_fills_parse_cache(self, workdir):
+        tcl = _write(os.path.join(workdir, "util.tcl"), "proc f {} { return 1 }\n")
+        _write(os.path.join(workdir, "broken.tcl"), "set x {unclosed\n")
+        TclInterpreter._script_cache.clear()
+        interp = TclInterpreter()
+        assert openroad_server.preload_scripts(interp, [workdir]) == 1
+        with open(tcl) as f:
+            assert TclInterpreter._script_cache.get(f.read()) is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
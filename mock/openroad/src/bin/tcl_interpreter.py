@@ -13,6 +13,15 @@ import os
 import re
 import shlex
 import sys
+from collections import OrderedDict
+
+# Bounds for the shared parse caches. Scripts are whole files, proc
+# bodies and loop bodies; words are the unbraced words inside them;
+# exprs are distinct expr/if/while conditions. ORFS util.tcl + platform
+# scripts + a stage script stay well under these.
+SCRIPT_CACHE_SIZE = 2048
+WORD_CACHE_SIZE = 16384
+EXPR_CACHE_SIZE = 4096
 
 
 class TclError(Exception):
@@ -42,9 +51,488 @@ class TclContinue(Exception):
     """Control flow: continue in loop."""
 
 
+class _LRUCache:
+    """Small bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --- Expression compiler ---
+#
+# expr strings compile once (see TclInterpreter._compile_expr) into a
+# tree of closures taking the interpreter; $var, [cmd] and "..."
+# operands are substituted when the closure runs. Values are Python
+# int, float or str, with Tcl's rules for when a string is a number.
+
+_EXPR_NUMBER_RE = re.compile(
+    r"0[xX][0-9a-fA-F]+|0[oO][0-7]+|0[bB][01]+" r"|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+)
+_EXPR_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_EXPR_OPERATORS = (
+    "**",
+    "<<",
+    ">>",
+    "<=",
+    ">=",
+    "==",
+    "!=",
+    "&&",
+    "||",
+    "+",
+    "-",
+    "*",
+    "/",
+    "%",
+    "<",
+    ">",
+    "!",
+    "~",
+    "&",
+    "^",
+    "|",
+    "?",
+    ":",
+    "(",
+    ")",
+    ",",
+)
+_EXPR_WORD_OPERATORS = ("eq", "ne", "in", "ni")
+_INT_STRING_RE = re.compile(
+    r"\s*([+-]?)(?:0[xX]([0-9a-fA-F]+)|0[oO]([0-7]+)|0[bB]([01]+)|(\d+))\s*\Z"
+)
+_FLOAT_STRING_RE = re.compile(
+    r"\s*[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+    r"|[iI][nN][fF](?:[iI][nN][iI][tT][yY])?|[nN][aA][nN])\s*\Z"
+)
+_TRUE_STRINGS = frozenset(("1", "true", "yes", "on"))
+_FALSE_STRINGS = frozenset(("0", "false", "no", "off"))
+
+
+def _tcl_number(value):
+    """Return value as int or float if Tcl would read it as a number."""
+    if not isinstance(value, str):
+        return value
+    m = _INT_STRING_RE.match(value)
+    if m:
+        sign, hexa, octal, binary, dec = m.groups()
+        if hexa is not None:
+            n = int(hexa, 16)
+        elif octal is not None:
+            n = int(octal, 8)
+        elif binary is not None:
+            n = int(binary, 2)
+        else:
+            n = int(dec)
+        return -n if sign == "-" else n
+    if _FLOAT_STRING_RE.match(value):
+        return float(value)
+    return None
+
+
+def _format_number(value):
+    """Tcl string form of an expression result."""
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+def _numeric(value, op):
+    n = _tcl_number(value)
+    if n is None:
+        if value == "":
+            raise TclError(f'can\'t use empty string as operand of "{op}"')
+        raise TclError(f'can\'t use non-numeric string "{value}" as operand of "{op}"')
+    return n
+
+
+def _integer(value, op):
+    n = _numeric(value, op)
+    if isinstance(n, float):
+        raise TclError(f'can\'t use floating-point value as operand of "{op}"')
+    return n
+
+
+def _truth(value):
+    n = _tcl_number(value)
+    if n is not None:
+        return n != 0
+    s = value.strip().lower()
+    if s in _TRUE_STRINGS:
+        return True
+    if s in _FALSE_STRINGS:
+        return False
+    raise TclError(f'expected boolean value but got "{value}"')
+
+
+def _as_string(value):
+    return value if isinstance(value, str) else _format_number(value)
+
+
+def _divide(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        if b == 0:
+            raise TclError("divide by zero")
+        return a // b  # Tcl integer division floors, like Python
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            raise TclError("domain error: argument not in valid range")
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _modulo(a, b):
+    if b == 0:
+        raise TclError("divide by zero")
+    return a % b  # remainder takes the divisor's sign in Tcl and Python
+
+
+def _power(a, b):
+    if isinstance(a, int) and isinstance(b, int) and b < 0:
+        if a == 0:
+            raise TclError("exponentiation of zero by negative power")
+        if a in (1, -1):
+            return a ** (-b)
+        return 0
+    try:
+        return a**b
+    except (OverflowError, ZeroDivisionError) as e:
+        raise TclError(f"domain error: {e}")
+
+
+def _compare(op):
+    def compare(a, b):
+        na, nb = _tcl_number(a), _tcl_number(b)
+        if na is None or nb is None:
+            na, nb = _as_string(a), _as_string(b)
+        return 1 if op(na, nb) else 0
+
+    return compare
+
+
+# Binary operators by precedence level, lowest first (ternary, && and ||
+# are handled by the parser because they short-circuit).
+_BINARY_LEVELS = (
+    ("|",),
+    ("^",),
+    ("&",),
+    ("in", "ni"),
+    ("eq", "ne"),
+    ("==", "!="),
+    ("<", ">", "<=", ">="),
+    ("<<", ">>"),
+    ("+", "-"),
+    ("*", "/", "%"),
+)
+_BINARY_OPS = {
+    "|": lambda a, b: _integer(a, "|") | _integer(b, "|"),
+    "^": lambda a, b: _integer(a, "^") ^ _integer(b, "^"),
+    "&": lambda a, b: _integer(a, "&") & _integer(b, "&"),
+    "eq": lambda a, b: 1 if _as_string(a) == _as_string(b) else 0,
+    "ne": lambda a, b: 1 if _as_string(a) != _as_string(b) else 0,
+    "==": _compare(lambda a, b: a == b),
+    "!=": _compare(lambda a, b: a != b),
+    "<": _compare(lambda a, b: a < b),
+    ">": _compare(lambda a, b: a > b),
+    "<=": _compare(lambda a, b: a <= b),
+    ">=": _compare(lambda a, b: a >= b),
+    "<<": lambda a, b: _integer(a, "<<") << _integer(b, "<<"),
+    ">>": lambda a, b: _integer(a, ">>") >> _integer(b, ">>"),
+    "+": lambda a, b: _numeric(a, "+") + _numeric(b, "+"),
+    "-": lambda a, b: _numeric(a, "-") - _numeric(b, "-"),
+    "*": lambda a, b: _numeric(a, "*") * _numeric(b, "*"),
+    "/": lambda a, b: _divide(_numeric(a, "/"), _numeric(b, "/")),
+    "%": lambda a, b: _modulo(_integer(a, "%"), _integer(b, "%")),
+    "**": lambda a, b: _power(_numeric(a, "**"), _numeric(b, "**")),
+}
+_UNARY_OPS = {
+    "-": lambda a: -_numeric(a, "-"),
+    "+": lambda a: _numeric(a, "+"),
+    "~": lambda a: ~_integer(a, "~"),
+    "!": lambda a: 0 if _truth(a) else 1,
+}
+
+
+def _round(x):
+    x = _numeric(x, "round")
+    if isinstance(x, int):
+        return x
+    # Tcl rounds half away from zero, Python's round() to even.
+    return int(math.floor(abs(x) + 0.5)) * (1 if x >= 0 else -1)
+
+
+def _float_func(fn):
+    return lambda *args: float(fn(*(_numeric(a, "math function") for a in args)))
+
+
+_MATH_FUNCS = {
+    "abs": lambda x: abs(_numeric(x, "abs")),
+    "acos": _float_func(math.acos),
+    "asin": _float_func(math.asin),
+    "atan": _float_func(math.atan),
+    "atan2": _float_func(math.atan2),
+    "bool": lambda x: 1 if _truth(x) else 0,
+    "ceil": _float_func(math.ceil),
+    "cos": _float_func(math.cos),
+    "cosh": _float_func(math.cosh),
+    "double": _float_func(float),
+    "entier": lambda x: int(_numeric(x, "entier")),
+    "exp": _float_func(math.exp),
+    "floor": _float_func(math.floor),
+    "fmod": _float_func(math.fmod),
+    "hypot": _float_func(math.hypot),
+    "int": lambda x: int(_numeric(x, "int")),
+    "isqrt": lambda x: math.isqrt(int(_numeric(x, "isqrt"))),
+    "log": _float_func(math.log),
+    "log10": _float_func(math.log10),
+    "max": lambda *xs: max(_numeric(x, "max") for x in xs),
+    "min": lambda *xs: min(_numeric(x, "min") for x in xs),
+    "pow": _float_func(math.pow),
+    "round": _round,
+    "sin": _float_func(math.sin),
+    "sinh": _float_func(math.sinh),
+    "sqrt": _float_func(math.sqrt),
+    "tan": _float_func(math.tan),
+    "tanh": _float_func(math.tanh),
+    "wide": lambda x: int(_numeric(x, "wide")),
+}
+
+
+class _ExprParser:
+    """Precedence-climbing parser turning expr tokens into closures."""
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.pos = 0
+
+    def error(self, message):
+        return TclError(f'{message} in expression "{self.text}"')
+
+    def peek_op(self):
+        if self.pos < len(self.tokens) and self.tokens[self.pos][0] == "op":
+            return self.tokens[self.pos][1]
+        return None
+
+    def expect(self, op):
+        if self.peek_op() != op:
+            raise self.error(f'missing "{op}"')
+        self.pos += 1
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error("empty expression")
+        fn = self.ternary()
+        if self.pos != len(self.tokens):
+            raise self.error("syntax error")
+        return fn
+
+    def ternary(self):
+        cond = self.logical_or()
+        if self.peek_op() != "?":
+            return cond
+        self.pos += 1
+        then = self.ternary()
+        self.expect(":")
+        other = self.ternary()
+        return lambda interp: then(interp) if _truth(cond(interp)) else other(interp)
+
+    def logical_or(self):
+        left = self.logical_and()
+        while self.peek_op() == "||":
+            self.pos += 1
+            right = self.logical_and()
+            left = self._or(left, right)
+        return left
+
+    def logical_and(self):
+        left = self.binary(0)
+        while self.peek_op() == "&&":
+            self.pos += 1
+            right = self.binary(0)
+            left = self._and(left, right)
+        return left
+
+    @staticmethod
+    def _or(left, right):
+        return lambda interp: 1 if _truth(left(interp)) or _truth(right(interp)) else 0
+
+    @staticmethod
+    def _and(left, right):
+        return lambda interp: 1 if _truth(left(interp)) and _truth(right(interp)) else 0
+
+    def binary(self, level):
+        if level == len(_BINARY_LEVELS):
+            return self.power()
+        left = self.binary(level + 1)
+        while self.peek_op() in _BINARY_LEVELS[level]:
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            right = self.binary(level + 1)
+            if op in ("in", "ni"):
+                left = self._membership(op == "in", left, right)
+            else:
+                left = self._apply(_BINARY_OPS[op], left, right)
+        return left
+
+    @staticmethod
+    def _apply(fn, left, right):
+        return lambda interp: fn(left(interp), right(interp))
+
+    @staticmethod
+    def _membership(want, left, right):
+        def member(interp):
+            items = interp._parse_list(_as_string(right(interp)))
+            return 1 if (_as_string(left(interp)) in items) == want else 0
+
+        return member
+
+    def power(self):
+        base = self.unary()
+        if self.peek_op() != "**":
+            return base
+        self.pos += 1
+        # Right associative: 2**3**2 == 2**(3**2).
+        return self._apply(_BINARY_OPS["**"], base, self.power())
+
+    def unary(self):
+        op = self.peek_op()
+        if op in _UNARY_OPS:
+            self.pos += 1
+            operand = self.unary()
+            fn = _UNARY_OPS[op]
+            return lambda interp: fn(operand(interp))
+        return self.primary()
+
+    def primary(self):
+        if self.pos >= len(self.tokens):
+            raise self.error("missing operand")
+        kind, value = self.tokens[self.pos]
+        self.pos += 1
+        if kind == "value":
+            return lambda interp: value
+        if kind == "parts":
+            return lambda interp: interp._subst_parts(value)
+        if kind == "func":
+            return self.call(value)
+        if value == "(":
+            inner = self.ternary()
+            self.expect(")")
+            return inner
+        raise self.error(f'unexpected operator "{value}"')
+
+    def call(self, name):
+        fn = _MATH_FUNCS.get(name)
+        if fn is None:
+            raise self.error(f'unknown math function "{name}"')
+        self.expect("(")
+        args = []
+        if self.peek_op() != ")":
+            args.append(self.ternary())
+            while self.peek_op() == ",":
+                self.pos += 1
+                args.append(self.ternary())
+        self.expect(")")
+
+        def invoke(interp):
+            try:
+                return fn(*(arg(interp) for arg in args))
+            except TypeError:
+                raise TclError(f'wrong # args for math function "{name}"')
+            except (ValueError, OverflowError):
+                raise TclError("domain error: argument not in valid range")
+
+        return invoke
+
+
+# Compiled word kinds (first element of each compiled word tuple).
+_W_BRACED = 0  # (kind, text): used verbatim
+_W_SUBST = 1  # (kind, parts): substituted
+_W_EXPAND = 2  # (kind, parts): substituted, then expanded as a list ({*})
+
+# Substitution part kinds (first element of each part tuple).
+_P_LIT = 0  # (kind, text)
+_P_VAR = 1  # (kind, name)
+_P_ARRAY = 2  # (kind, name, key_parts)
+_P_ENV = 3  # (kind, key_parts)
+_P_CMD = 4  # (kind, script)
+_P_ERROR = 5  # (kind, message): raised when reached, like the old scanner
+
+
+class TclSnapshot:
+    """Interpreter state captured by TclInterpreter.snapshot().
+
+    Holds variables, arrays, procs and registered commands (namespace
+    variables live among the plain variables in this interpreter). The
+    values are strings, proc definitions and command callables, none of
+    which are mutated in place, so only the containing dicts are copied:
+    restore() is a handful of dict copies, not a re-evaluation. Open
+    channels and the source stack are not captured.
+    """
+
+    def __init__(self, interp):
+        self._cls = type(interp)
+        self.variables = dict(interp.variables)
+        self.arrays = {name: dict(elements) for name, elements in interp.arrays.items()}
+        self.procs = dict(interp.procs)
+        # Builtins are methods bound to interp; remember the function so
+        # restore() can bind it to the new interpreter instead.
+        self._commands = {
+            name: (
+                (True, func.__func__)
+                if getattr(func, "__self__", None) is interp
+                else (False, func)
+            )
+            for name, func in interp.commands.items()
+        }
+
+    def restore(self):
+        """Return a new, independent interpreter in the captured state."""
+        interp = self._cls.__new__(self._cls)
+        interp.variables = dict(self.variables)
+        interp.arrays = {name: dict(elements) for name, elements in self.arrays.items()}
+        interp.procs = dict(self.procs)
+        interp.commands = {
+            name: func.__get__(interp) if bound else func
+            for name, (bound, func) in self._commands.items()
+        }
+        interp._source_stack = []
+        return interp
+
+
 class TclInterpreter:
     """Minimal TCL interpreter for ORFS scripts."""
 
+    # Parsing is independent of interpreter state, so every interpreter
+    # shares one cache of compiled scripts (commands split into words,
+    # words split into substitution parts) and one of compiled words.
+    _script_cache = _LRUCache(SCRIPT_CACHE_SIZE)
+    _word_cache = _LRUCache(WORD_CACHE_SIZE)
+    _expr_cache = _LRUCache(EXPR_CACHE_SIZE)
+
     def __init__(self):
         self.variables = {}
         self.arrays = {}
@@ -100,31 +588,65 @@ class TclInterpreter:
             raise TclError(f'couldn\'t read file "{path}": {e}')
         return self.eval(script, source_file=path)
 
+    def snapshot(self):
+        """Capture the current state, e.g. after sourcing a shared prelude.
+
+        snapshot().restore() gives a fresh interpreter that starts where
+        this one is now, without re-evaluating anything.
+        """
+        return TclSnapshot(self)
+
+    def clone(self):
+        """Return an independent copy of this interpreter."""
+        return TclSnapshot(self).restore()
+
     # --- Script parsing ---
 
     def _eval_script(self, script):
         """Parse and evaluate a script (sequence of commands)."""
         result = ""
-        commands = self._parse_commands(script)
-        for word_infos in commands:
-            if not word_infos:
-                continue
+        for command in self._compile_script(script):
             # Substitute variables and nested commands, handle {*} expansion
-            # word_infos is list of (word, is_braced) tuples
             expanded = []
-            for w, is_braced in word_infos:
-                if w.startswith("{*}") and not is_braced:
-                    # {*} prefix: substitute the rest and expand as list
-                    rest = self._substitute(w[3:])
-                    expanded.extend(self._parse_list(rest))
-                elif is_braced:
+            for kind, payload in command:
+                if kind == _W_BRACED:
                     # Braced words: no substitution
-                    expanded.append(w)
+                    expanded.append(payload)
+                elif kind == _W_SUBST:
+                    expanded.append(self._subst_parts(payload))
                 else:
-                    expanded.append(self._substitute(w))
+                    # {*} prefix: substitute the rest and expand as list
+                    expanded.extend(self._parse_list(self._subst_parts(payload)))
             result = self._invoke(expanded)
         return result
 
+    def _compile_script(self, script):
+        """Return the compiled form of script, parsing it at most once.
+
+        A compiled script is a tuple of commands; each command is a
+        tuple of (kind, payload) words (see _W_*). Loop bodies, proc
+        bodies and re-sourced files hit the cache instead of being
+        re-tokenized on every evaluation.
+        """
+        compiled = self._script_cache.get(script)
+        if compiled is None:
+            compiled = tuple(
+                tuple(
+                    self._compile_command_word(w, is_braced) for w, is_braced in words
+                )
+                for words in self._parse_commands(script)
+                if words
+            )
+            self._script_cache.put(script, compiled)
+        return compiled
+
+    def _compile_command_word(self, word, is_braced):
+        if is_braced:
+            return (_W_BRACED, word)
+        if word.startswith("{*}"):
+            return (_W_EXPAND, self._compile_word(word[3:]))
+        return (_W_SUBST, self._compile_word(word))
+
     def _parse_commands(self, script):
         """Parse a script into a list of command word-lists.
 
@@ -308,52 +830,116 @@ class TclInterpreter:
 
     def _substitute(self, word):
         """Perform variable and command substitution on a word."""
+        return self._subst_parts(self._compile_word(word))
+
+    def _subst_parts(self, parts):
+        """Evaluate the substitution parts of a compiled word."""
+        if len(parts) == 1 and parts[0][0] == _P_LIT:
+            return parts[0][1]
         result = []
+        for part in parts:
+            kind = part[0]
+            if kind == _P_LIT:
+                result.append(part[1])
+            elif kind == _P_VAR:
+                result.append(self.get_var(part[1]))
+            elif kind == _P_ARRAY:
+                key = self._subst_parts(part[2])
+                result.append(self.get_array(part[1], key))
+            elif kind == _P_ENV:
+                result.append(os.environ.get(self._subst_parts(part[1]), ""))
+            elif kind == _P_CMD:
+                result.append(self._eval_script(part[1]))
+            else:
+                raise TclError(part[1])
+        return "".join(result)
+
+    def _compile_word(self, word):
+        """Split a word into substitution parts (see _P_*), cached.
+
+        Malformed substitutions compile to an error part so the error is
+        raised only if and when the word is substituted, after any parts
+        before it, exactly as a left-to-right scan would.
+        """
+        parts = self._word_cache.get(word)
+        if parts is None:
+            parts = self._scan_word(word)
+            self._word_cache.put(word, parts)
+        return parts
+
+    def _scan_word(self, word):
+        parts = []
+        literal = []
         i = 0
         n = len(word)
 
+        def flush():
+            if literal:
+                parts.append((_P_LIT, "".join(literal)))
+                literal.clear()
+
         while i < n:
             c = word[i]
 
             if c == "$":
-                val, i = self._subst_variable(word, i)
-                result.append(val)
+                part, i = self._scan_variable(word, i)
+                if part[0] == _P_LIT:
+                    literal.append(part[1])
+                    continue
+                flush()
+                parts.append(part)
+                if part[0] == _P_ERROR:
+                    break
             elif c == "[":
-                val, i = self._subst_command(word, i)
-                result.append(val)
+                part, i = self._scan_command(word, i)
+                flush()
+                parts.append(part)
+                if part[0] == _P_ERROR:
+                    break
             elif c == "\\":
                 if i + 1 < n:
                     escaped, i = self._parse_backslash(word, i)
-                    result.append(escaped)
+                    literal.append(escaped)
                 else:
-                    result.append("\\")
+                    literal.append("\\")
                     i += 1
             else:
-                result.append(c)
+                literal.append(c)
                 i += 1
 
-        return "".join(result)
+        flush()
+        if not parts:
+            parts.append((_P_LIT, ""))
+        return tuple(parts)
 
-    def _subst_variable(self, word, i):
-        """Substitute a variable starting with $ at position i."""
+    def _scan_variable(self, word, i):
+        """Compile a variable reference starting with $ at position i."""
         i += 1  # skip $
         n = len(word)
 
         if i >= n:
-            return "$", i
+            return (_P_LIT, "$"), i
 
         # ${varname} form
         if word[i] == "{":
-            end = word.index("}", i + 1) if "}" in word[i + 1 :] else -1
+            end = word.find("}", i + 1)
             if end == -1:
-                raise TclError("missing close-brace for variable name")
-            end = word.index("}", i + 1)
-            varname = word[i + 1 : end]
-            return self.get_var(varname), end + 1
+                return (_P_ERROR, "missing close-brace for variable name"), n
+            return (_P_VAR, word[i + 1 : end]), end + 1
 
         # $::env(NAME) or $::namespace::var
         if word[i : i + 2] == "::":
-            return self._subst_namespaced_var(word, i)
+            start = i
+            while i < n and (word[i].isalnum() or word[i] == "_" or word[i] == ":"):
+                i += 1
+            name = word[start:i]  # e.g., "::env"
+            if i < n and word[i] == "(":
+                key, i = self._scan_array_key(word, i)
+                if name == "::env":
+                    return (_P_ENV, key), i
+                return (_P_ARRAY, name.lstrip(":"), key), i
+            # Plain namespaced variable
+            return (_P_VAR, name.lstrip(":")), i
 
         # Regular variable name
         start = i
@@ -362,58 +948,31 @@ class TclInterpreter:
 
         varname = word[start:i]
         if not varname:
-            return "$", i
+            return (_P_LIT, "$"), i
 
         # Array element: $name(key)
         if i < n and word[i] == "(":
-            key_start = i + 1
-            depth = 1
-            i += 1
-            while i < n and depth > 0:
-                if word[i] == "(":
-                    depth += 1
-                elif word[i] == ")":
-                    depth -= 1
-                i += 1
-            key = self._substitute(word[key_start : i - 1])
-            return self.get_array(varname, key), i
+            key, i = self._scan_array_key(word, i)
+            return (_P_ARRAY, varname, key), i
 
-        return self.get_var(varname), i
+        return (_P_VAR, varname), i
 
-    def _subst_namespaced_var(self, word, i):
-        """Handle $::env(NAME) and $::namespace::var patterns."""
-        # Collect the full namespaced name
-        start = i
+    def _scan_array_key(self, word, i):
+        """Compile the (key) of an array reference; i points at '('."""
         n = len(word)
-
-        while i < n and (word[i].isalnum() or word[i] == "_" or word[i] == ":"):
-            i += 1
-
-        name = word[start:i]  # e.g., "::env"
-
-        # Array access: $::env(KEY)
-        if i < n and word[i] == "(":
-            key_start = i + 1
-            depth = 1
+        key_start = i + 1
+        depth = 1
+        i += 1
+        while i < n and depth > 0:
+            if word[i] == "(":
+                depth += 1
+            elif word[i] == ")":
+                depth -= 1
             i += 1
-            while i < n and depth > 0:
-                if word[i] == "(":
-                    depth += 1
-                elif word[i] == ")":
-                    depth -= 1
-                i += 1
-            key = self._substitute(word[key_start : i - 1])
-
-            if name == "::env":
-                val = os.environ.get(key, "")
-                return val, i
-            return self.get_array(name.lstrip(":"), key), i
+        return self._compile_word(word[key_start : i - 1]), i
 
-        # Plain namespaced variable
-        return self.get_var(name.lstrip(":")), i
-
-    def _subst_command(self, word, i):
-        """Substitute a [command] at position i."""
+    def _scan_command(self, word, i):
+        """Compile a [command] substitution at position i."""
         depth = 1
         i += 1  # skip [
         start = i
@@ -424,13 +983,11 @@ class TclInterpreter:
             elif word[i] == "]":
                 depth -= 1
                 if depth == 0:
-                    cmd_script = word[start:i]
-                    result = self._eval_script(cmd_script)
-                    return result, i + 1
+                    return (_P_CMD, word[start:i]), i + 1
             elif word[i] == "\\":
                 i += 1  # skip next char
             i += 1
-        raise TclError("missing close-bracket")
+        return (_P_ERROR, "missing close-bracket"), n
 
     # --- Command invocation ---
 
@@ -705,7 +1262,7 @@ class TclInterpreter:
 
     def _cmd_expr(self, interp, args):
         expr_str = " ".join(args)
-        return str(self._eval_expr(expr_str))
+        return _as_string(self._eval_expr(expr_str))
 
     def _cmd_return(self, interp, args):
         value = args[0] if args else ""
@@ -1583,78 +2140,89 @@ class TclInterpreter:
 
     def _eval_expr(self, expr_str):
         """Evaluate a TCL expression. Returns result as appropriate Python type."""
-        # First, substitute variables and commands
-        substituted = self._substitute(expr_str)
-
-        # Handle TCL boolean literals
-        s = substituted.strip()
-        if s.lower() in ("true", "yes", "on"):
-            return 1
-        if s.lower() in ("false", "no", "off"):
-            return 0
-
-        # Replace TCL operators with Python equivalents
-        s = re.sub(r"\beq\b", "==", s)
-        s = re.sub(r"\bne\b", "!=", s)
-        s = s.replace("&&", " and ")
-        s = s.replace("||", " or ")
-        s = s.replace("!", " not ")
-        # Fix double negation from ! replacement
-        s = s.replace(" not =", "!=")
-        # TCL integer division: use //
-        s = re.sub(r"(?<!\/)\/(?!\/)", "//", s)
-
-        # Handle TCL ternary: expr { cond ? a : b }
-        # Python eval handles this natively
-
-        # Handle double(x), int(x), etc.
-        s = re.sub(r"\bdouble\s*\(", "float(", s)
-        s = re.sub(r"\bround\s*\(", "round(", s)
-        s = re.sub(r"\babs\s*\(", "abs(", s)
-        s = re.sub(r"\bwide\s*\(", "int(", s)
-
-        # Handle ** power operator (TCL uses **)
-        # Python also uses **, so no change needed
-
-        # Handle string equality with quotes
-        try:
-            # Safe eval with math functions
-            result = eval(
-                s,
-                {"__builtins__": {}},
-                {
-                    "int": int,
-                    "float": float,
-                    "round": round,
-                    "abs": abs,
-                    "sqrt": math.sqrt,
-                    "pow": pow,
-                    "log": math.log,
-                    "log10": math.log10,
-                    "ceil": math.ceil,
-                    "floor": math.floor,
-                    "sin": math.sin,
-                    "cos": math.cos,
-                    "tan": math.tan,
-                    "max": max,
-                    "min": min,
-                    "True": 1,
-                    "False": 0,
-                },
-            )
-            if isinstance(result, bool):
-                return 1 if result else 0
-            if (
-                isinstance(result, float)
-                and result == int(result)
-                and "." not in s
-                and "e" not in s.lower()
-            ):
-                return int(result)
-            return result
-        except Exception:
-            # If eval fails, return as string
-            return s
+        return self._compile_expr(expr_str)(self)
+
+    def _compile_expr(self, expr_str):
+        """Return a closure evaluating expr_str, compiling it at most once.
+
+        Syntax errors raise TclError here and are not cached; operand
+        errors (non-numeric strings, divide by zero) raise when the
+        closure runs.
+        """
+        fn = self._expr_cache.get(expr_str)
+        if fn is None:
+            tokens = self._tokenize_expr(expr_str)
+            fn = _ExprParser(expr_str, tokens).parse()
+            self._expr_cache.put(expr_str, fn)
+        return fn
+
+    def _tokenize_expr(self, s):
+        """Split an expression into (kind, value) tokens.
+
+        Kinds: "value" (constant operand), "parts" (substituted operand,
+        compiled word parts), "op" (operator or punctuation) and "func"
+        (math function name).
+        """
+        tokens = []
+        i = 0
+        n = len(s)
+        while i < n:
+            c = s[i]
+            if c.isspace():
+                i += 1
+                continue
+            if c.isdigit() or (c == "." and i + 1 < n and s[i + 1].isdigit()):
+                m = _EXPR_NUMBER_RE.match(s, i)
+                tokens.append(("value", _tcl_number(m.group())))
+                i = m.end()
+            elif c == "$":
+                part, i = self._scan_variable(s, i)
+                if part[0] == _P_LIT:
+                    raise TclError(f'invalid character "$" in expression "{s}"')
+                if part[0] == _P_ERROR:
+                    raise TclError(part[1])
+                tokens.append(("parts", (part,)))
+            elif c == "[":
+                part, i = self._scan_command(s, i)
+                if part[0] == _P_ERROR:
+                    raise TclError(part[1])
+                tokens.append(("parts", (part,)))
+            elif c == '"':
+                word, i = self._parse_quoted(s, i)
+                parts = self._compile_word(word)
+                if len(parts) == 1 and parts[0][0] == _P_LIT:
+                    tokens.append(("value", parts[0][1]))
+                else:
+                    tokens.append(("parts", parts))
+            elif c == "{":
+                word, i = self._parse_braced(s, i)
+                tokens.append(("value", word))
+            elif c.isalpha() or c == "_":
+                m = _EXPR_IDENT_RE.match(s, i)
+                word = m.group()
+                i = m.end()
+                j = i
+                while j < n and s[j].isspace():
+                    j += 1
+                if word in _EXPR_WORD_OPERATORS:
+                    tokens.append(("op", word))
+                elif j < n and s[j] == "(":
+                    tokens.append(("func", word))
+                elif word.lower() in _TRUE_STRINGS or word.lower() in _FALSE_STRINGS:
+                    tokens.append(("value", word))
+                elif _FLOAT_STRING_RE.match(word):
+                    tokens.append(("value", float(word)))
+                else:
+                    raise TclError(f'invalid bareword "{word}" in expression "{s}"')
+            else:
+                for op in _EXPR_OPERATORS:
+                    if s.startswith(op, i):
+                        tokens.append(("op", op))
+                        i += len(op)
+                        break
+                else:
+                    raise TclError(f'invalid character "{c}" in expression "{s}"')
+        return tokens
 
     def _expr_bool(self, expr_str):
         """Evaluate an expression and return as boolean."""
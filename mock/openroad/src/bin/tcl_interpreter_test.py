@@ -225,6 +225,58 @@ class TestExpr:
         result = interp.eval("expr $x * 2")
         assert result == "20"
 
+    def test_string_comparison(self, interp):
+        interp.eval("set x foo")
+        assert interp.eval('expr {$x eq "foo"}') == "1"
+        assert interp.eval('expr {$x == "foo"}') == "1"
+        assert interp.eval('expr {$x ne "foo"}') == "0"
+        assert interp.eval('expr {$x < "goo"}') == "1"
+        assert interp.eval('if {$x eq "bar"} { set r 1 } else { set r 0 }') == "0"
+
+    def test_not_and_logic(self, interp):
+        interp.eval("set n 7")
+        assert interp.eval("expr {!($n > 3)}") == "0"
+        assert interp.eval("expr {$n != 7}") == "0"
+        assert interp.eval("expr {true && !false}") == "1"
+        # Short-circuit: the right side is never evaluated.
+        assert interp.eval("expr {0 && [error boom]}") == "0"
+
+    def test_integer_and_float_semantics(self, interp):
+        assert interp.eval("expr {-7 / 2}") == "-4"
+        assert interp.eval("expr {7.0 / 2}") == "3.5"
+        assert interp.eval("expr {-7 % 3}") == "2"
+        assert interp.eval("expr {2 ** 3 ** 2}") == "512"
+        assert interp.eval("expr {round(-2.5)}") == "-3"
+        assert interp.eval("expr {int(7.9)}") == "7"
+        assert interp.eval("expr {ceil(2.1)}") == "3.0"
+        assert interp.eval("expr {pow(2, 3)}") == "8.0"
+        assert interp.eval("expr {0x10 + 1}") == "17"
+        assert interp.eval("expr {max(1, 2.5, 7)}") == "7"
+
+    def test_ternary_and_membership(self, interp):
+        interp.eval("set l {a b c}; set n 5")
+        assert interp.eval('expr {$n > 3 ? "big" : "small"}') == "big"
+        assert interp.eval('expr {"b" in $l}') == "1"
+        assert interp.eval('expr {"z" ni $l}') == "1"
+        assert interp.eval("expr {[llength $l] * 2}") == "6"
+
+    def test_errors_are_raised(self, interp):
+        interp.eval("set x foo")
+        with pytest.raises(TclError, match="non-numeric"):
+            interp.eval("expr {$x + 1}")
+        with pytest.raises(TclError, match="divide by zero"):
+            interp.eval("expr {1 / 0}")
+        with pytest.raises(TclError, match="invalid bareword"):
+            interp.eval("expr {foo}")
+        with pytest.raises(TclError, match="missing operand"):
+            interp.eval("expr {1 +}")
+
+    def test_compiled_once_bound_per_evaluation(self, interp):
+        TclInterpreter._expr_cache.clear()
+        interp.eval("set s 0; foreach i {1 2 3 4} { set s [expr {$s + $i}] }")
+        assert interp.get_var("s") == "10"
+        assert TclInterpreter._expr_cache.get("$s + $i") is not None
+
 
 # --- List operations ---
 
@@ -594,5 +646,99 @@ class TestFRC:
         assert "FRC" not in captured.err
 
 
+class TestParseCache:
+    def test_loop_body_parsed_once(self, interp, monkeypatch):
+        """Re-evaluated bodies come from the script cache."""
+        TclInterpreter._script_cache.clear()
+        calls = []
+        orig = TclInterpreter._parse_commands
+
+        def counting(self, script):
+            calls.append(script)
+            return orig(self, script)
+
+        monkeypatch.setattr(TclInterpreter, "_parse_commands", counting)
+        interp.eval("set s 0; for {set i 0} {$i < 50} {incr i} { incr s $i }")
+        assert interp.get_var("s") == "1225"
+        assert calls.count(" incr s $i ") == 1
+
+    def test_cache_shared_between_interpreters(self):
+        TclInterpreter._script_cache.clear()
+        a = TclInterpreter()
+        b = TclInterpreter()
+        a.eval("proc f {x} { return [expr {$x * 2}] }")
+        b.set_var("v", "3")
+        b.eval("set r $v")
+        a.eval("set v 7")
+        # Same compiled word, different variable values per interpreter.
+        assert a.eval("set r $v") == "7"
+        assert b.get_var("r") == "3"
+
+    def test_substitution_errors_survive_caching(self, interp):
+        """Malformed substitutions still raise on every evaluation."""
+        for _ in range(2):
+            with pytest.raises(TclError, match="missing close-brace for variable"):
+                interp.eval('set x "a${y"')
+
+    def test_literal_dollar_and_arrays(self, interp):
+        interp.eval("set k b; set a(b) 42")
+        assert interp.eval('set r "cost $ $- $a($k) ${k}x"') == "cost $ $- 42 bx"
+        os.environ["TCL_CACHE_TEST"] = "env"
+        try:
+            assert interp.eval("set r $::env(TCL_CACHE_TEST)") == "env"
+        finally:
+            del os.environ["TCL_CACHE_TEST"]
+
+    def test_lru_is_bounded(self):
+        from tcl_interpreter import _LRUCache
+
+        cache = _LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert len(cache) == 2
+
+
+class TestSnapshot:
+    PRELUDE = """
+        set ::platform sky130
+        set cfg(util) 40
+        proc scaled {x} { global cfg; return [expr {$x * $cfg(util)}] }
+        namespace eval ns { variable depth 3 }
+    """
+
+    def test_restore_starts_after_prelude(self, interp):
+        interp.eval(self.PRELUDE)
+        clone = interp.snapshot().restore()
+        assert clone.eval("set ::platform") == "sky130"
+        assert clone.eval("scaled 2") == "80"
+        assert clone.eval("set depth") == "3"  # namespaces are flattened
+
+    def test_restored_interpreters_are_independent(self, interp):
+        interp.eval(self.PRELUDE)
+        snap = interp.snapshot()
+        a = snap.restore()
+        b = snap.restore()
+        a.eval("set cfg(util) 50; set ::platform asap7; proc scaled {x} { return 0 }")
+        assert a.eval("scaled 2") == "0"
+        assert b.eval("scaled 2") == "80"
+        assert b.eval("set ::platform") == "sky130"
+        # The snapshot and its source are unaffected as well.
+        assert snap.restore().eval("set cfg(util)") == "40"
+        assert interp.eval("set cfg(util)") == "40"
+
+    def test_builtins_and_custom_commands_rebound(self, interp):
+        interp.register_command("hello", lambda i, args: "hi " + i.get_var("who"))
+        interp.set_var("who", "orig")
+        clone = interp.clone()
+        clone.eval("set who clone")
+        # Builtin 'set' wrote to the clone, and the custom command sees it.
+        assert clone.eval("hello") == "hi clone"
+        assert interp.eval("hello") == "hi orig"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -6,6 +6,10 @@ interpreter. Commands handle the two ORFS invocation modes:
 2. Synthesis: estimate cell counts → mock netlist + synth_stat.txt
 """
 
+import ast
+import bisect
+import collections
+import functools
 import json
 import os
 import re
@@ -61,146 +65,593 @@ def _touch(path, content=""):
         f.write(content)
 
 
-# --- Simple Verilog parser ---
+# --- Verilog front end ---
+
+# Comments, strings, attributes and preprocessor directives are blanked
+# before tokenizing. Newlines inside them are kept so that module line
+# spans stay right. `ifdef branches are all kept.
+_NOISE_RE = re.compile(
+    r"//[^\n]*"
+    r"|/\*.*?\*/"
+    r"|\(\*(?!\s*\))[^;]*?\*\)"
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|`define\b(?:\\\n|[^\n])*"
+    r"|`(?:ifdef|ifndef|elsif|undef)\s+\w+"
+    r"|`(?:else|endif|resetall|celldefine|endcelldefine)\b"
+    r"|`(?:timescale|include|default_nettype)[^\n]*",
+    re.S,
+)
+_MODULE_KW_RE = re.compile(r"module\b")
+_TOKEN_RE = re.compile(
+    r"[A-Za-z_][\w$]*"
+    r"|\d[\d_]*(?:\s*'[sS]?[bodhBODH]\s*[\w?]+)?"
+    r"|'[sS]?[bodhBODH]\s*[\w?]+"
+    r"|'[01xzXZ]\b"
+    r"|[$`]\w+"
+    r"|\\\S+"
+    r"|\S"
+)
+_BASES = {"b": 2, "o": 8, "d": 10, "h": 16}
+_FILLS = frozenset("01xzXZ")
+_EXPR_CHARS = set("+-*/%()<>&|^~")
+
+_KEYWORDS = frozenset(
+    """
+    always always_comb always_ff always_latch and assert assign assume
+    automatic begin bit buf bufif0 bufif1 byte case casex casez cmos const
+    cover default defparam disable do else end endcase endfunction
+    endgenerate endinterface endmodule endpackage endtask enum event final
+    for force foreach forever fork function generate genvar if import
+    initial inout input int integer interface join localparam logic
+    longint macromodule module nand negedge nmos nor not notif0 notif1
+    or output packed parameter pmos posedge pullup pulldown rcmos real
+    reg release repeat return rnmos rpmos rtran rtranif0 rtranif1 shortint
+    signed specify static string struct supply0 supply1 task time tran
+    tranif0 tranif1 tri tri0 tri1 triand trior typedef union unique
+    unsigned var void wait wand while wire wor xnor xor
+    """.split()
+)
+_PRIMITIVES = frozenset(
+    "and nand or nor xor xnor not buf bufif0 bufif1 notif0 notif1".split()
+)
+# Declarations skipped without counting anything.
+_SKIPPED_DECLS = frozenset(
+    """
+    wire tri tri0 tri1 triand trior wand wor supply0 supply1 genvar
+    integer int bit byte shortint longint real time event string typedef
+    defparam import
+    """.split()
+)
+# Tokens after which a new statement (or begin/end/for) can start.
+_STATEMENT_END = frozenset(
+    """
+    ; ) : begin end generate endgenerate else endcase endfunction endtask
+    always always_comb always_ff always_latch initial final forever do
+    join join_any join_none
+    """.split()
+)
+
+
+def _strip_noise(content):
+    return _NOISE_RE.sub(lambda m: " " + "\n" * m.group().count("\n"), content)
+
+
+def _module_bodies(content):
+    """Yield the text between each `module` keyword and its endmodule."""
+    start = None
+    for m in _MODULE_KW_RE.finditer(content):
+        j = at = m.start()
+        while j and (content[j - 1].isalnum() or content[j - 1] in "_$"):
+            j -= 1
+        prefix = content[j:at]
+        if prefix == "end" and start is not None:
+            yield content[start:at]
+            start = None
+        elif prefix in ("", "macro"):
+            start = m.end()
+
+
+def _is_ident(tok):
+    return tok[0].isalpha() or tok[0] in "_\\"
+
+
+def _number(tok):
+    """Value of a Verilog integer literal, None for x/z, fills or reals."""
+    if "'" not in tok:
+        return int(tok.replace("_", ""))
+    base = tok.split("'", 1)[1].lstrip("sS")
+    if base[:1] in _FILLS:
+        # '0 / '1 fill every bit of the target, so the value depends on
+        # a width the expression does not know.
+        return None
+    digits = base[1:].replace("_", "").strip()
+    try:
+        return int(digits, _BASES[base[0].lower()])
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def _clog2(value):
+    return max(0, (int(value) - 1).bit_length())
+
+
+# Operators a constant expression may use. Exponents and shift counts
+# are capped so that a hostile literal cannot stall the parse.
+_BINOPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitXor: lambda a, b: a ^ b,
+    ast.Pow: lambda a, b: a**b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+}
+_UNARYOPS = {
+    ast.UAdd: lambda a: a,
+    ast.USub: lambda a: -a,
+    ast.Invert: lambda a: ~a,
+}
+_COMPARISONS = {
+    ast.Lt: lambda a, b: a < b,
+    ast.Gt: lambda a, b: a > b,
+}
+_MAX_BITS = 4096
+
+
+def _eval_node(node):
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            if right < 0 or abs(left).bit_length() * right > _MAX_BITS:
+                raise ValueError("exponent too large")
+        elif isinstance(node.op, (ast.LShift, ast.RShift)):
+            if right > _MAX_BITS:
+                raise ValueError("shift too large")
+        return _BINOPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARYOPS:
+        return _UNARYOPS[type(node.op)](_eval_node(node.operand))
+    if isinstance(node, ast.Compare) and all(
+        type(op) in _COMPARISONS for op in node.ops
+    ):
+        left = _eval_node(node.left)
+        result = True
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _eval_node(comparator)
+            result = result and _COMPARISONS[type(op)](left, right)
+            left = right
+        return int(result)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "_clog2"
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        return _clog2(_eval_node(node.args[0]))
+    raise ValueError(f"not a constant expression: {ast.dump(node)}")
+
+
+@functools.lru_cache(maxsize=4096)
+def _eval_text(text):
+    try:
+        return _eval_node(ast.parse(text, mode="eval").body)
+    except (ArithmeticError, RecursionError, SyntaxError, ValueError):
+        return None
+
+
+def _eval(tokens, params):
+    """Value of a constant expression, None if it is not one."""
+    if len(tokens) == 1:
+        tok = tokens[0]
+        if tok[0].isdigit():
+            return _number(tok)
+        return params.get(tok)
+    parts = []
+    for tok in tokens:
+        if tok in params:
+            parts.append(f"({params[tok]})")
+        elif tok[0].isdigit() or tok[0] == "'":
+            value = _number(tok)
+            if value is None:
+                return None
+            parts.append(str(value))
+        elif tok == "$clog2":
+            parts.append("_clog2")
+        elif tok in _EXPR_CHARS:
+            parts.append(tok)
+        else:
+            return None
+    return _eval_text("".join(parts).replace("/", "//"))
+
+
+def _skip_group(t, i, open_, close):
+    """Index just past the group whose opening token is t[i]."""
+    depth = 0
+    n = len(t)
+    while i < n:
+        tok = t[i]
+        if tok == open_:
+            depth += 1
+        elif tok == close:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def _skip_to(t, i, end):
+    """Index of the next `end` token outside {} (struct bodies)."""
+    depth = 0
+    n = len(t)
+    while i < n:
+        tok = t[i]
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth -= 1
+        elif tok == end and depth <= 0:
+            return i
+        i += 1
+    return n
+
+
+def _split(tokens, sep=","):
+    """Split tokens at top-level separators."""
+    if sep not in tokens:
+        return [tokens]
+    if "(" not in tokens and "[" not in tokens and "{" not in tokens:
+        cuts = [k for k, tok in enumerate(tokens) if tok == sep]
+        return [tokens[a + 1 : b] for a, b in zip([-1] + cuts, cuts + [len(tokens)])]
+    items = [[]]
+    depth = 0
+    for tok in tokens:
+        if tok in "([{":
+            depth += 1
+        elif tok in ")]}":
+            depth -= 1
+        elif tok == sep and depth == 0:
+            items.append([])
+            continue
+        items[-1].append(tok)
+    return items
+
+
+def _range_width(tokens, params):
+    """Width of a [msb:lsb], [base+:width] or [size] range; 1 if unknown."""
+    parts = _split(tokens, ":")
+    if len(parts) == 2 and parts[0] and parts[0][-1] in "+-":
+        width = _eval(parts[1], params)
+    elif len(parts) == 2:
+        msb, lsb = _eval(parts[0], params), _eval(parts[1], params)
+        width = None if msb is None or lsb is None else abs(msb - lsb) + 1
+    else:
+        width = _eval(tokens, params)
+    return width if width and width > 0 else 1
 
 
-def parse_verilog(content):
-    """Extract module structure from Verilog/SystemVerilog source.
+def _declarator(item, params):
+    """Split one comma-separated declaration item.
 
-    Returns dict: module_name -> {ports, regs, assigns, instances, lines}
+    Returns (keywords before the name, name, packed width or None when
+    the item has no packed range, unpacked element count).
     """
-    modules = {}
-    current_module = None
-    reg_count = 0
-    assign_count = 0
-    instances = []
+    dims = []
+    name_at = None
+    j = 0
+    n = len(item)
+    while j < n:
+        tok = item[j]
+        if tok == "[":
+            end = _skip_group(item, j, "[", "]")
+            dims.append((j, _range_width(item[j + 1 : end - 1], params)))
+            j = end
+            continue
+        if tok in ("=", "("):
+            break
+        if _is_ident(tok) and tok not in _KEYWORDS:
+            name_at = j
+        j += 1
+    if name_at is None:
+        return set(item) & _KEYWORDS, None, None, 1
+    packed = unpacked = None
+    for at, width in dims:
+        if at < name_at:
+            packed = (packed or 1) * width
+        else:
+            unpacked = (unpacked or 1) * width
+    return set(item[:name_at]) & _KEYWORDS, item[name_at], packed, unpacked or 1
+
+
+def _parse_params(tokens, params):
+    for item in _split(tokens):
+        if "=" not in item:
+            continue
+        eq = item.index("=")
+        value = _eval(item[eq + 1 :], params)
+        if eq and value is not None:
+            params[item[eq - 1]] = value
+
+
+def _trip_count(header, params):
+    """Iterations of `for (i = A; i < B; i += S)`, 1 if not static."""
+    parts = _split(header, ";")
+    if len(parts) != 3 or "=" not in parts[0] or len(parts[1]) < 3:
+        return 1
+    init, cond, step = parts
+    var = init[init.index("=") - 1]
+    start = _eval(init[init.index("=") + 1 :], params)
+    op = ""
+    k = 1
+    while k < len(cond) and cond[k] in ("<", ">", "=", "!"):
+        op += cond[k]
+        k += 1
+    bound = _eval(cond[k:], params)
+    if step in ([var, "+", "+"], ["+", "+", var]):
+        stride = 1
+    elif step in ([var, "-", "-"], ["-", "-", var]):
+        stride = -1
+    elif step[1:3] in (["+", "="], ["-", "="]):
+        stride = _eval(step[3:], params)
+        stride = -stride if stride and step[1] == "-" else stride
+    elif len(step) > 4 and step[1:3] == ["=", var] and step[3] in ("+", "-"):
+        stride = _eval(step[4:], params)
+        stride = -stride if stride and step[3] == "-" else stride
+    else:
+        return 1
+    if None in (start, bound, stride) or stride == 0 or cond[0] != var:
+        return 1
+    stop = {"<": bound, "<=": bound + 1, ">": bound, ">=": bound - 1}.get(op)
+    if op == "!=":
+        stop = bound
+    if stop is None:
+        return 1
+    return len(range(start, stop, stride))
+
+
+def _instance_at(t, i, params):
+    """(instance count, index of the ending ;) if t[i] starts a module
+    instantiation `type [#(...)] name [dims] (...) [, name (...)]`."""
+    n = len(t)
+    j = i + 1
+    if j < n and t[j] == "#":
+        j += 1
+        j = _skip_group(t, j, "(", ")") if j < n and t[j] == "(" else j + 1
+    count = 0
+    while j < n and _is_ident(t[j]) and t[j] not in _KEYWORDS:
+        j += 1
+        size = 1
+        while j < n and t[j] == "[":
+            end = _skip_group(t, j, "[", "]")
+            size *= _range_width(t[j + 1 : end - 1], params)
+            j = end
+        if j >= n or t[j] != "(":
+            return None
+        j = _skip_group(t, j, "(", ")")
+        count += size
+        if j < n and t[j] == ",":
+            j += 1
+            continue
+        break
+    if not count or (j < n and t[j] != ";"):
+        return None
+    return count, j
+
+
+def _parse_module(t, lines):
+    """Structure of one module from its tokens (after `module`)."""
+    n = len(t)
+    i = 1 if t[0] not in ("automatic", "static") else 2
+    name = t[i - 1]
+    params = {}
     ports = []
-    line_count = 0
-
-    for line in content.splitlines():
-        line_stripped = line.strip()
-        line_count += 1
-
-        # Module declaration
-        m = re.match(r"module\s+(\w+)", line_stripped)
-        if m:
-            if current_module:
-                modules[current_module] = {
-                    "ports": ports,
-                    "regs": reg_count,
-                    "assigns": assign_count,
-                    "instances": instances,
-                    "lines": line_count,
-                }
-            current_module = m.group(1)
-            reg_count = 0
-            assign_count = 0
-            instances = []
-            ports = []
-            line_count = 0
-
-        # Port declarations
-        m = re.match(
-            r"(input|output|inout)\s+(?:wire|reg|logic)?\s*(?:\[(\d+):(\d+)\])?\s*(\w+)",
-            line_stripped,
-        )
-        if m and current_module:
-            ports.append(m.group(4))
-
-        # Register declarations
-        m = re.match(r"(?:reg|logic)\s+(?:\[(\d+):(\d+)\])?\s*(\w+)", line_stripped)
-        if m and current_module:
-            if m.group(1) and m.group(2):
-                width = abs(int(m.group(1)) - int(m.group(2))) + 1
-                reg_count += width
+    regs = 0
+    while i < n and t[i] == "import":
+        i = _skip_to(t, i, ";") + 1
+    if i < n and t[i] == "#":
+        end = _skip_group(t, i + 1, "(", ")")
+        _parse_params(t[i + 2 : end - 1], params)
+        i = end
+    if i < n and t[i] == "(":
+        end = _skip_group(t, i, "(", ")")
+        direction, kinds, packed = None, set(), None
+        for item in _split(t[i + 1 : end - 1]):
+            words, port, width, count = _declarator(item, params)
+            if port is None:
+                continue
+            dirs = words & {"input", "output", "inout"}
+            if dirs:
+                direction, kinds, packed = dirs.pop(), words, width
+            elif width is not None or words:
+                kinds, packed = words, width
+            ports.append(port)
+            if direction == "output" and kinds & {"reg", "logic"}:
+                regs += (packed or 1) * count
+        i = end
+    i = _skip_to(t, i, ";") + 1
+
+    assigns = gates = 0
+    instances = []
+    instance_counts = collections.Counter()
+    mult = 1
+    mults = []  # multiplier to restore at each open begin's end
+    pending = 1  # trip count of a for loop waiting for its begin
+    # Statements that are not counted are skipped in one step, to just
+    # past the next token a statement can follow.
+    ends = [k for k in range(i, n) if t[k] in _STATEMENT_END]
+    while i < n:
+        tok = t[i]
+        if tok == "begin" or tok == "end":
+            if tok == "begin":
+                mults.append(mult)
+                mult *= pending
+                pending = 1
             else:
-                reg_count += 1
-
-        # Assign statements
-        if line_stripped.startswith("assign ") and current_module:
-            assign_count += 1
-
-        # Module instantiations (heuristic: word followed by word followed by ()
-        m = re.match(r"(\w+)\s+(\w+)\s*\(", line_stripped)
-        if m and current_module:
-            inst_type = m.group(1)
-            if inst_type not in (
-                "module",
-                "input",
-                "output",
-                "inout",
-                "wire",
-                "reg",
-                "logic",
-                "assign",
-                "always",
-                "initial",
-                "if",
-                "else",
-                "for",
-                "while",
-                "case",
-                "function",
-                "task",
-                "generate",
-                "begin",
-                "end",
-            ):
-                instances.append(inst_type)
-
-        # End of module
-        if "endmodule" in line_stripped and current_module:
-            modules[current_module] = {
-                "ports": ports,
-                "regs": reg_count,
-                "assigns": assign_count,
-                "instances": instances,
-                "lines": line_count,
-            }
-            current_module = None
+                mult = mults.pop() if mults else 1
+            i += 3 if i + 1 < n and t[i + 1] == ":" else 1
+            continue
+        if tok == "for" and i + 1 < n and t[i + 1] == "(":
+            end = _skip_group(t, i + 1, "(", ")")
+            if end < n and t[end] == "begin":
+                pending = _trip_count(t[i + 2 : end - 1], params)
+            i = end
+            continue
+        if tok in ("parameter", "localparam"):
+            end = _skip_to(t, i, ";")
+            _parse_params(t[i + 1 : end], params)
+        elif tok in ("input", "output", "inout"):
+            end = _skip_to(t, i, ";")
+            kinds = packed = None
+            for item in _split(t[i + 1 : end]):
+                words, port, width, count = _declarator(item, params)
+                if kinds is None:
+                    kinds, packed = words, width
+                if port is None:
+                    continue
+                if port not in ports:
+                    ports.append(port)
+                if tok == "output" and kinds & {"reg", "logic"}:
+                    regs += (packed or 1) * count * mult
+        elif tok in ("reg", "logic", "var"):
+            end = _skip_to(t, i, ";")
+            packed = None
+            for item in _split(t[i + 1 : end]):
+                _, var, width, count = _declarator(item, params)
+                packed = width if packed is None else packed
+                if var is not None:
+                    regs += (packed or 1) * count * mult
+        elif tok == "assign":
+            end = _skip_to(t, i, ";")
+            assigns += len(_split(t[i + 1 : end])) * mult
+        elif tok in _SKIPPED_DECLS:
+            end = _skip_to(t, i, ";")
+        elif tok in ("function", "task"):
+            end = _skip_to(t, i, "end" + tok)
+        elif tok in _PRIMITIVES:
+            end = _skip_to(t, i, ";")
+            gates += len(_split(t[i + 1 : end])) * mult
+        elif _is_ident(tok) and tok not in _KEYWORDS:
+            found = _instance_at(t, i, params)
+            if found is None:
+                k = bisect.bisect_left(ends, i)
+                i = ends[k] + 1 if k < len(ends) else n
+                continue
+            count, end = found
+            instances.append(tok)
+            instance_counts[tok] += count * mult
+        else:
+            k = bisect.bisect_left(ends, i)
+            i = ends[k] + 1 if k < len(ends) else n
+            continue
+        i = end + 1
+
+    return name, {
+        "ports": ports,
+        "regs": regs,
+        "assigns": assigns,
+        "instances": instances,
+        "instance_counts": dict(instance_counts),
+        "gates": gates,
+        "params": params,
+        "lines": lines,
+    }
+
 
+def parse_verilog(content):
+    """Extract module structure from Verilog/SystemVerilog source.
+
+    Returns dict: module_name -> {ports, regs, assigns, instances,
+    instance_counts, gates, params, lines}. regs counts declared flop
+    bits (reg/logic, including memories and output reg ports), assigns
+    counts continuous assignments, instances lists one instantiated
+    module type per instantiation statement and instance_counts the
+    number of instances of each type after instance arrays and generate
+    for loops are unrolled. Ranges and loop bounds are evaluated with
+    the module's default parameter values.
+    """
+    content = _strip_noise(content)
+    modules = {}
+    for body in _module_bodies(content):
+        tokens = _TOKEN_RE.findall(body)
+        if tokens:
+            name, module = _parse_module(tokens, body.count("\n"))
+            modules[name] = module
     return modules
 
 
+# Heuristic multipliers — calibrate from real synth_stat.txt
+# via mock-train skill. Current values are rough estimates.
+CELLS_PER_ASSIGN = 4
+CELLS_PER_LINE = 2
+CELLS_PER_GATE = 1
+UNKNOWN_MODULE_CELLS = 100
+
+
+def _own_cells(mod):
+    return (
+        mod["regs"]
+        + mod["assigns"] * CELLS_PER_ASSIGN
+        + mod["lines"] * CELLS_PER_LINE
+        + mod.get("gates", 0) * CELLS_PER_GATE
+    )
+
+
+def _instance_counts(mod):
+    counts = mod.get("instance_counts")
+    return collections.Counter(mod["instances"]) if counts is None else counts
+
+
 def estimate_cells(modules, top_module=None):
     """Estimate cell count from module structure.
 
     Heuristics:
     - reg [N-1:0] → N flip-flops
-    - assign (N-bit) → ~N cells
-    - always_comb (M lines) → ~2M cells
-    - Module instantiation → recursive sum
+    - assign → ~4 cells
+    - every line of the module body → ~2 cells
+    - Module instantiation → the instantiated module's whole subtree,
+      once per instance; unknown modules count UNKNOWN_MODULE_CELLS
+
+    Each module's subtree is costed once. Without a (known) top module
+    the most expensive module that nothing instantiates is used.
     """
     if not modules:
         return 100  # default estimate
 
+    memo = {}
+    active = set()
+
+    def subtree(name):
+        if name in memo:
+            return memo[name]
+        if name not in modules:
+            return UNKNOWN_MODULE_CELLS
+        if name in active:
+            return 0  # recursive instantiation; count each module once
+        active.add(name)
+        mod = modules[name]
+        cells = _own_cells(mod)
+        for inst, count in _instance_counts(mod).items():
+            cells += subtree(inst) * count
+        active.discard(name)
+        memo[name] = cells
+        return cells
+
     if top_module and top_module in modules:
-        mod = modules[top_module]
+        top = top_module
     else:
-        # Use largest module as top
-        mod = max(modules.values(), key=lambda m: m["lines"])
-
-    cells = 0
-    # Heuristic multipliers — calibrate from real synth_stat.txt
-    # via mock-train skill. Current values are rough estimates.
-    CELLS_PER_ASSIGN = 4
-    CELLS_PER_LINE = 2
-    UNKNOWN_MODULE_CELLS = 100
-
-    cells += mod["regs"]  # flip-flops
-    cells += mod["assigns"] * CELLS_PER_ASSIGN
-    cells += mod["lines"] * CELLS_PER_LINE
-    for inst in mod["instances"]:
-        if inst in modules:
-            sub = modules[inst]
-            cells += (
-                sub["regs"]
-                + sub["assigns"] * CELLS_PER_ASSIGN
-                + sub["lines"] * CELLS_PER_LINE
-            )
-        else:
-            cells += UNKNOWN_MODULE_CELLS
-    return max(cells, 10)
+        used = set()
+        for mod in modules.values():
+            used.update(_instance_counts(mod))
+        top = max((n for n in modules if n not in used), key=subtree, default=None)
+        if top is None:
+            top = max(modules, key=lambda n: modules[n]["lines"])
+    return max(subtree(top), 10)
 
 
 # --- Yosys commands ---
@@ -99,6 +99,103 @@ class TestParseVerilog:
         assert "a" in modules
         assert "b" in modules
 
+    def test_multiline_ansi_header_with_parameters(self):
+        content = (
+            "module fifo #(\n"
+            "  parameter W = 16,\n"
+            "  parameter DEPTH = 1 << 3\n"
+            ") (\n"
+            "  input  logic         clk,\n"
+            "  input  logic [W-1:0] din,\n"
+            "  output logic [W-1:0] dout, last  // one comment\n"
+            ");\n"
+            "  logic [W-1:0] mem [0:DEPTH-1];\n"
+            "  /* module hidden(); endmodule */\n"
+            "  always_ff @(posedge clk) dout <= mem[0];\n"
+            "endmodule\n"
+        )
+        modules = yosys_commands.parse_verilog(content)
+        assert list(modules) == ["fifo"]
+        fifo = modules["fifo"]
+        assert fifo["ports"] == ["clk", "din", "dout", "last"]
+        assert fifo["params"] == {"W": 16, "DEPTH": 8}
+        # dout + last (16 bits each) + 8 x 16-bit memory
+        assert fifo["regs"] == 16 + 16 + 8 * 16
+        assert fifo["lines"] == 11
+
+    def test_non_ansi_ports(self):
+        content = (
+            "module old (clk,\n"
+            "            q);\n"
+            "  input clk;\n"
+            "  output reg [3:0] q;\n"
+            "endmodule\n"
+        )
+        modules = yosys_commands.parse_verilog(content)
+        assert modules["old"]["ports"] == ["clk", "q"]
+        assert modules["old"]["regs"] == 4
+
+    def test_generate_loops_and_instance_arrays(self):
+        content = (
+            "module top #(parameter N = 4) (input clk);\n"
+            "  cell #(.W(8)) u_first (\n"
+            "    .clk(clk)\n"
+            "  );\n"
+            "  cell u_arr [1:0] (.clk(clk));\n"
+            "  genvar i, j;\n"
+            "  generate\n"
+            "    for (i = 0; i < N; i = i + 1) begin : g_row\n"
+            "      for (j = 0; j <= 2; j++) begin : g_col\n"
+            "        cell u (.clk(clk));\n"
+            "      end\n"
+            "      assign w[i] = clk;\n"
+            "    end\n"
+            "  endgenerate\n"
+            "  always @(*) begin\n"
+            "    case (sel)\n"
+            "      A: begin x = 1; end\n"
+            "      default: x = 0;\n"
+            "    endcase\n"
+            "  end\n"
+            "  and g0 (o, a, b);\n"
+            "endmodule\n"
+        )
+        top = yosys_commands.parse_verilog(content)["top"]
+        assert top["instances"] == ["cell", "cell", "cell"]
+        assert top["instance_counts"] == {"cell": 1 + 2 + 4 * 3}
+        assert top["assigns"] == 4
+        assert top["gates"] == 1
+
+    def test_fill_literals(self):
+        content = (
+            "module a #(parameter W = 4) (input clk);\n"
+            "  localparam logic [3:0] RST = '0;\n"
+            "  localparam logic [W-1:0] ONES = '1;\n"
+            "  reg [W-1:0] q;\n"
+            "endmodule\n"
+        )
+        a = yosys_commands.parse_verilog(content)["a"]
+        assert a["params"] == {"W": 4}
+        assert a["regs"] == 4
+
+    @pytest.mark.parametrize(
+        "expr, value",
+        [
+            ("2**10", 1024),
+            ("(3+4)*2<<2", 56),
+            ("_clog2(1024)+1", 11),
+            ("1<2", 1),
+            ("~0", -1),
+            ("2**30**9", None),
+            ("1<<(1<<40)", None),
+            ("5%0", None),
+            ("__import__(1)", None),
+            ("(1).real", None),
+        ],
+    )
+    def test_constant_expressions(self, expr, value):
+        assert yosys_commands._eval_text(expr) == value
+
 
 # --- Cell estimation ---
 
@@ -144,6 +241,34 @@ class TestEstimateCells:
         # total = 54
         assert cells == 54
 
+    def test_recurses_through_hierarchy(self):
+        def mod(regs, lines, instances=(), counts=None):
+            return {
+                "ports": [],
+                "regs": regs,
+                "assigns": 0,
+                "instances": list(instances),
+                "instance_counts": counts,
+                "lines": lines,
+            }
+
+        modules = {
+            "top": mod(0, 5, ["mid"], {"mid": 2}),
+            "mid": mod(0, 5, ["leaf", "blackbox"], {"leaf": 3, "blackbox": 1}),
+            "leaf": mod(100, 0),
+        }
+        # leaf 100; mid 10 + 3 * 100 + 100 (unknown); top 10 + 2 * 410
+        assert yosys_commands.estimate_cells(modules, "top") == 830
+        # Without a top, the module nothing instantiates is used.
+        assert yosys_commands.estimate_cells(modules) == 830
+
+    def test_recursive_instantiation_terminates(self):
+        modules = {
+            "a": {"regs": 1, "assigns": 0, "instances": ["b"], "lines": 10},
+            "b": {"regs": 1, "assigns": 0, "instances": ["a"], "lines": 10},
+        }
+        assert yosys_commands.estimate_cells(modules, "a") == 42
+
 
 # --- Read commands ---
 
@@ -5,16 +5,52 @@ Usage:
     bazelisk run //:monitor-test
     bazelisk run //:monitor-test -- //test/...
     bazelisk run //:monitor-test -- //test/... --test_tag_filters=-manual
+    bazelisk run //:monitor-test -- --monitor-mode=ps //test/...
+
+Modes (--monitor-mode=, consumed here, everything else goes to bazelisk):
+  events  (default) Event driven. Bazel writes a Build Event Protocol JSON
+          stream (--build_event_json_file) that is tailed for exact action
+          start/end times, and the ORFS log directories are watched with
+          inotify (or, where unavailable, a stat scan that only reads
+          files whose size or mtime changed). A stage's .log landing in
+          bazel-bin finishes it, with the time from its "Took N seconds"
+          line; the slowest-stages table and the longest per-design stage
+          chain are kept up to date as these arrive, with no rescans.
+          ORFS actions run sandboxed, so a running stage's .tmp.log is not
+          visible in bazel-bin: the running stages come from the same
+          `ps -Af` scan for `tee -a *.tmp.log` as the ps mode (a .tmp.log
+          that does show up, e.g. with sandboxing off, counts too).
+  ps      The original poller: `ps -Af` every 10s for `tee -a *.tmp.log`,
+          and one rescan of every log at the end.
+
+--monitor-db=PATH appends this build's per-stage elapsed/CPU/peak memory
+to a SQLite database afterwards; see log_metrics.py for the queries.
 """
 
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import json
 import os
 import re
+import select
+import struct
 import subprocess
 import sys
+import tempfile
 import time
 from collections import defaultdict
+from datetime import datetime
 from pathlib import Path
 
+import log_metrics
+
+LOG_DIRS = [
+    "bazel-bin/test/logs",
+    "bazel-bin/test/smoketest/logs",
+]
+
 
 def get_active_stages():
     """Get currently active ORFS stages from tee processes."""
@@ -36,24 +72,13 @@ def get_active_stages():
 def get_stage_timings(log_dir):
     """Extract per-stage timings from ORFS log files."""
     timings = []
-    log_dir = Path(log_dir)
-    if not log_dir.exists():
-        return timings
-
-    for log_file in log_dir.rglob("*.log"):
-        if ".tmp." in log_file.name:
-            continue
-        design = str(log_file.relative_to(log_dir).parent)
-        stage = log_file.stem
-
-        took_secs = None
-        with open(log_file) as f:
-            for line in f:
-                m = re.search(r"Took (\d+) seconds:", line)
-                if m:
-                    took_secs = int(m.group(1))
-
-        if took_secs is not None and took_secs > 0:
+    took = {}
+    for step in log_metrics.scan_log_dir(log_dir):
+        if step.substep:
+            took[step.design, step.stage] = int(step.elapsed_s)
+
+    for (design, stage), took_secs in took.items():
+        if took_secs > 0:
             timings.append((took_secs, design, stage))
 
     timings.sort(reverse=True)
@@ -96,8 +121,11 @@ def print_active(stages, elapsed):
     sys.stdout.flush()
 
 
-def print_timings(timings, top_n=25):
-    """Print timing table."""
+def print_timings(timings, top_n=25, total=None):
+    """Print timing table.
+
+    total is the number of timings when only the slowest are passed.
+    """
     if not timings:
         print("\nNo stage timings found.")
         return
@@ -107,20 +135,500 @@ def print_timings(timings, top_n=25):
     print(f"{'-'*8}  {'-'*45}  {'-'*15}")
     for secs, design, stage in timings[:top_n]:
         print(f"{format_duration(secs):>8s}  {design:<45s}  {stage}")
-    if len(timings) > top_n:
-        print(f"  ... and {len(timings) - top_n} more stages < {timings[top_n][0]}s")
+    if total is None:
+        total = len(timings)
+    if total > top_n:
+        print(f"  ... and {total - top_n} more stages < {timings[top_n][0]}s")
     print(f"{'='*70}")
     sys.stdout.flush()
 
 
+def _parse_timestamp(value):
+    """Seconds since the epoch from a BEP timestamp (RFC 3339 or millis)."""
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return int(value) / 1000.0
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _parse_duration(value):
+    """Seconds from a BEP JSON duration such as "12.5s"."""
+    return float(str(value).rstrip("s"))
+
+
+class StageTracker:
+    """Running stage statistics, updated per event instead of by rescans.
+
+    Keeps the active stages, the top_n slowest finished stages (a heap of
+    top_n + 1 so the table can say what the cut-off is) and, per design,
+    the summed duration of its finished stages. ORFS stages of a design
+    run one after another, so the design with the largest sum is the
+    longest stage chain seen so far.
+    """
+
+    def __init__(self, top_n=25):
+        self.top_n = top_n
+        self.active = {}  # (design, stage) -> start time
+        self.count = 0
+        self._slowest = []  # min-heap of (secs, design, stage)
+        self._chains = defaultdict(int)
+        self._chain_stages = defaultdict(list)
+
+    def start(self, design, stage, when):
+        self.active.setdefault((design, stage), when)
+
+    def finish(self, design, stage, when, took=None):
+        """Record a finished stage; took overrides when - start."""
+        start = self.active.pop((design, stage), None)
+        if took is None:
+            if start is None:
+                return
+            took = when - start
+        secs = int(round(took))
+        if secs <= 0:
+            return
+        self.count += 1
+        entry = (secs, design, stage)
+        if len(self._slowest) <= self.top_n:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+        self._chains[design] += secs
+        self._chain_stages[design].append(stage)
+
+    def active_names(self):
+        return sorted(f"{design}/{stage}" for design, stage in self.active)
+
+    def slowest(self):
+        """Slowest stages, longest first (top_n, plus the cut-off entry)."""
+        return sorted(self._slowest, reverse=True)
+
+    def critical_path(self):
+        """(total secs, design, [stages]) of the longest chain, or None."""
+        if not self._chains:
+            return None
+        design = max(self._chains, key=lambda d: (self._chains[d], d))
+        return self._chains[design], design, list(self._chain_stages[design])
+
+
+class BepReader:
+    """Incrementally read a --build_event_json_file as Bazel appends to it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._offset = 0
+        self._partial = b""
+
+    def read(self):
+        """Return the events (dicts) completed since the last call."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        self._offset += len(data)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            if line.strip():
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass
+        return events
+
+
+def apply_bep_event(event, tracker):
+    """Feed one BEP event into tracker. Returns True on buildFinished.
+
+    Completed actions (published for every action with
+    --build_event_publish_all_actions) carry exact start and end times;
+    test attempts carry a start time and duration.
+    """
+    ids = event.get("id", {})
+    if "actionCompleted" in ids:
+        action = event.get("action", {})
+        if "startTime" in action and "endTime" in action:
+            label = action.get("label") or ids["actionCompleted"].get("label", "?")
+            start = _parse_timestamp(action["startTime"])
+            end = _parse_timestamp(action["endTime"])
+            tracker.finish(label, action.get("type", "action"), end, took=end - start)
+    elif "testResult" in ids:
+        result = event.get("testResult", {})
+        label = ids["testResult"].get("label", "?")
+        if "testAttemptDuration" in result:
+            took = _parse_duration(result["testAttemptDuration"])
+        elif "testAttemptDurationMillis" in result:
+            took = int(result["testAttemptDurationMillis"]) / 1000.0
+        else:
+            return False
+        tracker.finish(label, "test", time.time(), took=took)
+    return "buildFinished" in ids
+
+
+# inotify(7) constants.
+_IN_MODIFY = 0x002
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def _libc_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class LogWatcher:
+    """Report file changes under a directory tree as ("created" |
+    "modified" | "deleted", path) pairs.
+
+    Uses inotify when available. Otherwise each poll() compares a
+    scandir of the tree against the previous sizes and mtimes and reports
+    only the differences. Files present when watching starts are not
+    reported. The root may appear later (bazel-bin/... is created by the
+    build); it is picked up on a later poll().
+    """
+
+    def __init__(self, root, use_inotify=True):
+        self.root = str(root)
+        self._libc = _libc_inotify() if use_inotify else None
+        self._fd = None
+        self._wds = {}  # watch descriptor -> directory
+        self._seen = None  # polling backend: path -> (size, mtime_ns)
+        self._started = False
+
+    @property
+    def fileno(self):
+        return self._fd
+
+    def _scan(self):
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for e in it:
+                        if e.is_dir(follow_symlinks=False):
+                            stack.append(e.path)
+                        else:
+                            st = e.stat()
+                            found[e.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+        return found
+
+    def _add_watch(self, directory, changes):
+        """Watch directory and everything below it; files that already exist
+        under a directory created after start-up are reported as created."""
+        for dirpath, dirnames, filenames in os.walk(directory):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dirpath), _WATCH_MASK
+            )
+            if wd >= 0:
+                self._wds[wd] = dirpath
+            if changes is not None:
+                changes.extend(("created", os.path.join(dirpath, f)) for f in filenames)
+
+    def _start(self):
+        if not os.path.isdir(self.root):
+            return False
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                self._add_watch(self.root, None)
+                return True
+            self._libc = None
+        self._seen = self._scan()
+        return True
+
+    def poll(self):
+        """Return the changes since the last call (never blocks)."""
+        if not self._started:
+            self._started = self._start()
+            return []
+        if self._fd is None:
+            current = self._scan()
+            changes = [
+                ("created" if p not in self._seen else "modified", p)
+                for p, stamp in current.items()
+                if self._seen.get(p) != stamp
+            ]
+            changes += [("deleted", p) for p in self._seen if p not in current]
+            self._seen = current
+            return changes
+        changes = []
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos : pos + length].rstrip(b"\0")
+                pos += length
+                directory = self._wds.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._add_watch(path, changes)
+                elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                    changes.append(("created", path))
+                elif mask & _IN_MODIFY:
+                    changes.append(("modified", path))
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    changes.append(("deleted", path))
+        return changes
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class LogStages:
+    """Turn ORFS log-file changes into StageTracker start/finish events.
+
+    ORFS tees a stage's output into <stage>.tmp.log and renames it to
+    <stage>.log when the stage ends. Only bytes appended since the last
+    change are read, looking for the "Took N seconds" line.
+    """
+
+    def __init__(self, root, tracker):
+        self.root = Path(root)
+        self.tracker = tracker
+        self._offsets = {}  # tmp log path -> bytes read
+        self._took = {}  # (design, stage) -> seconds from a Took line
+
+    def _key(self, path):
+        path = Path(path)
+        name = path.name
+        if name.endswith(".tmp.log"):
+            stage, tmp = name[: -len(".tmp.log")], True
+        elif name.endswith(".log"):
+            stage, tmp = name[: -len(".log")], False
+        else:
+            return None, False
+        try:
+            design = str(path.parent.relative_to(self.root))
+        except ValueError:
+            return None, False
+        return (design, stage), tmp
+
+    def _tail(self, path, key):
+        offset = self._offsets.get(path, 0)
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return
+        # Only complete lines; a partial last line is re-read next time.
+        end = data.rfind(b"\n") + 1
+        self._offsets[path] = offset + end
+        for m in log_metrics.TOOK_RE.finditer(data[:end].decode(errors="replace")):
+            self._took[key] = int(m.group(1))
+
+    def handle(self, kind, path, when):
+        key, tmp = self._key(path)
+        if key is None:
+            return
+        if tmp:
+            if kind == "created":
+                self.tracker.start(*key, when)
+                self._offsets[path] = 0
+            if kind in ("created", "modified"):
+                self._tail(path, key)
+            elif kind == "deleted":
+                self._offsets.pop(path, None)
+        elif kind == "created":
+            # Renamed from .tmp.log (or written directly): the stage is done.
+            if key not in self._took:
+                self._tail(path, key)
+                self._offsets.pop(path, None)
+            self.tracker.finish(*key, when, took=self._took.pop(key, None))
+
+
+def print_critical_path(tracker):
+    path = tracker.critical_path()
+    if path is None:
+        return
+    secs, design, stages = path
+    print(f"\nLongest stage chain: {design} {format_duration(secs)}")
+    print(f"  {' -> '.join(stages)}")
+
+
+def _split_args(argv):
+    """Split --monitor-* options from the arguments for bazelisk."""
+    opts = {"mode": "events", "top": 25}
+    rest = []
+    for arg in argv:
+        if arg.startswith("--monitor-mode="):
+            opts["mode"] = arg.split("=", 1)[1]
+        elif arg.startswith("--monitor-top="):
+            opts["top"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--monitor-db="):
+            opts["db"] = arg.split("=", 1)[1]
+        else:
+            rest.append(arg)
+    if opts["mode"] not in ("events", "ps"):
+        raise SystemExit(f"unknown --monitor-mode={opts['mode']} (events, ps)")
+    return opts, rest or ["//test/..."]
+
+
+def monitor_events(
+    cmd,
+    top_n,
+    log_dirs=LOG_DIRS,
+    interval=1.0,
+    active_stages=get_active_stages,
+    ps_interval=10.0,
+):
+    """Run cmd with a BEP JSON stream and watch log_dirs; return
+    (exit code, output, elapsed, stage tracker, action tracker).
+
+    Running stages are listed by active_stages() every ps_interval
+    seconds, merged with any .tmp.log seen in log_dirs.
+    """
+    stages = StageTracker(top_n)
+    actions = StageTracker(top_n)
+    with tempfile.TemporaryDirectory() as tmp:
+        bep_path = os.path.join(tmp, "bep.json")
+        cmd = (
+            cmd[:2]
+            + [
+                f"--build_event_json_file={bep_path}",
+                "--build_event_publish_all_actions",
+            ]
+            + cmd[2:]
+        )
+        bep = BepReader(bep_path)
+        watchers = [(LogWatcher(d), LogStages(d, stages)) for d in log_dirs]
+        for watcher, _ in watchers:
+            watcher.poll()
+
+        start = time.time()
+        with tempfile.TemporaryFile() as out:
+            proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.STDOUT)
+            last_active = []
+            running = []
+            last_ps = None
+            try:
+                while True:
+                    done = proc.poll() is not None
+                    fds = [w.fileno for w, _ in watchers if w.fileno is not None]
+                    if not done:
+                        if fds:
+                            select.select(fds, [], [], interval)
+                        else:
+                            time.sleep(interval)
+                    now = time.time()
+                    for watcher, log_stages in watchers:
+                        for kind, path in watcher.poll():
+                            log_stages.handle(kind, path, now)
+                    for event in bep.read():
+                        apply_bep_event(event, actions)
+                    if not done and (last_ps is None or now - last_ps >= ps_interval):
+                        running = active_stages()
+                        last_ps = now
+                    active = sorted(set(running) | set(stages.active_names()))
+                    if active != last_active:
+                        print_active(active, int(now - start))
+                        last_active = active
+                    if done:
+                        break
+            except KeyboardInterrupt:
+                proc.terminate()
+                proc.wait()
+                raise
+            finally:
+                for watcher, _ in watchers:
+                    watcher.close()
+            out.seek(0)
+            output = out.read().decode(errors="replace")
+    return proc.returncode, output, int(time.time() - start), stages, actions
+
+
 def main():
-    args = sys.argv[1:] if len(sys.argv) > 1 else ["//test/..."]
+    opts, args = _split_args(sys.argv[1:])
 
     cmd = ["bazelisk", "test"] + args
     print(f"Running: {' '.join(cmd)}")
     print()
     sys.stdout.flush()
 
+    if opts["mode"] == "events":
+        exit_code = _main_events(cmd, opts)
+    else:
+        exit_code = _main_ps(cmd)
+    if opts.get("db"):
+        record_metrics(opts["db"], " ".join(args))
+    return exit_code
+
+
+def record_metrics(db_path, label, log_dirs=LOG_DIRS):
+    """Append the stage logs of this build as one run to db_path."""
+    steps = [s for d in log_dirs for s in log_metrics.scan_log_dir(d)]
+    conn = log_metrics.connect(db_path)
+    try:
+        run_id = log_metrics.record_run(conn, steps, label)
+    finally:
+        conn.close()
+    print(f"Recorded {len(steps)} stage metrics as run {run_id} in {db_path}")
+
+
+def _main_events(cmd, opts):
+    try:
+        exit_code, output, elapsed, stages, actions = monitor_events(cmd, opts["top"])
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return 1
+    _print_summary(output)
+    print_timings(stages.slowest(), opts["top"], total=stages.count)
+    print_critical_path(stages)
+    if actions.count:
+        print("\nSlowest Bazel actions (from the build event stream):")
+        print_timings(actions.slowest(), opts["top"], total=actions.count)
+    print(f"\nTotal wall time: {format_duration(elapsed)}")
+    print(f"Exit code: {exit_code}")
+    return exit_code
+
+
+def _print_summary(output):
+    """Print the interesting lines of Bazel's output."""
+    for line in output.splitlines():
+        if any(
+            kw in line
+            for kw in ["PASSED", "FAILED", "Elapsed time:", "Executed", "tests pass"]
+        ):
+            print(line)
+    print()
+
+
+def _main_ps(cmd):
     start = time.time()
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
@@ -144,23 +652,10 @@ def main():
     exit_code = proc.returncode
 
     # Print Bazel output summary
-    output = proc.stdout.read().decode(errors="replace")
-    for line in output.splitlines():
-        if any(
-            kw in line
-            for kw in ["PASSED", "FAILED", "Elapsed time:", "Executed", "tests pass"]
-        ):
-            print(line)
-    print()
-
-    # Find log directory
-    log_dirs = [
-        "bazel-bin/test/logs",
-        "bazel-bin/test/smoketest/logs",
-    ]
+    _print_summary(proc.stdout.read().decode(errors="replace"))
 
     all_timings = []
-    for d in log_dirs:
+    for d in LOG_DIRS:
         all_timings.extend(get_stage_timings(d))
     all_timings.sort(reverse=True)
 
@@ -1,16 +1,28 @@
 """Unit tests for monitor_test.py."""
 
+import os
+import sys
 import textwrap
 import unittest
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest.mock import patch
 
+import log_metrics
+
 from monitor_test import (
+    BepReader,
+    LogStages,
+    LogWatcher,
+    StageTracker,
+    _split_args,
+    apply_bep_event,
     format_duration,
     get_active_stages,
     get_stage_timings,
+    monitor_events,
     print_timings,
+    record_metrics,
 )
 
 
@@ -112,6 +124,217 @@ class TestPrintTimings(unittest.TestCase):
     def test_empty_timings(self):
         print_timings([])
 
+    def test_total_beyond_top_n(self):
+        with patch("builtins.print") as mock_print:
+            print_timings([(9, "a", "x"), (5, "b", "y")], top_n=1, total=40)
+        printed = "\n".join(str(c.args[0]) for c in mock_print.call_args_list)
+        self.assertIn("and 39 more stages < 5s", printed)
+
+
+class TestStageTracker(unittest.TestCase):
+    def test_top_n_and_critical_path(self):
+        t = StageTracker(top_n=2)
+        for i, (design, stage, secs) in enumerate(
+            [
+                ("a", "synth", 10),
+                ("a", "place", 30),
+                ("b", "synth", 50),
+                ("a", "route", 20),
+            ]
+        ):
+            t.start(design, stage, 100.0 * i)
+            self.assertIn(f"{design}/{stage}", t.active_names())
+            t.finish(design, stage, 100.0 * i + secs)
+        self.assertEqual(t.active_names(), [])
+        self.assertEqual(t.count, 4)
+        self.assertEqual(
+            t.slowest(), [(50, "b", "synth"), (30, "a", "place"), (20, "a", "route")]
+        )
+        self.assertEqual(t.critical_path(), (60, "a", ["synth", "place", "route"]))
+
+    def test_finish_without_start_needs_took(self):
+        t = StageTracker()
+        t.finish("a", "x", 10.0)
+        self.assertEqual(t.count, 0)
+        t.finish("a", "x", 10.0, took=3)
+        self.assertEqual(t.slowest(), [(3, "a", "x")])
+
+
+class TestBep(unittest.TestCase):
+    def test_reader_handles_partial_lines(self):
+        with TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "bep.json")
+            reader = BepReader(path)
+            self.assertEqual(reader.read(), [])
+            with open(path, "w") as f:
+                f.write('{"id": {"a": {}}}\n{"id": {"b"')
+            self.assertEqual(reader.read(), [{"id": {"a": {}}}])
+            with open(path, "a") as f:
+                f.write(": {}}}\n")
+            self.assertEqual(reader.read(), [{"id": {"b": {}}}])
+
+    def test_action_and_test_events(self):
+        t = StageTracker()
+        action = {
+            "id": {"actionCompleted": {"label": "//test:gcd_floorplan"}},
+            "action": {
+                "label": "//test:gcd_floorplan",
+                "type": "OrfsFloorplan",
+                "startTime": "2024-05-01T10:00:00.250Z",
+                "endTime": "2024-05-01T10:02:05.750Z",
+            },
+        }
+        test = {
+            "id": {"testResult": {"label": "//test:gcd_test"}},
+            "testResult": {"testAttemptDuration": "12.4s"},
+        }
+        self.assertFalse(apply_bep_event(action, t))
+        self.assertFalse(apply_bep_event(test, t))
+        self.assertTrue(apply_bep_event({"id": {"buildFinished": {}}}, t))
+        self.assertEqual(
+            t.slowest(),
+            [
+                (126, "//test:gcd_floorplan", "OrfsFloorplan"),
+                (12, "//test:gcd_test", "test"),
+            ],
+        )
+
+
+class TestLogStages(unittest.TestCase):
+    def _run(self, use_inotify):
+        with TemporaryDirectory() as root:
+            stale = Path(root, "old")
+            stale.mkdir()
+            (stale / "1_synth.log").write_text("Took 99 seconds: stale\n")
+            t = StageTracker()
+            watcher = LogWatcher(root, use_inotify=use_inotify)
+            stages = LogStages(root, t)
+
+            def pump(when):
+                for kind, path in watcher.poll():
+                    stages.handle(kind, path, when)
+
+            pump(0.0)
+            design = Path(root, "asap7/gcd/base")
+            design.mkdir(parents=True)
+            tmp = design / "2_1_floorplan.tmp.log"
+            tmp.write_text("starting\n")
+            pump(10.0)
+            self.assertEqual(t.active_names(), ["asap7/gcd/base/2_1_floorplan"])
+            with open(tmp, "a") as f:
+                f.write("Took 42 seconds: floorplan\n")
+            pump(11.0)
+            tmp.rename(design / "2_1_floorplan.log")
+            (design / "3_1_place.log").write_text("Took 7 seconds: place\n")
+            pump(60.0)
+            watcher.close()
+            self.assertEqual(t.active_names(), [])
+            self.assertEqual(
+                t.slowest(),
+                [
+                    (42, "asap7/gcd/base", "2_1_floorplan"),
+                    (7, "asap7/gcd/base", "3_1_place"),
+                ],
+            )
+
+    def test_polling_backend(self):
+        self._run(use_inotify=False)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_inotify_backend(self):
+        self._run(use_inotify=True)
+
+
+_FAKE_BAZEL = textwrap.dedent(
+    """\
+    import json, os, sys, time
+    bep = sys.argv[1].split("=", 1)[1]
+    assert sys.argv[2] == "--build_event_publish_all_actions"
+    logs = os.path.join(sys.argv[3], "asap7/gcd/base")
+    os.makedirs(logs)
+    with open(os.path.join(logs, "1_synth.tmp.log"), "w") as f:
+        f.write("Took 3 seconds: synth\\n")
+    time.sleep(0.3)
+    os.rename(os.path.join(logs, "1_synth.tmp.log"), os.path.join(logs, "1_synth.log"))
+    with open(bep, "w") as f:
+        f.write(json.dumps({"id": {"actionCompleted": {}}, "action": {
+            "label": "//test:gcd_synth", "type": "OrfsSynth",
+            "startTime": "2024-05-01T10:00:00Z",
+            "endTime": "2024-05-01T10:00:04Z"}}) + "\\n")
+    print("//test:gcd_test PASSED")
+    """
+)
+
+
+class TestMonitorEvents(unittest.TestCase):
+    def test_end_to_end_with_fake_bazel(self):
+        with TemporaryDirectory() as tmpdir:
+            script = os.path.join(tmpdir, "fake_bazel.py")
+            Path(script).write_text(_FAKE_BAZEL)
+            logs = os.path.join(tmpdir, "logs")
+            os.makedirs(logs)
+            with patch("builtins.print") as printed:
+                code, output, _, stages, actions = monitor_events(
+                    [sys.executable, script, logs],
+                    top_n=5,
+                    log_dirs=[logs],
+                    interval=0.05,
+                    # What ps sees of a sandboxed stage's tee.
+                    active_stages=lambda: ["asap7/gcd/base/1_synth"],
+                    ps_interval=0.0,
+                )
+            self.assertEqual(code, 0)
+            self.assertIn(
+                "  asap7/gcd/base: 1_synth",
+                [c.args[0] for c in printed.call_args_list if c.args],
+            )
+            self.assertIn("PASSED", output)
+            self.assertEqual(stages.slowest(), [(3, "asap7/gcd/base", "1_synth")])
+            self.assertEqual(actions.slowest(), [(4, "//test:gcd_synth", "OrfsSynth")])
+
+
+class TestSplitArgs(unittest.TestCase):
+    def test_monitor_options_are_consumed(self):
+        opts, rest = _split_args(["--monitor-mode=ps", "//test/...", "--monitor-top=5"])
+        self.assertEqual(opts, {"mode": "ps", "top": 5})
+        self.assertEqual(rest, ["//test/..."])
+
+    def test_defaults(self):
+        self.assertEqual(
+            _split_args([]), ({"mode": "events", "top": 25}, ["//test/..."])
+        )
+
+    def test_metrics_db(self):
+        opts, _ = _split_args(["--monitor-db=/tmp/metrics.db", "//test:gcd"])
+        self.assertEqual(opts["db"], "/tmp/metrics.db")
+
+
+class TestRecordMetrics(unittest.TestCase):
+    def test_appends_one_run(self):
+        with TemporaryDirectory() as tmpdir:
+            log_dir = Path(tmpdir) / "logs" / "asap7" / "gcd" / "base"
+            log_dir.mkdir(parents=True)
+            (log_dir / "1_synth.log").write_text(
+                "Elapsed time: 0:03.00[h:]min:sec. CPU time: user 2.50 sys 0.25 "
+                "(91%). Peak memory: 2048KB.\n"
+            )
+            db = os.path.join(tmpdir, "metrics.db")
+            with patch("builtins.print"):
+                record_metrics(db, "//test:gcd", [str(Path(tmpdir) / "logs")])
+                record_metrics(db, "//test:gcd", [str(Path(tmpdir) / "logs")])
+            conn = log_metrics.connect(db)
+            rows = conn.execute(
+                "SELECT run_id, design, stage, peak_rss_kb FROM metrics"
+            ).fetchall()
+            conn.close()
+            self.assertEqual(
+                rows,
+                [
+                    (1, "asap7/gcd/base", "1_synth", 2048),
+                    (2, "asap7/gcd/base", "1_synth", 2048),
+                ],
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,26 +1,297 @@
-"""Create a .tar.gz from a manifest of src_path\tdst_path lines."""
+"""Create a .tar.gz from a manifest of src_path\tdst_path lines.
 
+Usage: package_stage.py <manifest> <output> [options]
+
+The archive is streamed: tarfile writes into a compressor that works on
+fixed-size blocks, so multi-GB ODB/GDS/SPEF files are never held in
+memory. Compression follows the output suffix unless --compression is
+given:
+
+  .tar.gz/.tgz  gzip, compressed on --threads threads as independent
+                gzip members (any gzip reader accepts the concatenation)
+  .tar.zst      zstd -T<threads> (needs the zstd binary)
+  .tar          uncompressed
+
+Sources listed more than once under different destinations (e.g. the
+runfiles that appear both as <repo>/ and _main/external/<repo>/) are
+stored once; later copies become tar hard link entries. --dedupe=content
+additionally links regular files whose content, mode and mtime are
+identical; that shrinks the archive further, but the extracted copies
+then share one inode, so an in-place write to one changes the other.
+
+--tree lays the manifest out in the <output> directory instead of an
+archive, for local use: files are reflinked where the filesystem supports it,
+else hard linked, else copied.
+"""
+
+import argparse
+import collections
+import fcntl
+import hashlib
 import os
+import shutil
+import subprocess
 import sys
 import tarfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK_SIZE = 4 << 20
+COPY_BUFSIZE = 1 << 20
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+_SUFFIXES = [
+    (".tar.gz", "gzip"),
+    (".tgz", "gzip"),
+    (".tar.zst", "zstd"),
+    (".tar", "none"),
+]
+
+
+def read_manifest(manifest_path):
+    """Return [(src, dst)] in manifest order, first occurrence of each dst."""
+    entries = []
+    seen = set()
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            src, dst = line.split("\t", 1)
+            if dst in seen:
+                continue
+            seen.add(dst)
+            entries.append((src, dst))
+    return entries
+
+
+def expand(entries):
+    """Yield (src, dst) for every entry and, like tarfile.add(), for the
+    contents of directories in sorted order."""
+    for src, dst in entries:
+        yield src, dst
+        if os.path.isdir(src) and not os.path.islink(src):
+            yield from expand(
+                (os.path.join(src, name), dst + "/" + name)
+                for name in sorted(os.listdir(src))
+            )
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def plan_links(entries, dedupe="inode", threads=1):
+    """Return {dst: earlier dst} for regular files that can be stored as
+    hard links to an earlier member.
+
+    "inode" links sources that are the same file; "content" also links
+    files with identical bytes, mode, owner and mtime. Only files whose
+    size collides with another file's are hashed.
+    """
+    if dedupe == "none":
+        return {}
+    links = {}
+    first_by_inode = {}
+    candidates = collections.defaultdict(list)
+    for src, dst in entries:
+        st = os.lstat(src)
+        if not os.path.isfile(src) or os.path.islink(src):
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if inode in first_by_inode:
+            links[dst] = first_by_inode[inode]
+            continue
+        first_by_inode[inode] = dst
+        if dedupe == "content" and st.st_size > 0:
+            key = (st.st_size, st.st_mode, st.st_uid, st.st_gid, int(st.st_mtime))
+            candidates[key].append((src, dst))
+    to_hash = [group for group in candidates.values() if len(group) > 1]
+    paths = [src for group in to_hash for src, _ in group]
+    with ThreadPoolExecutor(max(1, threads)) as pool:
+        digests = dict(zip(paths, pool.map(_digest, paths)))
+    for group in to_hash:
+        first_by_digest = {}
+        for src, dst in group:
+            first = first_by_digest.setdefault(digests[src], dst)
+            if first != dst:
+                links[dst] = first
+    return links
+
+
+def _gzip_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    """Binary file-like object that gzips fixed-size blocks on a thread
+    pool (zlib releases the GIL) and writes them, in order, as
+    concatenated gzip members. At most 2 * threads blocks are in flight.
+    """
+
+    def __init__(self, raw, threads, level=6, block_size=BLOCK_SIZE):
+        self._raw = raw
+        self._threads = max(1, threads)
+        self._level = level
+        self._block_size = block_size
+        self._pool = ThreadPoolExecutor(self._threads)
+        self._pending = collections.deque()
+        self._buf = bytearray()
+        self._blocks = 0
+
+    def write(self, data):
+        self._buf += data
+        while len(self._buf) >= self._block_size:
+            self._submit(bytes(self._buf[: self._block_size]))
+            del self._buf[: self._block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._blocks += 1
+        self._pending.append(self._pool.submit(_gzip_block, block, self._level))
+        while len(self._pending) > 2 * self._threads:
+            self._raw.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._buf or not self._blocks:
+            self._submit(bytes(self._buf))
+            self._buf.clear()
+        while self._pending:
+            self._raw.write(self._pending.popleft().result())
+        self._pool.shutdown()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PipeWriter:
+    """Binary file-like object feeding an external compressor."""
+
+    def __init__(self, cmd, output_path):
+        self._out = open(output_path, "wb")
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self._out)
+        self._cmd = cmd
+
+    def write(self, data):
+        return self._proc.stdin.write(data)
+
+    def close(self):
+        self._proc.stdin.close()
+        code = self._proc.wait()
+        self._out.close()
+        if code:
+            raise RuntimeError(f"{' '.join(self._cmd)} failed with exit code {code}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compression_for(output_path):
+    for suffix, compression in _SUFFIXES:
+        if output_path.endswith(suffix):
+            return compression
+    return "gzip"
+
+
+def open_output(output_path, compression, threads, level=None):
+    """Return a writable binary file-like object for the archive."""
+    if compression == "gzip":
+        return ParallelGzipWriter(
+            open(output_path, "wb"), threads, 6 if level is None else level
+        )
+    if compression == "zstd":
+        zstd = shutil.which("zstd")
+        if zstd is None:
+            sys.exit("package_stage.py: --compression=zstd needs zstd on PATH")
+        return _PipeWriter(
+            [zstd, "-q", f"-T{threads}", f"-{3 if level is None else level}", "-c"],
+            output_path,
+        )
+    return open(output_path, "wb")
+
+
+def write_archive(entries, output, links):
+    """Stream entries into output, storing links as hard link members."""
+    with tarfile.open(fileobj=output, mode="w|", copybufsize=COPY_BUFSIZE) as tar:
+        for src, dst in entries:
+            info = tar.gettarinfo(src, arcname=dst)
+            if dst in links:
+                info.type = tarfile.LNKTYPE
+                info.linkname = links[dst]
+                info.size = 0
+                tar.addfile(info)
+            elif info.isreg():
+                with open(src, "rb") as f:
+                    tar.addfile(info, f)
+            else:
+                tar.addfile(info)
+
+
+def _clone(src, dst):
+    """Reflink src to dst, else hard link it, else copy it."""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        try:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        except OSError:
+            pass
+        else:
+            shutil.copystat(src, dst)
+            return
+    os.unlink(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def write_tree(entries, root, links):
+    """Lay entries out under root instead of archiving them."""
+    for src, dst in entries:
+        path = os.path.join(root, dst)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), path)
+        elif os.path.isdir(src):
+            os.makedirs(path, exist_ok=True)
+        elif dst in links:
+            os.link(os.path.join(root, links[dst]), path)
+        else:
+            _clone(src, path)
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("manifest")
+    parser.add_argument("output", help="archive path, or directory with --tree")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"])
+    parser.add_argument("--level", type=int, help="compression level")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--dedupe", choices=["none", "inode", "content"], default="inode"
+    )
+    parser.add_argument(
+        "--tree", action="store_true", help="write a directory, not an archive"
+    )
+    args = parser.parse_args(argv)
 
-def main():
-    manifest_path = sys.argv[1]
-    output_path = sys.argv[2]
-
-    with tarfile.open(output_path, "w:gz") as tar:
-        seen = set()
-        with open(manifest_path) as f:
-            for line in f:
-                line = line.rstrip("\n")
-                if not line:
-                    continue
-                src, dst = line.split("\t", 1)
-                if dst in seen:
-                    continue
-                seen.add(dst)
-                tar.add(src, arcname=dst)
+    entries = list(expand(read_manifest(args.manifest)))
+    links = plan_links(entries, args.dedupe, args.threads)
+    if args.tree:
+        write_tree(entries, args.output, links)
+        return
+    compression = args.compression or compression_for(args.output)
+    with open_output(args.output, compression, args.threads, args.level) as output:
+        write_archive(entries, output, links)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""Unit tests for package_stage.py."""
+
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import unittest
+from tempfile import TemporaryDirectory
+
+from package_stage import (
+    ParallelGzipWriter,
+    compression_for,
+    expand,
+    main,
+    plan_links,
+    read_manifest,
+)
+
+
+class PackageStageTest(unittest.TestCase):
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.src = os.path.join(self.tmp, "src")
+        os.makedirs(os.path.join(self.src, "results", "sub"))
+        self.big = self._write("results/5_route.odb", os.urandom(300_000))
+        self.copy = self._write("results/copy.odb", b"same bytes")
+        self.other = self._write("results/other.odb", b"same bytes")
+        self._write("results/sub/x.txt", b"x")
+        self.config = self._write("config.mk", b"export DESIGN_NAME = gcd\n")
+        os.symlink("config.mk", os.path.join(self.src, "link.mk"))
+        stamp = (1_700_000_000, 1_700_000_000)
+        os.utime(self.copy, stamp)
+        os.utime(self.other, stamp)
+        self.manifest = os.path.join(self.tmp, "manifest.txt")
+        lines = [
+            (self.big, "_main/results/5_route.odb"),
+            (self.big, "_main/external/results/5_route.odb"),
+            (self.copy, "_main/copy.odb"),
+            (self.other, "_main/other.odb"),
+            (os.path.join(self.src, "results", "sub"), "_main/sub"),
+            (os.path.join(self.src, "link.mk"), "_main/link.mk"),
+            (self.config, "_main/config.mk"),
+            (self.big, "_main/config.mk"),
+        ]
+        with open(self.manifest, "w") as f:
+            f.write("".join(f"{s}\t{d}\n" for s, d in lines) + "\n")
+
+    def _write(self, rel, data):
+        path = os.path.join(self.src, rel)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def _extract(self, archive, **kwargs):
+        out = os.path.join(self.tmp, "out")
+        with tarfile.open(archive, **kwargs) as tar:
+            members = {m.name: m for m in tar.getmembers()}
+            tar.extractall(out)
+        return out, members
+
+    def _read(self, *parts):
+        with open(os.path.join(*parts), "rb") as f:
+            return f.read()
+
+    def test_manifest_keeps_first_destination(self):
+        entries = read_manifest(self.manifest)
+        self.assertEqual(len(entries), 7)
+        self.assertIn((self.config, "_main/config.mk"), entries)
+        self.assertIn(
+            (os.path.join(self.src, "results", "sub", "x.txt"), "_main/sub/x.txt"),
+            list(expand(entries)),
+        )
+
+    def test_gzip_archive_round_trips_with_inode_links(self):
+        archive = os.path.join(self.tmp, "deps.tar.gz")
+        main([self.manifest, archive, "--threads", "4"])
+        out, members = self._extract(archive, mode="r:gz")
+        self.assertTrue(members["_main/external/results/5_route.odb"].islnk())
+        self.assertFalse(members["_main/other.odb"].islnk())
+        self.assertTrue(members["_main/link.mk"].issym())
+        self.assertEqual(
+            self._read(out, "_main/external/results/5_route.odb"),
+            self._read(self.big),
+        )
+        self.assertEqual(self._read(out, "_main/config.mk"), self._read(self.config))
+        self.assertEqual(self._read(out, "_main/sub/x.txt"), b"x")
+
+    def test_content_dedupe(self):
+        links = plan_links(list(expand(read_manifest(self.manifest))), "content", 2)
+        self.assertEqual(links["_main/other.odb"], "_main/copy.odb")
+        os.chmod(self.other, 0o755)
+        links = plan_links(list(expand(read_manifest(self.manifest))), "content", 2)
+        self.assertNotIn("_main/other.odb", links)
+        self.assertEqual(plan_links(read_manifest(self.manifest), "none"), {})
+
+    def test_uncompressed_and_tree(self):
+        archive = os.path.join(self.tmp, "deps.tar")
+        main([self.manifest, archive, "--dedupe", "content"])
+        self.assertEqual(compression_for(archive), "none")
+        out, members = self._extract(archive, mode="r:")
+        self.assertTrue(members["_main/other.odb"].islnk())
+        self.assertEqual(self._read(out, "_main/other.odb"), b"same bytes")
+
+        tree = os.path.join(self.tmp, "tree")
+        main([self.manifest, tree, "--tree"])
+        self.assertEqual(
+            self._read(tree, "_main/results/5_route.odb"), self._read(self.big)
+        )
+        self.assertEqual(os.readlink(os.path.join(tree, "_main/link.mk")), "config.mk")
+        self.assertEqual(self._read(tree, "_main/sub/x.txt"), b"x")
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd not installed")
+    def test_zstd(self):
+        archive = os.path.join(self.tmp, "deps.tar.zst")
+        main([self.manifest, archive])
+        with open(archive, "rb") as f:
+            self.assertEqual(f.read(4), b"\x28\xb5\x2f\xfd")
+
+
+class ParallelGzipWriterTest(unittest.TestCase):
+    def test_blocks_concatenate_in_order(self):
+        data = os.urandom(10_000) * 7
+        raw = io.BytesIO()
+        raw.close = lambda: None
+        with ParallelGzipWriter(raw, threads=3, block_size=4096) as w:
+            for i in range(0, len(data), 1000):
+                w.write(data[i : i + 1000])
+        self.assertEqual(gzip.decompress(raw.getvalue()), data)
+
+    def test_empty_output_is_valid_gzip(self):
+        raw = io.BytesIO()
+        raw.close = lambda: None
+        ParallelGzipWriter(raw, threads=2).close()
+        self.assertEqual(gzip.decompress(raw.getvalue()), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
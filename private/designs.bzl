@@ -64,10 +64,20 @@ def _orfs_designs_impl(repository_ctx):
         repository_ctx.read(config_file)
 
     platforms_arg = ",".join(repository_ctx.attr.platforms)
-    result = repository_ctx.execute(
-        [python, str(parser_path), "--all", designs_dir, "--platforms", platforms_arg, "--json"],
-        timeout = 120,
-    )
+    cmd = [python, str(parser_path), "--all", designs_dir, "--platforms", platforms_arg, "--json"]
+
+    # Designs are parsed in parallel, and per-design results are cached
+    # outside the repository (which is wiped on re-fetch) so that only
+    # designs whose config.mk or includes changed are reparsed. Entries
+    # are validated against content hashes, so the cache never changes
+    # the output and its location is deliberately not a watched input.
+    env = repository_ctx.os.environ
+    cache_home = env.get("XDG_CACHE_HOME", "")
+    if not cache_home and env.get("HOME"):
+        cache_home = env["HOME"] + "/.cache"
+    if cache_home:
+        cmd += ["--cache-dir", cache_home + "/bazel-orfs/config_mk_parser"]
+    result = repository_ctx.execute(cmd, timeout = 120)
 
     if result.return_code != 0:
         fail("config_mk_parser.py failed (dir=%s):\nstdout: %s\nstderr: %s" % (designs_dir, result.stdout, result.stderr))
@@ -957,6 +957,25 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
     kept_json = declare_artifact(ctx, "results", "kept_modules.json")
     skip_keep = all_arguments.get("SYNTH_KEEP_MODULES", "")
 
+    # Index the canonical RTLIL once (module offsets,
+    # attributes, cell instances). kept_macros validation and top
+    # partition name resolution query this small sidecar instead of each
+    # rescanning the multi-GB RTLIL.
+    canon_index = declare_artifact(ctx, "results", "1_1_yosys_canonicalize.index.json")
+    ctx.actions.run(
+        executable = ctx.executable._python,
+        arguments = [
+            ctx.file._rtlil_index.path,
+            "build",
+            canon_output.path,
+            canon_index.path,
+        ],
+        inputs = [canon_output, ctx.file._rtlil_index],
+        outputs = [canon_index],
+        mnemonic = "IndexRtlil",
+        progress_message = "Indexing canonicalize RTLIL for %s" % module_top(ctx),
+    )
+
     if skip_keep:
         # SYNTH_KEEP_MODULES provided: skip keep-hierarchy discovery.
         # Write kept_modules.json directly from the variable.
@@ -1006,7 +1025,7 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
                 rtlil = checkpoint_output.path,
                 json = kept_json.path,
             ),
-            inputs = [checkpoint_output, ctx.file._rtlil_kept_modules],
+            inputs = [checkpoint_output, ctx.file._rtlil_kept_modules, ctx.file._rtlil_index],
             outputs = [kept_json],
             tools = [ctx.executable._python],
         )
@@ -1044,7 +1063,7 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
             command = "{py} {script} --rtlil {rtlil} --kept-modules {kj} --macros {mj} --user-kept-macros {uj} --top {top} --output {out}".format(
                 py = ctx.executable._python.path,
                 script = ctx.file._rtlil_kept_macros.path,
-                rtlil = canon_output.path,
+                rtlil = canon_index.path,
                 kj = kept_json.path,
                 mj = macro_names_json.path,
                 uj = user_dict_json.path,
@@ -1052,11 +1071,12 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
                 out = validated_kept_macros_json.path,
             ),
             inputs = [
-                canon_output,
+                canon_index,
                 kept_json,
                 macro_names_json,
                 user_dict_json,
                 ctx.file._rtlil_kept_macros,
+                ctx.file._rtlil_index,
             ],
             outputs = [validated_kept_macros_json],
             tools = [ctx.executable._python],
@@ -1152,6 +1172,38 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
         per_module_rtlil[module] = per_module_out
         per_module_name_file[module] = per_module_name_out
 
+    # Optional cost-balanced assignment (SYNTH_PARTITION_BALANCE=1):
+    # synth_partition_plan.py estimates each kept module's cost from its
+    # RTLIL slice and bin-packs modules longest-first into the
+    # partitions, instead of the round-robin index % N default. The plan
+    # is only known at execution time, so every partition then takes
+    # every slice as input — a change to one module's slice re-runs all
+    # partitions. Worth it when N is well below the module count and
+    # module sizes are skewed; pointless when N >= module count.
+    partition_plan = None
+    if (all_arguments.get("SYNTH_PARTITION_BALANCE", "0") == "1" and
+        len(kept_modules_list) > num_partitions):
+        partition_plan = declare_artifact(ctx, "results", "partition_plan.txt")
+        slices = [per_module_rtlil[m] for m in kept_modules_list]
+        ctx.actions.run(
+            executable = ctx.executable._python,
+            arguments = [
+                ctx.file._synth_partition_plan.path,
+                "--kept-modules",
+                kept_json.path,
+                "--num-partitions",
+                str(num_partitions),
+                "--rtlil-dir",
+                slices[0].dirname,
+                "--output",
+                partition_plan.path,
+            ],
+            inputs = [ctx.file._synth_partition_plan, kept_json] + slices,
+            outputs = [partition_plan],
+            mnemonic = "PlanSynthPartitions",
+            progress_message = "Planning synthesis partitions for %s" % module_top(ctx),
+        )
+
     # Base inputs common to every partition (no macros yet — those are
     # added per partition below). checkpoint_output is NOT included here:
     # non-top partitions consume per-module RTLIL slices instead. The top
@@ -1234,7 +1286,12 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
         # Build a human-readable progress message showing which modules
         # this partition will synthesize.
         my_modules = []
-        if kept_modules_list:
+        if partition_plan:
+            # Assignment is decided by the plan action; this partition
+            # may get any kept module.
+            my_modules = kept_modules_list
+            progress_msg = "Synthesizing partition {}/{} (cost-balanced)".format(i, num_partitions)
+        elif kept_modules_list:
             my_modules = [m for idx, m in enumerate(kept_modules_list) if idx % num_partitions == i]
             if my_modules:
                 progress_msg = "Synthesizing partition {}/{}: {}".format(i, num_partitions, ", ".join(my_modules))
@@ -1382,6 +1439,11 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
             if m in per_module_rtlil:
                 my_per_module_files.append(per_module_rtlil[m])
                 my_per_module_files.append(per_module_name_file[m])
+        if partition_plan:
+            my_per_module_files.append(partition_plan)
+            partition_env_override = partition_env_override | {
+                "SYNTH_PARTITION_MANIFEST": partition_plan.path,
+            }
         partition_inputs = depset(
             [base_inp for base_inp in extra_partition_config] + my_per_module_files,
             transitive = [base_partition_inputs, my_macro_files],
@@ -1416,8 +1478,16 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
     # scoping its inputs doesn't help wall time. Top synth reads the
     # global checkpoint directly (not a per-module slice), so include
     # checkpoint_output explicitly here.
+    top_env_extra = {}
+    top_extra_inputs = []
+    if skip_keep:
+        top_env_extra = {
+            "RTLIL_INDEX_SCRIPT": ctx.file._rtlil_index.path,
+            "SYNTH_RTLIL_INDEX": canon_index.path,
+        }
+        top_extra_inputs = [canon_index, ctx.file._rtlil_index]
     top_partition_inputs = depset(
-        [checkpoint_output],
+        [checkpoint_output] + top_extra_inputs,
         transitive = [base_partition_inputs, all_macro_files],
     )
     top_output = declare_artifact(ctx, "results", "partition_top.v")
@@ -1431,7 +1501,7 @@ def _yosys_parallel_synth(ctx, config, canon_output, synth_outputs, synth_logs,
             "SYNTH_PARTITION_SCRIPT=" + ctx.file._synth_partition_script.path,
         ],
         command = " && ".join(top_commands),
-        env = config_overrides(ctx, base_env | partition_env_extra | {
+        env = config_overrides(ctx, base_env | partition_env_extra | top_env_extra | {
             "SYNTH_PARTITION_ID": "top",
             "SYNTH_NUM_PARTITIONS": str(num_partitions),
             "SYNTH_TCL": ctx.file._synth_tcl.path,
@@ -2119,6 +2189,14 @@ orfs_synth_rule = rule(
                     allow_single_file = True,
                     default = Label("//:rtlil_kept_macros.py"),
                 ),
+                "_rtlil_index": attr.label(
+                    allow_single_file = True,
+                    default = Label("//:rtlil_index.py"),
+                ),
+                "_synth_partition_plan": attr.label(
+                    allow_single_file = True,
+                    default = Label("//:synth_partition_plan.py"),
+                ),
                 "_synth_tcl": attr.label(
                     allow_single_file = True,
                     default = Label("@orfs//flow:scripts/synth.tcl"),
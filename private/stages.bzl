@@ -27,6 +27,8 @@ ALL_STAGES_LIST = [
 BAZEL_VARIABLE_TO_STAGES = {
     # Set in orfs_design.bzl when SYNTH_HIERARCHICAL=1.
     "SYNTH_NUM_PARTITIONS": ["synth"],
+    # Opt-in cost-balanced partition assignment, see synth_partition_plan.py.
+    "SYNTH_PARTITION_BALANCE": ["synth"],
     "PLATFORM": ALL_STAGES_LIST,
     "PLATFORM_DIR": ALL_STAGES_LIST,
     "DESIGN_NAME": ALL_STAGES_LIST,
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Index an RTLIL file once so downstream tools don't rescan it.
+
+1_1_yosys_canonicalize.rtlil can be several GB. rtlil_kept_modules.py,
+rtlil_kept_macros.py and synth_partition.sh each used to stream it line
+by line with per-line regexes. This module reads it once through mmap,
+letting one compiled regex skip over everything but the column-0
+`attribute`/`module`/`end` lines and the `  cell \\<type>` lines, and
+records per module:
+
+  - base:       name before any slang '$path' suffix
+  - start, end: byte offsets of the module, including its leading
+                attribute lines, up to and including its `end` line
+  - attributes: the module's attributes (name -> raw value text)
+  - cells:      [type, instance] of every non-builtin cell ('\\' types;
+                yosys '$' primitives are skipped)
+
+The index is saved as a JSON sidecar (module order = RTLIL order):
+
+  {"version": 1, "size": <rtlil bytes>, "top": <name or null>,
+   "modules": {"<name>": {"base": ..., "start": ..., "end": ...,
+                          "attributes": {...}, "cells": [[t, i], ...]}}}
+
+Usage:
+  rtlil_index.py build <input.rtlil> <index.json>
+  rtlil_index.py modules <index.json|input.rtlil>
+  rtlil_index.py resolve <index.json|input.rtlil> <bare_name>...
+"""
+import json
+import mmap
+import os
+import re
+import sys
+
+INDEX_VERSION = 1
+
+# Every line of interest starts right after a newline, so anchoring on a
+# literal "\n" lets the regex engine jump between candidate lines with a
+# fast literal search instead of trying a match at every byte.
+_LINE_BODY = (
+    rb"(?:attribute \\(\S+) ([^\n]*)"
+    rb"|module \\(\S+)"
+    rb"|  cell \\(\S+) \\(\S+)"
+    rb"|(end)(?=\n|\Z))"
+)
+_LINE_RE = re.compile(rb"\n" + _LINE_BODY)
+_FIRST_LINE_RE = re.compile(_LINE_BODY)
+
+
+def base_name(name):
+    """Base module name (strip slang '$path' suffix)."""
+    return name.split("$", 1)[0]
+
+
+def _matches(mm):
+    first = _FIRST_LINE_RE.match(mm)
+    if first:
+        yield first.start(), first
+    for m in _LINE_RE.finditer(mm):
+        yield m.start() + 1, m
+
+
+def build_index(rtlil_path):
+    """Scan rtlil_path once and return its index dict."""
+    modules = {}
+    top = None
+    pending_attrs = {}
+    pending_start = None
+    cur = None
+    size = os.path.getsize(rtlil_path)
+    if size == 0:
+        return {"version": INDEX_VERSION, "size": 0, "top": None, "modules": {}}
+    with open(rtlil_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        for pos, m in _matches(mm):
+            attr, value, module, cell_type, inst, end = m.groups()
+            if attr is not None:
+                if cur is None:
+                    if pending_start is None:
+                        pending_start = pos
+                    pending_attrs[attr.decode()] = value.decode()
+            elif module is not None:
+                name = module.decode()
+                cur = {
+                    "base": base_name(name),
+                    "start": pos if pending_start is None else pending_start,
+                    "end": None,
+                    "attributes": pending_attrs,
+                    "cells": [],
+                }
+                modules[name] = cur
+                if pending_attrs.get("top") == "1":
+                    top = name
+                pending_attrs = {}
+                pending_start = None
+            elif cell_type is not None:
+                if cur is not None:
+                    cur["cells"].append([cell_type.decode(), inst.decode()])
+            elif end is not None and cur is not None:
+                # Include the newline that terminates `end`, if any.
+                cur["end"] = min(m.end() + 1, size)
+                cur = None
+    if cur is not None:
+        cur["end"] = size
+    return {"version": INDEX_VERSION, "size": size, "top": top, "modules": modules}
+
+
+def write_index(index, path):
+    with open(path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+
+def read_index(path):
+    with open(path) as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(
+            "{}: unsupported RTLIL index version {}".format(path, index.get("version"))
+        )
+    return index
+
+
+def load(path):
+    """Return the index for path, which is either a saved index or an
+    RTLIL file (indexed on the fly). RTLIL never starts with '{'."""
+    with open(path, "rb") as f:
+        head = f.read(1)
+    if head == b"{":
+        return read_index(path)
+    return build_index(path)
+
+
+def module_text(rtlil_path, index, name):
+    """Return the RTLIL text of one module, read by byte offset."""
+    entry = index["modules"][name]
+    with open(rtlil_path, "rb") as f:
+        f.seek(entry["start"])
+        return f.read(entry["end"] - entry["start"]).decode()
+
+
+def resolve(index, bare):
+    """Resolve a bare module name to its canonical RTLIL name: an exact
+    match wins, else the first module named '<bare>$...'. Same algorithm
+    as synth_canonicalize_module.tcl. Returns None if absent."""
+    modules = index["modules"]
+    if bare in modules:
+        return bare
+    prefix = bare + "$"
+    for name in modules:
+        if name.startswith(prefix):
+            return name
+    return None
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "modules", "resolve"):
+        print(__doc__.split("Usage:", 1)[1], file=sys.stderr)
+        return 1
+    cmd = sys.argv[1]
+    if cmd == "build":
+        if len(sys.argv) != 4:
+            print(
+                f"Usage: {sys.argv[0]} build <input.rtlil> <index.json>",
+                file=sys.stderr,
+            )
+            return 1
+        index = build_index(sys.argv[2])
+        write_index(index, sys.argv[3])
+        print(f"Indexed {len(index['modules'])} modules into {sys.argv[3]}")
+        return 0
+
+    index = load(sys.argv[2])
+    if cmd == "modules":
+        for name in index["modules"]:
+            print(name)
+        return 0
+
+    missing = []
+    for bare in sys.argv[3:]:
+        canonical = resolve(index, bare)
+        if canonical is None:
+            missing.append(bare)
+        else:
+            print(canonical)
+    if missing:
+        for bare in missing:
+            print(
+                f"ERROR: SYNTH_KEEP_MODULES lists '{bare}' but it does not exist in the design.",
+                file=sys.stderr,
+            )
+        print(f"Available modules: {' '.join(index['modules'])}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Unit tests for rtlil_index.py."""
+
+import os
+import tempfile
+import unittest
+
+from rtlil_index import (
+    build_index,
+    load,
+    module_text,
+    read_index,
+    resolve,
+    write_index,
+)
+
+
+SAMPLE_RTLIL = """\
+attribute \\blackbox 1
+module \\sram
+  wire input 1 \\clk
+end
+attribute \\src "top.v:10"
+attribute \\keep_hierarchy 1
+module \\tile$top.gen[0].u_tile
+  attribute \\src "top.v:11"
+  wire \\x
+  cell $and $1
+    connect \\A \\x
+  end
+  cell \\sram \\u_sram
+  end
+end
+attribute \\top 1
+module \\top
+  cell \\tile$top.gen[0].u_tile \\gen[0].u_tile
+  end
+end"""
+
+
+class TestRtlilIndex(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "design.rtlil")
+        with open(self.path, "w") as f:
+            f.write(SAMPLE_RTLIL)
+
+    def test_modules_in_file_order(self):
+        index = build_index(self.path)
+        self.assertEqual(
+            list(index["modules"]), ["sram", "tile$top.gen[0].u_tile", "top"]
+        )
+        self.assertEqual(index["top"], "top")
+
+    def test_attributes_and_cells(self):
+        tile = build_index(self.path)["modules"]["tile$top.gen[0].u_tile"]
+        self.assertEqual(tile["base"], "tile")
+        # Indented (wire-level) attributes don't leak into module attributes.
+        self.assertEqual(
+            tile["attributes"], {"src": '"top.v:10"', "keep_hierarchy": "1"}
+        )
+        # '$' builtin cells are skipped.
+        self.assertEqual(tile["cells"], [["sram", "u_sram"]])
+
+    def test_offsets_cover_attributes_and_end(self):
+        index = build_index(self.path)
+        text = module_text(self.path, index, "tile$top.gen[0].u_tile")
+        self.assertTrue(text.startswith('attribute \\src "top.v:10"\n'))
+        self.assertTrue(text.endswith("\nend\n"))
+        # Last module has no trailing newline.
+        self.assertTrue(module_text(self.path, index, "top").endswith("\nend"))
+        self.assertTrue(
+            module_text(self.path, index, "sram").startswith("attribute \\blackbox 1")
+        )
+
+    def test_sidecar_roundtrip(self):
+        index = build_index(self.path)
+        sidecar = os.path.join(self.dir.name, "design.index.json")
+        write_index(index, sidecar)
+        self.assertEqual(read_index(sidecar), index)
+        # load() accepts either form.
+        self.assertEqual(load(sidecar), index)
+        self.assertEqual(load(self.path), index)
+
+    def test_resolve(self):
+        index = build_index(self.path)
+        self.assertEqual(resolve(index, "top"), "top")
+        self.assertEqual(resolve(index, "tile"), "tile$top.gen[0].u_tile")
+        self.assertIsNone(resolve(index, "til"))
+
+    def test_empty_file(self):
+        empty = os.path.join(self.dir.name, "empty.rtlil")
+        open(empty, "w").close()
+        self.assertEqual(build_index(empty)["modules"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
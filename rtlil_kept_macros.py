@@ -20,54 +20,28 @@ Usage: rtlil_kept_macros.py --rtlil <file> --kept-modules <json> \\
 """
 import argparse
 import json
-import re
 import sys
 
+import rtlil_index
 
-def _base(name):
-    """Base module name (strip slang '$path' suffix)."""
-    return name.split("$", 1)[0]
+
+_base = rtlil_index.base_name
 
 
 def parse_rtlil(path):
-    """Stream the RTLIL. Return:
+    """Index the RTLIL (or load its rtlil_index.py sidecar). Return:
        - modules: dict of full_name -> list of (cell_type_full, inst_name)
        - top: the module marked with `attribute \\top 1` (or None)
 
     Yosys built-in cells (types starting with '$') are skipped — they
     are logical primitives, never user modules or macros.
     """
-    modules = {}
-    top = None
-    cur = None
-    saw_top_attr = False
-    module_re = re.compile(r"^module \\(\S+)")
-    cell_re = re.compile(r"^  cell \\(\S+) \\(\S+)")
-    with open(path) as f:
-        for line in f:
-            if line.startswith("attribute \\top 1"):
-                saw_top_attr = True
-                continue
-            m = module_re.match(line)
-            if m:
-                cur = m.group(1)
-                modules[cur] = []
-                if saw_top_attr:
-                    top = cur
-                saw_top_attr = False
-                continue
-            # Module-end at column 0.
-            if cur is not None and line == "end\n":
-                cur = None
-                continue
-            saw_top_attr = False
-            if cur is None:
-                continue
-            cm = cell_re.match(line)
-            if cm:
-                cell_type, inst = cm.group(1), cm.group(2)
-                modules[cur].append((cell_type, inst))
-    return modules, top
+    index = rtlil_index.load(path)
+    modules = {
+        name: [tuple(cell) for cell in entry["cells"]]
+        for name, entry in index["modules"].items()
+    }
+    return modules, index["top"]
 
 
 def build_base_to_full(modules):
@@ -106,6 +80,88 @@ def collect_macros_under(start_full, modules, by_base, kept_bases, macro_bases):
     return found
 
 
+def subtree_macro_sets(modules, by_base, kept_bases, macro_bases):
+    """Return dict: full module name -> frozenset of macro base names
+    reachable from it, with the same stopping rules as
+    collect_macros_under.
+
+    Computed bottom-up in one pass over the hierarchy, so a non-kept
+    submodule shared by many parents (e.g. an arbiter instantiated in
+    hundreds of slang-suffixed variants) is walked once rather than once
+    per kept module. Strongly connected components (Tarjan, iterative)
+    cover the by_base expansion, which can turn a module whose cells
+    reference its own base into a cycle.
+    """
+    direct = {}
+    succ = {}
+    for full, cells in modules.items():
+        found = set()
+        children = {}
+        for cell_type_full, _inst in cells:
+            cell_base = _base(cell_type_full)
+            if cell_base in macro_bases:
+                found.add(cell_base)
+            elif cell_base not in kept_bases:
+                for child in by_base.get(cell_base, []):
+                    children[child] = True
+        direct[full] = found
+        succ[full] = list(children)
+
+    # Tarjan emits each SCC only after every SCC it reaches, so the
+    # successors' sets are final by the time a component is merged.
+    result = {}
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    for root in modules:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(succ[root]))]
+        while work:
+            node, children = work[-1]
+            descended = False
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(succ[child])))
+                    descended = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] != index[node]:
+                continue
+            members = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                members.append(member)
+                if member == node:
+                    break
+            found = set()
+            for member in members:
+                found |= direct[member]
+                for child in succ[member]:
+                    # Children in this same component aren't in result
+                    # yet; their direct macros are already merged above.
+                    found |= result.get(child, frozenset())
+            found = frozenset(found)
+            for member in members:
+                result[member] = found
+    return result
+
+
 def derive_kept_macros(modules, top, kept_modules, macros):
     """Return dict: kept_module_name -> sorted list of macro names it uses.
     The synthetic key '_top' represents the residue — macros instantiated
@@ -114,6 +170,10 @@ def derive_kept_macros(modules, top, kept_modules, macros):
     macro_bases = set(macros)
     by_base = build_base_to_full(modules)
 
+    # Reachable-macro set of every module, computed once and shared by
+    # all kept modules and the top.
+    reachable = subtree_macro_sets(modules, by_base, kept_bases, macro_bases)
+
     derived = {}
     # One partition per kept module.
     for base in sorted(kept_bases):
@@ -121,13 +181,7 @@ def derive_kept_macros(modules, top, kept_modules, macros):
         # take the union of macros reachable from any of them.
         union = set()
         for full in by_base.get(base, []):
-            union |= collect_macros_under(
-                full,
-                modules,
-                by_base,
-                kept_bases,
-                macro_bases,
-            )
+            union |= reachable[full]
         if union:
             derived[base] = sorted(union)
 
@@ -143,13 +197,7 @@ def derive_kept_macros(modules, top, kept_modules, macros):
             else (top_full_candidates[0] if top_full_candidates else None)
         )
         if start is not None:
-            top_macros = collect_macros_under(
-                start,
-                modules,
-                by_base,
-                kept_bases,
-                macro_bases,
-            )
+            top_macros = reachable.get(start, frozenset())
             if top_macros:
                 derived["_top"] = sorted(top_macros)
     return derived
@@ -171,7 +219,11 @@ def format_dict(d):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--rtlil", required=True)
+    ap.add_argument(
+        "--rtlil",
+        required=True,
+        help="Canonicalize RTLIL, or its rtlil_index.py sidecar",
+    )
     ap.add_argument(
         "--kept-modules",
         required=True,
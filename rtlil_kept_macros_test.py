@@ -2,6 +2,7 @@
 """Unit tests for rtlil_kept_macros.py."""
 
 import os
+import random
 import tempfile
 import unittest
 
@@ -12,6 +13,7 @@ from rtlil_kept_macros import (
     derive_kept_macros,
     format_dict,
     parse_rtlil,
+    subtree_macro_sets,
 )
 
 
@@ -221,6 +223,58 @@ class TestCollectMacrosUnder(unittest.TestCase):
         self.assertEqual(found, {"sram"})
 
 
+class TestSubtreeMacroSets(unittest.TestCase):
+    def test_matches_per_module_dfs(self):
+        # Random DAGs with shared submodules, slang variants and kept
+        # cut points: the memoized sets must equal a fresh DFS per module.
+        rng = random.Random(1234)
+        for _ in range(50):
+            names = ["m{}".format(i) for i in range(30)]
+            full = {
+                n: [n] + ["{}$v{}".format(n, j) for j in range(rng.randint(0, 2))]
+                for n in names
+            }
+            macros = ["sram{}".format(i) for i in range(4)]
+            modules = {m: [] for n in names for m in full[n]}
+            for i, n in enumerate(names):
+                for m in full[n]:
+                    for child in rng.sample(names[i + 1 :], min(3, len(names) - i - 1)):
+                        modules[m].append((rng.choice(full[child]), "u"))
+                    if rng.random() < 0.3:
+                        modules[m].append((rng.choice(macros), "u_mem"))
+            kept = set(rng.sample(names, 5))
+            by_base = build_base_to_full(modules)
+            memo = subtree_macro_sets(modules, by_base, kept, set(macros))
+            for m in modules:
+                self.assertEqual(
+                    memo[m],
+                    collect_macros_under(m, modules, by_base, kept, set(macros)),
+                )
+
+    def test_self_referencing_base_cycle(self):
+        # worker$a instantiates worker$b; the by_base expansion makes
+        # worker$a and worker$b reach each other.
+        modules = {
+            "worker$a": [("worker$b", "u_b")],
+            "worker$b": [("sram", "u_sram")],
+            "top": [("worker$a", "u_a")],
+        }
+        by_base = build_base_to_full(modules)
+        memo = subtree_macro_sets(modules, by_base, set(), {"sram"})
+        self.assertEqual(memo["worker$a"], {"sram"})
+        self.assertEqual(memo["worker$b"], {"sram"})
+        self.assertEqual(memo["top"], {"sram"})
+
+    def test_deep_hierarchy(self):
+        # Deep chains must not hit Python's recursion limit.
+        depth = 5000
+        modules = {"m{}".format(i): [("m{}".format(i + 1), "u")] for i in range(depth)}
+        modules["m{}".format(depth)] = [("sram", "u_sram")]
+        by_base = build_base_to_full(modules)
+        memo = subtree_macro_sets(modules, by_base, set(), {"sram"})
+        self.assertEqual(memo["m0"], {"sram"})
+
+
 class TestDeriveKeptMacros(unittest.TestCase):
     def test_top_residue_under_top_key(self):
         # With no kept modules, every macro is in the top residue.
@@ -1,8 +1,10 @@
 #!/usr/bin/env bash
 # Per-partition parallel synthesis.
-# Reads kept_modules.json, picks modules where index % N == partition_id,
-# and synthesizes each from its dedicated per-module RTLIL slice (produced
-# by synth_canonicalize_module.tcl). The per-module slice already has all
+# Reads kept_modules.json, picks this partition's modules (from the
+# SYNTH_PARTITION_MANIFEST written by synth_partition_plan.py when set,
+# otherwise index % N == partition_id), and synthesizes each from its
+# dedicated per-module RTLIL slice (produced by
+# synth_canonicalize_module.tcl). The per-module slice already has all
 # other kept modules blackboxed and the target renamed to its bare name,
 # so synth.tcl just needs DESIGN_NAME=<bare> and SYNTH_CHECKPOINT=<slice>.
 #
@@ -14,6 +16,11 @@
 # Environment:
 #   SYNTH_PARTITION_ID   - this partition's index (0..N-1) or "top"
 #   SYNTH_NUM_PARTITIONS - total number of partitions
+#   SYNTH_PARTITION_MANIFEST - optional cost-balanced assignment, lines of
+#                          "<partition_id>\t<module>[\t<cost>]"
+#   SYNTH_RTLIL_INDEX    - optional rtlil_index.py sidecar of the canonical
+#                          RTLIL, used by the top partition to resolve
+#                          kept-module names (with RTLIL_INDEX_SCRIPT)
 #   RESULTS_DIR, SCRIPTS_DIR, etc. - standard ORFS env
 set -euo pipefail
 
@@ -45,25 +52,33 @@ if [ "$PARTITION_ID" = "top" ]; then
     CHECKPOINT="$RESULTS_DIR/1_1_yosys_canonicalize.rtlil"
     # SYNTH_KEEP_MODULES carries bare names; resolve each to canonical for
     # blackboxing. Same algorithm as synth_canonicalize_module.tcl.
-    RTLIL_MODULES_FILE=$(mktemp)
-    grep '^module \\' "$CHECKPOINT" | sed 's/^module \\//;s/ .*//' | grep -v '^$' > "$RTLIL_MODULES_FILE"
-    RESOLVED_MODULES=()
-    for module in $ALL_MODULES; do
-      if grep -qxF "$module" "$RTLIL_MODULES_FILE"; then
-        RESOLVED_MODULES+=("$module")
-      else
-        canonical=$(grep -m1 "^$(printf '%s' "$module" | sed 's/[.[\*^$()+?{|\\]/\\&/g')\\$" "$RTLIL_MODULES_FILE" || true)
-        if [ -z "$canonical" ]; then
-          echo "ERROR: SYNTH_KEEP_MODULES lists '$module' but it does not exist in the design." >&2
-          echo "Available modules: $(tr '\n' ' ' < "$RTLIL_MODULES_FILE")" >&2
-          rm -f "$RTLIL_MODULES_FILE"
-          exit 1
+    if [ -n "${SYNTH_RTLIL_INDEX:-}" ]; then
+      # rtlil_index.py sidecar: resolve all names in one lookup instead
+      # of grepping the multi-GB checkpoint. Errors are reported by
+      # rtlil_index.py itself.
+      # shellcheck disable=SC2086
+      ALL_MODULES=$("$PYTHON_EXE" "$RTLIL_INDEX_SCRIPT" resolve "$SYNTH_RTLIL_INDEX" $ALL_MODULES)
+    else
+      RTLIL_MODULES_FILE=$(mktemp)
+      grep '^module \\' "$CHECKPOINT" | sed 's/^module \\//;s/ .*//' | grep -v '^$' > "$RTLIL_MODULES_FILE"
+      RESOLVED_MODULES=()
+      for module in $ALL_MODULES; do
+        if grep -qxF "$module" "$RTLIL_MODULES_FILE"; then
+          RESOLVED_MODULES+=("$module")
+        else
+          canonical=$(grep -m1 "^$(printf '%s' "$module" | sed 's/[.[\*^$()+?{|\\]/\\&/g')\\$" "$RTLIL_MODULES_FILE" || true)
+          if [ -z "$canonical" ]; then
+            echo "ERROR: SYNTH_KEEP_MODULES lists '$module' but it does not exist in the design." >&2
+            echo "Available modules: $(tr '\n' ' ' < "$RTLIL_MODULES_FILE")" >&2
+            rm -f "$RTLIL_MODULES_FILE"
+            exit 1
+          fi
+          RESOLVED_MODULES+=("$canonical")
         fi
-        RESOLVED_MODULES+=("$canonical")
-      fi
-    done
-    rm -f "$RTLIL_MODULES_FILE"
-    ALL_MODULES=$(printf '%s\n' "${RESOLVED_MODULES[@]}")
+      done
+      rm -f "$RTLIL_MODULES_FILE"
+      ALL_MODULES=$(printf '%s\n' "${RESOLVED_MODULES[@]}")
+    fi
   else
     CHECKPOINT="$RESULTS_DIR/1_1_yosys_keep.rtlil"
   fi
@@ -78,15 +93,24 @@ if [ "$PARTITION_ID" = "top" ]; then
   exit 0
 fi
 
-# Pick this partition's modules: index % N == partition_id
+# Pick this partition's modules: from the planner's manifest when given,
+# else round-robin (index % N == partition_id).
 MY_MODULES=()
-idx=0
-while IFS= read -r module; do
-  if (( idx % NUM_PARTITIONS == PARTITION_ID )); then
-    MY_MODULES+=("$module")
-  fi
-  ((idx++)) || true
-done <<< "$ALL_MODULES"
+if [ -n "${SYNTH_PARTITION_MANIFEST:-}" ]; then
+  while IFS= read -r module; do
+    if [ -n "$module" ]; then
+      MY_MODULES+=("$module")
+    fi
+  done < <(awk -F'\t' -v p="$PARTITION_ID" '!/^#/ && $1 == p { print $2 }' "$SYNTH_PARTITION_MANIFEST")
+else
+  idx=0
+  while IFS= read -r module; do
+    if (( idx % NUM_PARTITIONS == PARTITION_ID )); then
+      MY_MODULES+=("$module")
+    fi
+    ((idx++)) || true
+  done <<< "$ALL_MODULES"
+fi
 
 if [ ${#MY_MODULES[@]} -eq 0 ]; then
   # No modules assigned to this partition — produce empty output
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Plan which kept modules each parallel synthesis partition synthesizes.
+
+synth_partition.sh historically assigned kept modules round-robin
+(index % N == partition_id). With uneven module sizes one partition
+collects every large tile while the others finish in seconds, and the
+wall time of the parallel synth phase is that of the slowest partition.
+
+This planner estimates a cost per kept module and bin-packs the modules
+into N partitions with the longest-processing-time-first (LPT)
+heuristic: modules are taken in decreasing cost order and each goes to
+the currently least-loaded partition.
+
+Costs come from, in order of preference:
+  1. historical synth logs (1_2_yosys_partition_<id>_<module>.log) —
+     "Elapsed time" of a previous run, in seconds;
+  2. the per-module RTLIL slice (partition_<sanitized>_canonical.rtlil)
+     — a weighted sum of cells, wire bits and memory bits.
+
+Modules with a log but no slice, or vice versa, are put on a common
+scale using the median seconds-per-RTLIL-cost ratio of modules that
+have both.
+
+The manifest is a tab-separated text file, one `<partition_id>\\t<module>`
+line per kept module, so synth_partition.sh can read it with awk.
+
+Usage: synth_partition_plan.py --kept-modules <json> --num-partitions <N>
+                               [--rtlil-dir <dir>] [--log-dir <dir>]
+                               --output <manifest>
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import statistics
+import sys
+
+# Relative weights for the RTLIL cost estimate. Cells dominate yosys
+# runtime (techmap/abc scale with them); memory bits that are not
+# mapped to macros are lowered to flops plus read muxes, so each bit
+# costs about as much as a cell. Wires are cheap but track datapath
+# width in modules that are still mostly unexpanded $-cells.
+CELL_WEIGHT = 1.0
+WIRE_BIT_WEIGHT = 0.05
+MEMORY_BIT_WEIGHT = 1.0
+
+_WIRE_RE = re.compile(r"^\s*wire (?:.*?\bwidth (\d+)\b)?")
+_MEMORY_RE = re.compile(r"^\s*memory\b.*?\bwidth (\d+)\b.*?\bsize (\d+)\b")
+_ELAPSED_RE = re.compile(r"Elapsed time: (?:(\d+):)?(\d+):(\d+(?:\.\d+)?)")
+_TOOK_RE = re.compile(r"Took (\d+) seconds")
+_LOG_RE = re.compile(r"^1_2_yosys_partition_\d+_(.+)\.log$")
+
+
+def sanitize(name):
+    """Filename component for a module name. Must stay in lockstep with
+    synth_partition.sh's sanitize() and rules.bzl's per-module artifact
+    naming."""
+    return name.translate(str.maketrans("$.[]", "____"))
+
+
+def rtlil_cost(path):
+    """Estimate synthesis cost of a per-module RTLIL slice.
+
+    Blackboxed modules (the other kept modules, macros) have no body to
+    synthesize and are not counted.
+    """
+    cells = 0
+    wire_bits = 0
+    memory_bits = 0
+    blackbox = False
+    in_blackbox = False
+    with open(path) as f:
+        for line in f:
+            if line.startswith("attribute \\blackbox 1"):
+                blackbox = True
+                continue
+            if line.startswith("module "):
+                in_blackbox = blackbox
+                blackbox = False
+                continue
+            if line.startswith("attribute "):
+                continue
+            blackbox = False
+            if in_blackbox:
+                continue
+            stripped = line.lstrip()
+            if stripped.startswith("cell "):
+                cells += 1
+            elif stripped.startswith("wire "):
+                m = _WIRE_RE.match(line)
+                wire_bits += int(m.group(1)) if m and m.group(1) else 1
+            elif stripped.startswith("memory "):
+                m = _MEMORY_RE.match(line)
+                if m:
+                    memory_bits += int(m.group(1)) * int(m.group(2))
+    return (
+        CELL_WEIGHT * cells
+        + WIRE_BIT_WEIGHT * wire_bits
+        + MEMORY_BIT_WEIGHT * memory_bits
+    )
+
+
+def log_seconds(path):
+    """Return the wall time recorded in a yosys log, or None."""
+    seconds = None
+    with open(path, errors="replace") as f:
+        for line in f:
+            m = _ELAPSED_RE.search(line)
+            if m:
+                hours = int(m.group(1)) if m.group(1) else 0
+                seconds = hours * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+                continue
+            m = _TOOK_RE.search(line)
+            if m:
+                seconds = float(m.group(1))
+    return seconds
+
+
+def log_costs(log_dir, modules):
+    """Map module -> seconds from partition logs of a previous run.
+
+    Log filenames carry the module name truncated to 80 characters (see
+    synth_partition.sh), so match on that prefix.
+    """
+    by_prefix = {}
+    for m in modules:
+        by_prefix.setdefault(m[:80], []).append(m)
+    costs = {}
+    for entry in sorted(os.listdir(log_dir)):
+        lm = _LOG_RE.match(entry)
+        if not lm or lm.group(1) not in by_prefix:
+            continue
+        seconds = log_seconds(os.path.join(log_dir, entry))
+        if seconds is None:
+            continue
+        for m in by_prefix[lm.group(1)]:
+            costs[m] = seconds
+    return costs
+
+
+def estimate_costs(modules, rtlil_dir=None, log_dir=None):
+    """Return dict module -> cost, preferring historical log times.
+
+    Modules with no data at all get the mean cost of the others, or 1.0
+    if nothing is known (degenerates to a count-balanced plan).
+    """
+    rtlil = {}
+    if rtlil_dir:
+        for m in modules:
+            path = os.path.join(
+                rtlil_dir, "partition_{}_canonical.rtlil".format(sanitize(m))
+            )
+            if os.path.exists(path):
+                rtlil[m] = rtlil_cost(path)
+    logs = log_costs(log_dir, modules) if log_dir else {}
+
+    costs = {}
+    if logs:
+        ratios = [logs[m] / rtlil[m] for m in logs if rtlil.get(m)]
+        scale = statistics.median(ratios) if ratios else None
+        for m in modules:
+            if m in logs:
+                costs[m] = logs[m]
+            elif m in rtlil and scale is not None:
+                costs[m] = rtlil[m] * scale
+    else:
+        costs = dict(rtlil)
+
+    default = sum(costs.values()) / len(costs) if costs else 1.0
+    for m in modules:
+        costs.setdefault(m, default)
+    return costs
+
+
+def plan_partitions(modules, costs, num_partitions):
+    """Longest-processing-time-first bin packing.
+
+    Returns a list of num_partitions module lists. Deterministic: ties
+    in cost keep input order, ties in load go to the lowest partition
+    id, and each partition lists its modules in input order.
+    """
+    order = {m: i for i, m in enumerate(modules)}
+    heap = [(0.0, p) for p in range(num_partitions)]
+    assigned = [[] for _ in range(num_partitions)]
+    for m in sorted(modules, key=lambda m: (-costs[m], order[m])):
+        load, p = heapq.heappop(heap)
+        assigned[p].append(m)
+        heapq.heappush(heap, (load + costs[m], p))
+    return [sorted(a, key=order.__getitem__) for a in assigned]
+
+
+def write_manifest(path, partitions, costs):
+    """Write the `<partition_id>\\t<module>` manifest."""
+    with open(path, "w") as f:
+        f.write("# partition\tmodule\tcost\n")
+        for p, mods in enumerate(partitions):
+            for m in mods:
+                f.write("{}\t{}\t{:.1f}\n".format(p, m, costs[m]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--kept-modules",
+        required=True,
+        help='JSON: {"modules": [...]} (same shape as kept_modules.json)',
+    )
+    ap.add_argument("--num-partitions", type=int, required=True)
+    ap.add_argument(
+        "--rtlil-dir",
+        help="Directory holding partition_<module>_canonical.rtlil slices",
+    )
+    ap.add_argument(
+        "--log-dir",
+        help="Directory holding 1_2_yosys_partition_*.log from a previous run",
+    )
+    ap.add_argument("--output", required=True, help="Output manifest")
+    args = ap.parse_args()
+
+    with open(args.kept_modules) as f:
+        modules = json.load(f)["modules"]
+    costs = estimate_costs(modules, args.rtlil_dir, args.log_dir)
+    partitions = plan_partitions(modules, costs, args.num_partitions)
+    write_manifest(args.output, partitions, costs)
+
+    loads = [sum(costs[m] for m in mods) for mods in partitions]
+    print(
+        "Planned {} modules into {} partitions, max/mean load {:.2f}".format(
+            len(modules),
+            args.num_partitions,
+            max(loads) / (sum(loads) / len(loads)) if sum(loads) else 1.0,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Unit tests for synth_partition_plan.py."""
+
+import os
+import tempfile
+import unittest
+
+from synth_partition_plan import (
+    estimate_costs,
+    log_seconds,
+    plan_partitions,
+    rtlil_cost,
+    sanitize,
+    write_manifest,
+)
+
+
+SLICE_RTLIL = """\
+attribute \\blackbox 1
+module \\other_kept
+  wire width 64 input 1 \\a
+  cell $and $ignored
+  end
+end
+attribute \\top 1
+module \\tile
+  wire width 8 \\x
+  wire \\y
+  memory width 4 size 16 \\mem
+  cell $and $1
+  end
+  cell $or $2
+  end
+end
+"""
+
+
+class TestRtlilCost(unittest.TestCase):
+    def test_counts_cells_wires_memories(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "slice.rtlil")
+            with open(path, "w") as f:
+                f.write(SLICE_RTLIL)
+            # 2 cells + 9 wire bits * 0.05 + 64 memory bits; the
+            # blackboxed module is not counted.
+            self.assertAlmostEqual(rtlil_cost(path), 2 + 9 * 0.05 + 64)
+
+
+class TestLogSeconds(unittest.TestCase):
+    def test_elapsed_time(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "x.log")
+            with open(path, "w") as f:
+                f.write("Elapsed time: 1:02:03.50[h:]min:sec. CPU time: user 1 sys 0\n")
+            self.assertAlmostEqual(log_seconds(path), 3723.5)
+
+    def test_no_timing(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "x.log")
+            with open(path, "w") as f:
+                f.write("nothing here\n")
+            self.assertIsNone(log_seconds(path))
+
+
+class TestEstimateCosts(unittest.TestCase):
+    def test_logs_preferred_and_rtlil_rescaled(self):
+        with tempfile.TemporaryDirectory() as d:
+            for name, cells in (("a$x.y[0]", 10), ("b", 40)):
+                path = os.path.join(
+                    d, "partition_{}_canonical.rtlil".format(sanitize(name))
+                )
+                with open(path, "w") as f:
+                    f.write("module \\m\n" + "  cell $and $c\n  end\n" * cells)
+                    f.write("end\n")
+            with open(os.path.join(d, "1_2_yosys_partition_0_a$x.y[0].log"), "w") as f:
+                f.write("Elapsed time: 0:20.00[h:]min:sec.\n")
+            costs = estimate_costs(["a$x.y[0]", "b", "c"], rtlil_dir=d, log_dir=d)
+        self.assertAlmostEqual(costs["a$x.y[0]"], 20.0)
+        # 2 s/cell from module a, applied to b's 40 cells.
+        self.assertAlmostEqual(costs["b"], 80.0)
+        # No data: mean of the known costs.
+        self.assertAlmostEqual(costs["c"], 50.0)
+
+    def test_no_data_is_uniform(self):
+        costs = estimate_costs(["a", "b"])
+        self.assertEqual(costs, {"a": 1.0, "b": 1.0})
+
+
+class TestPlanPartitions(unittest.TestCase):
+    def test_lpt_beats_round_robin(self):
+        modules = ["big1", "small1", "big2", "small2"]
+        costs = {"big1": 100, "small1": 1, "big2": 100, "small2": 1}
+        # Round-robin would put both big modules in partition 0.
+        self.assertEqual(
+            plan_partitions(modules, costs, 2),
+            [["big1", "small1"], ["big2", "small2"]],
+        )
+
+    def test_more_partitions_than_modules(self):
+        plan = plan_partitions(["a"], {"a": 5}, 3)
+        self.assertEqual(plan, [["a"], [], []])
+
+    def test_deterministic_ties(self):
+        modules = ["a", "b", "c", "d"]
+        costs = dict.fromkeys(modules, 1)
+        self.assertEqual(plan_partitions(modules, costs, 2), [["a", "c"], ["b", "d"]])
+
+
+class TestWriteManifest(unittest.TestCase):
+    def test_format(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "plan.txt")
+            write_manifest(path, [["a"], ["b[0]"]], {"a": 2, "b[0]": 1})
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(lines[1:], ["0\ta\t2.0", "1\tb[0]\t1.0"])
+        self.assertTrue(lines[0].startswith("#"))
+
+
+if __name__ == "__main__":
+    unittest.main()
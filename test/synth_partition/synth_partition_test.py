@@ -84,5 +84,57 @@ class TestKeptModulesParser(unittest.TestCase):
         self.assertEqual(modules, ["only"])
 
 
+# The manifest selection line in synth_partition.sh, isolated the same way.
+MANIFEST_CMD = (
+    "awk -F'\\t' -v p=\"$PARTITION_ID\" '!/^#/ && $1 == p { print $2 }' "
+    '"$SYNTH_PARTITION_MANIFEST"'
+)
+
+
+def _run_manifest(manifest_text, partition_id):
+    """Select one partition's modules from a planner manifest."""
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
+        f.write(manifest_text)
+        path = f.name
+    try:
+        result = subprocess.run(
+            ["bash", "-c", MANIFEST_CMD],
+            env={
+                **os.environ,
+                "SYNTH_PARTITION_MANIFEST": path,
+                "PARTITION_ID": str(partition_id),
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    finally:
+        os.unlink(path)
+    return [line for line in result.stdout.splitlines() if line]
+
+
+class TestPartitionManifest(unittest.TestCase):
+    MANIFEST = (
+        "# partition\tmodule\tcost\n"
+        "0\tbig\t100.0\n"
+        "1\tcore.tile[12].bank[7]\t40.0\n"
+        "1\tsmall\t1.0\n"
+        "10\tother\t1.0\n"
+    )
+
+    def test_selects_own_partition(self):
+        self.assertEqual(
+            _run_manifest(self.MANIFEST, 1),
+            ["core.tile[12].bank[7]", "small"],
+        )
+
+    def test_partition_id_matched_exactly(self):
+        # "1" must not match "10".
+        self.assertEqual(_run_manifest(self.MANIFEST, 10), ["other"])
+
+    def test_empty_partition(self):
+        self.assertEqual(_run_manifest(self.MANIFEST, 2), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -80,58 +80,33 @@ def parse_stats(report):
 # Extract Elapsed Time line from log file
 # Elapsed time: 0:04.26[h:]min:sec. CPU time: user 4.08 sys 0.17 (99%). \
 # Peak memory: 671508KB.
-def print_log_dir_times(f):
-    first = True
-    totalElapsed = 0
-    total_max_memory = 0
+ELAPSED_RE = re.compile(r"Elapsed time: ([\d:.]+)")
+
 
+def print_log_dir_times(f):
+    """Total elapsed seconds of every time summary in the log, or "N/A"."""
     if not os.path.exists(f):
         return "N/A"
 
-    with open(f) as logfile:
-        found = False
+    total = None
+    with open(f, errors="replace") as logfile:
         for line in logfile:
-            elapsedTime = None
-            peak_memory = None
-
-            if "Elapsed time" in line:
-                found = True
-                # Extract the portion that has the time
-                timePor = line.strip().replace("Elapsed time: ", "")
-                # Remove the units from the time portion
-                timePor = timePor.split("[h:]", 1)[0]
-                # Remove any fraction of a second
-                timePor = timePor.split(".", 1)[0]
-                # Calculate elapsed time that has this format 'h:m:s'
-                timeList = timePor.split(":")
-                if len(timeList) == 2:
-                    # Only minutes and seconds are present
-                    elapsedTime = int(timeList[0]) * 60 + int(timeList[1])
-                elif len(timeList) == 3:
-                    # Hours, minutes, and seconds are present
-                    elapsedTime = (
-                        int(timeList[0]) * 3600
-                        + int(timeList[1]) * 60
-                        + int(timeList[2])
-                    )
-                else:
-                    print("Elapsed time not understood in", str(line), file=sys.stderr)
-                # Find Peak Memory
-                peak_memory = int(
-                    int(line.split("Peak memory: ")[1].split("KB")[0]) / 1024
-                )
-
-        if not found:
-            print("No elapsed time found in", str(f), file=sys.stderr)
-
-        # Print the name of the step and the corresponding elapsed time
-        if elapsedTime is not None and peak_memory is not None:
-            if first:
-                first = False
-        totalElapsed += elapsedTime
-        total_max_memory = max(total_max_memory, int(peak_memory))
-
-    return totalElapsed
+            m = ELAPSED_RE.search(line)
+            if not m:
+                continue
+            # [h:]m:s[.frac]
+            parts = m.group(1).rstrip(".").split(":")
+            if not 2 <= len(parts) <= 3:
+                print("Elapsed time not understood in", line, file=sys.stderr)
+                continue
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+            total = (total or 0.0) + seconds
+    if total is None:
+        print("No elapsed time found in", str(f), file=sys.stderr)
+        return "N/A"
+    return int(total)
 
 
 def main():
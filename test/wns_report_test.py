@@ -34,3 +34,18 @@ def test_parse_stats():
     }
 
     assert wns_report.parse_stats(report) == expected_stats
+
+
+def test_print_log_dir_times(tmp_path):
+    log = tmp_path / "2_1_floorplan.log"
+    log.write_text(
+        "Elapsed time: 0:04.26[h:]min:sec. CPU time: user 4.08 sys 0.17 (99%). "
+        "Peak memory: 671508KB.\n"
+        "Took 3 seconds: tapcell\n"
+        "Elapsed time: 1:02:03.50[h:]min:sec. CPU time: user 1.0 sys 0.1 (99%). "
+        "Peak memory: 1024KB.\n"
+    )
+    assert wns_report.print_log_dir_times(str(log)) == 4 + 3723
+    assert wns_report.print_log_dir_times(str(tmp_path / "missing.log")) == "N/A"
+    log.write_text("no summary\n")
+    assert wns_report.print_log_dir_times(str(log)) == "N/A"
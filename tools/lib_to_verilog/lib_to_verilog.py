@@ -11,17 +11,30 @@ The existing ASAP7 PDK Verilog uses UDP primitives (altos_dff_sr_err, etc.)
 which Verilator doesn't support. This tool generates replacements using
 standard always blocks and continuous assigns.
 
+Input files are parsed concurrently in a process pool (--jobs) and merged
+in command-line order, so the output does not depend on scheduling. With
+--cache-dir (or $LIB_TO_VERILOG_CACHE) per-file parse results are stored
+under the SHA-256 of the file content and of the parser sources (this
+script and liberty.py), and unchanged libraries are not reparsed on the
+next run.
+
 Usage:
     python lib_to_verilog.py --lib SEQ.lib [--lef cells.lef] --dff dff.v --empty empty.v
 """
 
 import argparse
-import gzip
+import functools
+import hashlib
+import json
+import os
 import re
 import sys
-from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
+import liberty
+
 
 @dataclass
 class Pin:
@@ -63,135 +76,66 @@ class Cell:
 
 
 def parse_lib_cells(text: str) -> list[Cell]:
-    """Parse Liberty text and return cells that have ff or latch groups.
+    """Parse Liberty text and return cells that have ff or latch groups,
+    or at least one output pin with a `function`.
 
     Handles both multi-line and compact single-line Liberty syntax, e.g.:
         pin (CLK) { direction : input; }
         ff (IQ,IQN) { clocked_on : "CLK"; next_state : "D"; }
     """
-    cells = []
-    cell = None
-    current_pin = None
-    in_ff = False
-    in_latch = False
-    brace_depth = 0
-    cell_depth = 0
-    pin_depth = 0
-    ff_depth = 0
-    latch_depth = 0
-
-    for line in text.splitlines():
-        stripped = line.strip()
-
-        # Track brace depth at start of line (before opens on this line)
-        opens = stripped.count("{")
-        closes = stripped.count("}")
-
-        # Cell start — match before updating depth so cell_depth is correct
-        m = re.match(r"cell\s*\(\s*(\S+)\s*\)", stripped)
-        if m and not stripped.startswith("cell_"):
-            brace_depth += opens - closes
-            cell = Cell(name=m.group(1))
-            cell_depth = brace_depth
-            current_pin = None
-            in_ff = False
-            in_latch = False
-            continue
-
-        # Update depth for non-cell lines
-        brace_depth += opens - closes
-
-        if cell is None:
-            continue
-
-        # Cell end
-        if brace_depth < cell_depth:
-            has_combinational = any(
-                p.direction == "output" and p.function for p in cell.pins
-            )
-            if cell.ff or cell.latch or has_combinational:
-                cells.append(cell)
-            cell = None
-            continue
-
-        # Pin start (don't continue — attributes may be on same line)
-        m = re.search(r"(?<![pg_])pin\s*\(\s*(\S+)\s*\)", stripped)
-        if m and not re.search(r"pg_pin", stripped):
-            current_pin = Pin(name=m.group(1), direction="")
-            pin_depth = brace_depth
-            cell.pins.append(current_pin)
-
-        # Pin end (if brace closed on same or later line)
-        if current_pin and opens <= closes and brace_depth < pin_depth:
-            # Process attributes on this line first, then close
-            pass  # handled below after attribute extraction
-
-        # Pin attributes (use re.search for inline)
-        if current_pin:
-            m = re.search(r"direction\s*:\s*(\w+)", stripped)
-            if m:
-                current_pin.direction = m.group(1)
-            m = re.search(r'(?<!\w)function\s*:\s*"([^"]*)"', stripped)
-            if m:
-                current_pin.function = m.group(1)
-
-        # Close pin after processing attributes
-        if current_pin and brace_depth < pin_depth:
-            current_pin = None
-
-        # ff group start
-        m = re.search(r"ff\s*\(\s*(\w+)\s*,\s*(\w+)\s*\)", stripped)
-        if m:
-            cell.ff = FfInfo(var1=m.group(1), var2=m.group(2))
-            in_ff = True
-            ff_depth = brace_depth
-
-        # latch group start
-        m = re.search(r"latch\s*\(\s*(\w+)\s*,\s*(\w+)\s*\)", stripped)
-        if m:
-            cell.latch = LatchInfo(var1=m.group(1), var2=m.group(2))
-            in_latch = True
-            latch_depth = brace_depth
-
-        # ff attributes (use re.search for inline)
-        if in_ff and cell.ff:
-            m = re.search(r'clocked_on\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.ff.clocked_on = m.group(1)
-            m = re.search(r'next_state\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.ff.next_state = m.group(1)
-            m = re.search(r'clear\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.ff.clear = m.group(1)
-            m = re.search(r'preset\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.ff.preset = m.group(1)
-
-        # latch attributes
-        if in_latch and cell.latch:
-            m = re.search(r'enable\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.latch.enable = m.group(1)
-            m = re.search(r'data_in\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.latch.data_in = m.group(1)
-            m = re.search(r'clear\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.latch.clear = m.group(1)
-            m = re.search(r'preset\s*:\s*"([^"]*)"', stripped)
-            if m:
-                cell.latch.preset = m.group(1)
-
-        # ff/latch end
-        if in_ff and brace_depth < ff_depth:
-            in_ff = False
-        if in_latch and brace_depth < latch_depth:
-            in_latch = False
+    return cells_from_groups(liberty.Library.from_text(text).cells())
 
+
+def cells_from_groups(groups) -> list[Cell]:
+    """Convert liberty cell Groups to Cells, keeping the ones we model."""
+    cells = []
+    for group in groups:
+        cell = cell_from_group(group)
+        has_combinational = any(
+            p.direction == "output" and p.function for p in cell.pins
+        )
+        if cell.ff or cell.latch or has_combinational:
+            cells.append(cell)
     return cells
 
 
+def cell_from_group(group: liberty.Group) -> Cell:
+    """Build a Cell from a liberty cell group.
+
+    Pins are collected in file order, including per-bit pins nested in
+    bus() groups; pg_pin groups are power/ground, not signal pins.
+    """
+    cell = Cell(name=group.name)
+    for g in group.walk():
+        if g.kind == "pin":
+            cell.pins.append(
+                Pin(
+                    name=g.name,
+                    direction=g.get("direction", ""),
+                    function=g.get("function", ""),
+                )
+            )
+        elif g.kind == "ff" and len(g.args) == 2:
+            cell.ff = FfInfo(
+                var1=g.args[0],
+                var2=g.args[1],
+                clocked_on=g.get("clocked_on", ""),
+                next_state=g.get("next_state", ""),
+                clear=g.get("clear", ""),
+                preset=g.get("preset", ""),
+            )
+        elif g.kind == "latch" and len(g.args) == 2:
+            cell.latch = LatchInfo(
+                var1=g.args[0],
+                var2=g.args[1],
+                enable=g.get("enable", ""),
+                data_in=g.get("data_in", ""),
+                clear=g.get("clear", ""),
+                preset=g.get("preset", ""),
+            )
+    return cell
+
+
 def liberty_expr_to_verilog(expr: str) -> str:
     """Convert a Liberty Boolean expression to Verilog.
 
@@ -434,15 +378,6 @@ def generate_empty_v(lef_macros: set[str], lib_cells: set[str]) -> str:
     return "\n".join(parts) + "\n"
 
 
-def read_file(path: str) -> str:
-    """Read a file, decompressing .gz if needed."""
-    if path.endswith(".gz"):
-        with gzip.open(path, "rt") as f:
-            return f.read()
-    else:
-        return Path(path).read_text()
-
-
 def classify_files(paths: list[str]) -> tuple[list[str], list[str]]:
     """Classify files into .lib and .lef based on extension."""
     libs = []
@@ -455,6 +390,123 @@ def classify_files(paths: list[str]) -> tuple[list[str], list[str]]:
     return libs, lefs
 
 
+def parse_lib_file(path: str) -> tuple[list[Cell], list[str]]:
+    """Parse one .lib/.lib.gz file, streaming one cell at a time.
+
+    Returns the modelled cells and the names of all cells in the file
+    (including ones without a behavioral model).
+    """
+    cells = []
+    names = []
+    for group in liberty.Library(path).cells():
+        names.append(group.name)
+        cells.extend(cells_from_groups([group]))
+    return cells, names
+
+
+def parse_lef_file(path: str) -> set[str]:
+    """Return the MACRO names defined in one LEF file."""
+    return parse_lef_macros(Path(path).read_text())
+
+
+def cell_from_dict(d: dict) -> Cell:
+    """Inverse of dataclasses.asdict() for Cell (cache entries)."""
+    return Cell(
+        name=d["name"],
+        pins=[Pin(**p) for p in d["pins"]],
+        ff=FfInfo(**d["ff"]) if d["ff"] else None,
+        latch=LatchInfo(**d["latch"]) if d["latch"] else None,
+    )
+
+
+def _encode(kind: str, result) -> dict:
+    if kind == "lib":
+        cells, names = result
+        return {"cells": [asdict(c) for c in cells], "names": names}
+    return {"macros": sorted(result)}
+
+
+def _decode(kind: str, data: dict):
+    if kind == "lib":
+        return [cell_from_dict(c) for c in data["cells"]], data["names"]
+    return set(data["macros"])
+
+
+_PARSERS = {"lib": parse_lib_file, "lef": parse_lef_file}
+
+
+@functools.lru_cache(maxsize=None)
+def _parser_digest() -> str:
+    """Digest of the code behind a cache entry: this script and liberty.py.
+
+    Part of every cache key, so editing either one ignores old entries.
+    """
+    h = hashlib.sha256(Path(__file__).read_bytes())
+    h.update(Path(liberty.__file__).read_bytes())
+    return h.hexdigest()
+
+
+def _parse_cached(task: tuple[str, str, str | None]):
+    """Parse one (kind, path, cache_dir) task, consulting the cache.
+
+    The cache is best effort: unreadable or corrupt entries are reparsed,
+    and failures to write one are ignored.
+    """
+    kind, path, cache_dir = task
+    parse = _PARSERS[kind]
+    if not cache_dir:
+        return parse(path)
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    entry = Path(cache_dir) / f"{kind}-{_parser_digest()[:16]}-{digest}.json"
+    try:
+        return _decode(kind, json.loads(entry.read_text()))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    result = parse(path)
+    tmp = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(_encode(kind, result)))
+        os.replace(tmp, entry)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+    return result
+
+
+def parse_files(
+    lib_paths: list[str],
+    lef_paths: list[str],
+    jobs: int | None = None,
+    cache_dir: str | None = None,
+) -> tuple[list[Cell], set[str], set[str]]:
+    """Parse all .lib and LEF files, in parallel when jobs > 1.
+
+    Returns (cells, lib cell names, LEF macro names). Cells are in
+    command-line file order, then file order within a library, exactly as
+    a serial parse would produce them; duplicates across libraries are
+    kept, as before.
+    """
+    tasks = [("lib", p, cache_dir) for p in lib_paths]
+    tasks += [("lef", p, cache_dir) for p in lef_paths]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(tasks))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_parse_cached, tasks))
+    else:
+        results = [_parse_cached(t) for t in tasks]
+
+    all_cells = []
+    all_lib_cell_names = set()
+    for cells, names in results[: len(lib_paths)]:
+        all_cells.extend(cells)
+        all_lib_cell_names.update(names)
+    lef_macros = set().union(*results[len(lib_paths) :])
+    return all_cells, all_lib_cell_names, lef_macros
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate Verilator-compatible behavioral Verilog from Liberty .lib files"
@@ -488,6 +540,18 @@ def main():
     parser.add_argument(
         "--empty", required=True, help="Output path for physical-only cell empty stubs"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Parallel parser processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("LIB_TO_VERILOG_CACHE"),
+        help="Directory for per-file parse results keyed by content hash "
+        "(default: $LIB_TO_VERILOG_CACHE; no caching if unset)",
+    )
     args = parser.parse_args()
 
     # Auto-classify --srcs by extension
@@ -498,26 +562,15 @@ def main():
     if not lib_paths:
         parser.error("No .lib files provided (use --lib or --srcs)")
 
-    # Parse all .lib files
-    all_cells = []
-    all_lib_cell_names = set()
-    for lib_path in lib_paths:
-        text = read_file(lib_path)
-        cells = parse_lib_cells(text)
-        all_cells.extend(cells)
-        # Also collect all cell names (including non-sequential)
-        for m in re.finditer(r"^\s*cell\s*\(\s*(\S+)\s*\)", text, re.MULTILINE):
-            all_lib_cell_names.add(m.group(1))
+    all_cells, all_lib_cell_names, lef_macros = parse_files(
+        lib_paths, lef_paths, jobs=args.jobs, cache_dir=args.cache_dir
+    )
 
     # Generate dff.v
     dff_content = generate_dff_v(all_cells)
     Path(args.dff).write_text(dff_content)
 
-    # Parse LEF and generate empty.v
-    lef_macros = set()
-    for lef_path in lef_paths:
-        text = Path(lef_path).read_text()
-        lef_macros |= parse_lef_macros(text)
+    # Generate empty.v
     empty_content = generate_empty_v(lef_macros, all_lib_cell_names)
     Path(args.empty).write_text(empty_content)
 
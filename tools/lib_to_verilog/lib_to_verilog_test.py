@@ -1,7 +1,9 @@
 """Tests for lib_to_verilog.py — Liberty .lib to behavioral Verilog conversion."""
 
+import gzip
 import textwrap
 
+import lib_to_verilog
 from lib_to_verilog import (
     Cell,
     FfInfo,
@@ -13,6 +15,7 @@ from lib_to_verilog import (
     generate_ff_verilog,
     generate_latch_verilog,
     liberty_expr_to_verilog,
+    parse_files,
     parse_lef_macros,
     parse_lib_cells,
 )
@@ -640,3 +643,93 @@ class TestRealAsap7Lib:
             assert "always @(posedge CLK)" in v
             assert "QN <= ~D;" in v
             assert "endmodule" in v
+
+
+class TestParseFiles:
+    LIB_A = textwrap.dedent(
+        """\
+        library (a) {
+          cell (INV) {
+            pin (A) { direction : input; }
+            pin (Y) { direction : output; function : "!A"; }
+          }
+          cell (TAP) { area : 1; }
+        }
+    """
+    )
+    LIB_B = textwrap.dedent(
+        """\
+        library (b) {
+          cell (DFF) {
+            ff (IQ, IQN) { clocked_on : "CLK"; next_state : "D"; }
+            pin (CLK) { direction : input; }
+            pin (D) { direction : input; }
+            pin (Q) { direction : output; function : "IQ"; }
+          }
+          cell (INV) {
+            pin (A) { direction : input; }
+            pin (Y) { direction : output; function : "!A"; }
+          }
+        }
+    """
+    )
+    LEF = "MACRO TAP\nEND TAP\nMACRO FILL\nEND FILL\n"
+
+    def _files(self, tmp_path):
+        a = tmp_path / "a.lib"
+        a.write_text(self.LIB_A)
+        b = tmp_path / "b.lib.gz"
+        with gzip.open(b, "wt") as f:
+            f.write(self.LIB_B)
+        lef = tmp_path / "cells.lef"
+        lef.write_text(self.LEF)
+        return [str(a), str(b)], [str(lef)]
+
+    def test_parallel_matches_serial_order(self, tmp_path):
+        libs, lefs = self._files(tmp_path)
+        serial = parse_files(libs, lefs, jobs=1)
+        parallel = parse_files(libs, lefs, jobs=3)
+        assert parallel == serial
+        cells, names, macros = parallel
+        assert [c.name for c in cells] == ["INV", "DFF", "INV"]
+        assert names == {"INV", "TAP", "DFF"}
+        assert macros == {"TAP", "FILL"}
+
+    def test_cache_hit_skips_parse(self, tmp_path, monkeypatch):
+        libs, lefs = self._files(tmp_path)
+        cache = tmp_path / "cache"
+        first = parse_files(libs, lefs, jobs=1, cache_dir=str(cache))
+        assert len(list(cache.glob("*.json"))) == 3
+
+        def fail(path):
+            raise AssertionError(f"reparsed {path}")
+
+        monkeypatch.setitem(lib_to_verilog._PARSERS, "lib", fail)
+        monkeypatch.setitem(lib_to_verilog._PARSERS, "lef", fail)
+        assert parse_files(libs, lefs, jobs=1, cache_dir=str(cache)) == first
+
+    def test_parser_change_reparses(self, tmp_path, monkeypatch):
+        libs, lefs = self._files(tmp_path)
+        cache = tmp_path / "cache"
+        first = parse_files(libs, lefs, jobs=1, cache_dir=str(cache))
+        changed = tmp_path / "liberty.py"
+        changed.write_text("# a different parser\n")
+        monkeypatch.setattr(lib_to_verilog.liberty, "__file__", str(changed))
+        lib_to_verilog._parser_digest.cache_clear()
+        try:
+            assert parse_files(libs, lefs, jobs=1, cache_dir=str(cache)) == first
+        finally:
+            lib_to_verilog._parser_digest.cache_clear()
+        assert len(list(cache.glob("*.json"))) == 6
+
+    def test_changed_content_and_corrupt_entry_reparse(self, tmp_path):
+        libs, lefs = self._files(tmp_path)
+        cache = tmp_path / "cache"
+        parse_files(libs, lefs, jobs=1, cache_dir=str(cache))
+        for entry in cache.glob("lef-*.json"):
+            entry.write_text("{not json")
+        with open(libs[0], "w") as f:
+            f.write(self.LIB_A.replace("cell (INV)", "cell (INV2)"))
+        cells, _, macros = parse_files(libs, lefs, jobs=1, cache_dir=str(cache))
+        assert [c.name for c in cells] == ["INV2", "DFF", "INV"]
+        assert macros == {"TAP", "FILL"}
@@ -0,0 +1,523 @@
+"""Streaming Liberty (.lib / .lib.gz) tokenizer and group-tree parser.
+
+Shared by lib_to_verilog and memory_macro_scaler, which used to walk
+Liberty text line by line with a handful of regexes per line and needed
+the whole (decompressed) file in memory.
+
+Layers, each usable on its own:
+
+  lexemes(chunks)      every lexeme, including whitespace and comments, so
+                       a rewriter can reproduce the input byte for byte.
+  events(lexemes)      statements: group begin/end, simple attributes
+                       (`name : value ;`) and complex attributes
+                       (`name (args) ;`).
+  Library(source)      lazy group trees: library-level attributes and
+                       groups, and one Group per cell, built only when the
+                       caller iterates cells() and only for wanted cells.
+
+Files are read in CHUNK_SIZE pieces and decoded as latin-1, so character
+offsets equal byte offsets in the (decompressed) file. An optional
+persisted cell index (build_cell_index / write_cell_index) records
+each cell's byte range, letting Library.cells(names, index=...) seek
+straight to the cells it needs instead of parsing everything before them.
+
+Usage:
+  liberty.py index <lib[.gz]> <index.json>
+  liberty.py cells <lib[.gz]>
+"""
+
+import gzip
+import json
+import re
+import sys
+
+CHUNK_SIZE = 1 << 20
+INDEX_VERSION = 1
+
+# Lexeme kinds.
+WS = "ws"  # whitespace and backslash-newline continuations
+COMMENT = "comment"
+STRING = "string"  # "..." including the quotes
+PUNCT = "punct"  # one of ( ) { } : ; ,
+WORD = "word"  # anything else: names, numbers, expressions
+_TRIVIA = frozenset((WS, COMMENT))
+
+_TOKEN_RE = re.compile(
+    r"(?P<ws>(?:\s|\\\r?\n)+)"
+    r"|(?P<comment>/\*.*?\*/)"
+    r'|(?P<string>"(?:[^"\\]|\\.)*")'
+    r"|(?P<punct>[(){}:;,])"
+    r'|(?P<word>(?:[^\s(){}:;,"\\/]|/(?!\*)|\\(?!\r?\n))+)',
+    re.DOTALL,
+)
+
+# Event kinds.
+BEGIN = "begin"  # (BEGIN, name, args, offset, raw)
+END = "end"  # (END, None, None, offset, raw)
+ATTR = "attr"  # (ATTR, name, value, offset, raw)
+COMPLEX = "complex"  # (COMPLEX, name, args, offset, raw)
+EOF = "eof"  # (EOF, None, None, None, raw): trailing trivia, keep_raw only
+
+
+class LibertyError(ValueError):
+    """Malformed Liberty input."""
+
+
+def unquote(text):
+    """Strip surrounding double quotes from a string lexeme."""
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1]
+    return text
+
+
+def open_chunks(path, chunk_size=CHUNK_SIZE, start=0, length=None):
+    """Yield latin-1 text chunks of a .lib or .lib.gz file.
+
+    start/length select a byte range of the decompressed content.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as f:
+        if start:
+            f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            data = f.read(size)
+            if not data:
+                return
+            if remaining is not None:
+                remaining -= len(data)
+            yield data.decode("latin-1")
+
+
+def lexemes(chunks, base=0):
+    """Yield (kind, text, offset) for every lexeme in a stream of chunks.
+
+    Concatenating the texts reproduces the input exactly.
+    """
+    it = iter(chunks)
+    buf = ""
+    pos = 0
+    eof = False
+    match = _TOKEN_RE.match
+    while True:
+        m = match(buf, pos)
+        # A lexeme touching the end of the buffer may continue in the next
+        # chunk (the guard char also covers a split backslash-CR-LF).
+        if not eof and (m is None or m.end() >= len(buf) - 1):
+            chunk = next(it, None)
+            if chunk is None:
+                eof = True
+            else:
+                base += pos
+                buf = buf[pos:] + chunk
+                pos = 0
+            continue
+        if m is None:
+            if pos >= len(buf):
+                return
+            what = {'"': "string", "/": "comment"}.get(buf[pos], repr(buf[pos]))
+            raise LibertyError(f"unterminated {what} at offset {base + pos}")
+        yield m.lastgroup, m.group(), base + pos
+        pos = m.end()
+
+
+class _Tokens:
+    """Significant-token cursor over lexemes, with one-token pushback.
+
+    When keep is set, every lexeme consumed (trivia included) is also
+    collected as a mutable [text] cell in self.raw so an event consumer
+    can rewrite tokens in place and re-emit the input.
+    """
+
+    def __init__(self, lexemes_iter, keep):
+        self._it = lexemes_iter
+        self._keep = keep
+        self._back = None
+        self.raw = []
+
+    def next(self):
+        if self._back is not None:
+            tok, self._back = self._back, None
+            return tok
+        for kind, text, offset in self._it:
+            if self._keep:
+                cell = [text]
+                self.raw.append(cell)
+            else:
+                cell = None
+            if kind in _TRIVIA:
+                continue
+            return kind, text, offset, cell
+        return None
+
+    def push_back(self, tok):
+        self._back = tok
+
+    def take_raw(self):
+        raw, self.raw = self.raw, []
+        return raw
+
+
+def events(lexeme_iter, keep_raw=False):
+    """Turn lexemes into statement events.
+
+    Yields (kind, name, value, offset, raw):
+      BEGIN    name, args list (unquoted)      `name (args) {`
+      END      -                               `}` (offset is after it)
+      ATTR     name, value (unquoted string)   `name : value ;`
+      COMPLEX  name, args list (unquoted)      `name (args) ;`
+    raw is None unless keep_raw, in which case it is the list of [text]
+    cells consumed since the previous event (a final EOF event carries
+    any trailing whitespace and comments). For COMPLEX events with
+    keep_raw, value is instead a list of (arg, cell) so callers can
+    rewrite an argument by assigning cell[0]. The trailing `;` of a
+    statement is optional, as in the Liberty files tools emit in
+    practice. Groups left open at end of input are not an error.
+    """
+    toks = _Tokens(lexeme_iter, keep_raw)
+    while True:
+        tok = toks.next()
+        if tok is None:
+            if keep_raw and toks.raw:
+                yield EOF, None, None, None, toks.take_raw()
+            return
+        kind, text, offset, _ = tok
+        if text == "}" and kind == PUNCT:
+            yield END, None, None, offset + 1, toks.take_raw() if keep_raw else None
+            continue
+        if kind == PUNCT:
+            continue  # stray ';' or ','
+        name = unquote(text)
+        nxt = toks.next()
+        if nxt is None:
+            continue
+        if nxt[1] == ":" and nxt[0] == PUNCT:
+            parts = []
+            while True:
+                tok = toks.next()
+                if tok is None:
+                    break
+                if tok[0] == PUNCT and tok[1] in ";}":
+                    if tok[1] == "}":
+                        toks.push_back(tok)
+                    break
+                parts.append(unquote(tok[1]))
+            raw = toks.take_raw() if keep_raw else None
+            yield ATTR, name, " ".join(parts), offset, raw
+        elif nxt[1] == "(" and nxt[0] == PUNCT:
+            args = []
+            current = []
+            while True:
+                tok = toks.next()
+                if tok is None:
+                    raise LibertyError(f"missing ')' after {name!r} at offset {offset}")
+                if tok[0] == PUNCT and tok[1] in "),":
+                    if current:
+                        args.append(current)
+                    current = []
+                    if tok[1] == ")":
+                        break
+                    continue
+                current.append(tok)
+            after = toks.next()
+            if after is not None and after[0] == PUNCT and after[1] == "{":
+                plain = [" ".join(unquote(t[1]) for t in arg) for arg in args]
+                yield BEGIN, name, plain, offset, toks.take_raw() if keep_raw else None
+                continue
+            if after is not None and not (after[0] == PUNCT and after[1] == ";"):
+                toks.push_back(after)
+            if keep_raw:
+                value = [
+                    (
+                        " ".join(unquote(t[1]) for t in arg),
+                        arg[0][3] if len(arg) == 1 else None,
+                    )
+                    for arg in args
+                ]
+            else:
+                value = [" ".join(unquote(t[1]) for t in arg) for arg in args]
+            yield COMPLEX, name, value, offset, toks.take_raw() if keep_raw else None
+        else:
+            # `name ;` or garbage: skip the name, reconsider the next token.
+            toks.push_back(nxt)
+
+
+class Group:
+    """A parsed Liberty group: `kind (args) { attributes; groups }`."""
+
+    __slots__ = (
+        "kind",
+        "args",
+        "attributes",
+        "complex_attributes",
+        "groups",
+        "offset",
+        "end",
+    )
+
+    def __init__(self, kind, args, offset=None):
+        self.kind = kind
+        self.args = args
+        self.attributes = {}  # simple attributes, last one wins
+        self.complex_attributes = []  # [(name, args)] in file order
+        self.groups = []
+        self.offset = offset
+        self.end = None
+
+    @property
+    def name(self):
+        """First group argument, e.g. the cell or pin name."""
+        return self.args[0] if self.args else ""
+
+    def get(self, attribute, default=None):
+        return self.attributes.get(attribute, default)
+
+    def iter(self, kind):
+        """Direct child groups of the given kind."""
+        return (g for g in self.groups if g.kind == kind)
+
+    def first(self, kind):
+        return next(self.iter(kind), None)
+
+    def walk(self, kind=None):
+        """All descendant groups (pre-order), optionally of one kind."""
+        stack = list(reversed(self.groups))
+        while stack:
+            g = stack.pop()
+            if kind is None or g.kind == kind:
+                yield g
+            stack.extend(reversed(g.groups))
+
+    def complex(self, name):
+        """Argument lists of every complex attribute called name."""
+        return [args for n, args in self.complex_attributes if n == name]
+
+    def __repr__(self):
+        return f"Group({self.kind!r}, {self.args!r})"
+
+
+def _build(stream, kind, args, offset):
+    """Consume events up to the END of the group just begun."""
+    root = Group(kind, args, offset)
+    stack = [root]
+    for ev, name, value, off, _ in stream:
+        top = stack[-1]
+        if ev is BEGIN:
+            child = Group(name, value, off)
+            top.groups.append(child)
+            stack.append(child)
+        elif ev is END:
+            top.end = off
+            stack.pop()
+            if not stack:
+                return root
+        elif ev is ATTR:
+            top.attributes[name] = value
+        else:
+            top.complex_attributes.append((name, value))
+    return root
+
+
+def _skip(stream):
+    depth = 1
+    for ev, _, _, off, _ in stream:
+        if ev is BEGIN:
+            depth += 1
+        elif ev is END:
+            depth -= 1
+            if depth == 0:
+                return off
+    return None
+
+
+class Library:
+    """Lazily parsed Liberty library.
+
+    source is a .lib/.lib.gz path, or use Library.from_text(). The
+    library group (name, attributes, non-cell groups such as type() and
+    lu_table_template()) fills in as cells() advances; it is complete once
+    iteration finishes. header() parses just up to the first cell.
+    """
+
+    def __init__(self, source=None, *, text=None, chunk_size=CHUNK_SIZE):
+        self.path = source
+        self._text = text
+        self._chunk_size = chunk_size
+        self.group = Group("library", [])
+        self._stream = None
+        self._pending_cell = None
+        self._done = False
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text=text)
+
+    @property
+    def name(self):
+        return self.group.name
+
+    @property
+    def attributes(self):
+        return self.group.attributes
+
+    def _chunks(self, start=0, length=None):
+        if self._text is not None:
+            end = len(self._text) if length is None else start + length
+            return [self._text[start:end]]
+        return open_chunks(self.path, self._chunk_size, start, length)
+
+    def _open(self):
+        if self._stream is None:
+            self._stream = events(lexemes(self._chunks()))
+            for ev, name, value, off, _ in self._stream:
+                if ev is BEGIN:
+                    self.group.kind = name
+                    self.group.args = value
+                    self.group.offset = off
+                    break
+
+    def _next_cell_begin(self):
+        """Advance to the next cell BEGIN at library level."""
+        self._open()
+        for ev, name, value, off, _ in self._stream:
+            if ev is BEGIN:
+                if name == "cell":
+                    return value, off
+                self.group.groups.append(_build(self._stream, name, value, off))
+            elif ev is ATTR:
+                self.group.attributes[name] = value
+            elif ev is COMPLEX:
+                self.group.complex_attributes.append((name, value))
+            elif ev is END:
+                self.group.end = off
+        self._done = True
+        return None
+
+    def header(self):
+        """Parse the library group up to its first cell and return it."""
+        if self._pending_cell is None and not self._done:
+            self._pending_cell = self._next_cell_begin()
+        return self.group
+
+    def cells(self, names=None, index=None):
+        """Yield cell Groups in file order, parsing only those wanted.
+
+        names limits the result to a set of cell names; other cells are
+        skipped without building a tree. With an index from
+        build_cell_index() (and a path source), wanted cells are read by
+        seeking to their byte ranges instead; the header is parsed from
+        the range before the first cell.
+        """
+        if index is not None:
+            yield from self._indexed_cells(names, index)
+            return
+        if names is not None:
+            names = set(names)
+        while True:
+            if self._pending_cell is not None:
+                begin, self._pending_cell = self._pending_cell, None
+            elif self._done:
+                return
+            else:
+                begin = self._next_cell_begin()
+            if begin is None:
+                return
+            args, off = begin
+            cell_name = args[0] if args else ""
+            if names is None or cell_name in names:
+                yield _build(self._stream, "cell", args, off)
+            else:
+                _skip(self._stream)
+
+    def _indexed_cells(self, names, index):
+        header_end = index["header_end"]
+        hdr = events(lexemes(self._chunks(0, header_end)))
+        for ev, name, value, off, _ in hdr:
+            if ev is BEGIN:
+                self.group.kind, self.group.args, self.group.offset = name, value, off
+                break
+        for ev, name, value, off, _ in hdr:
+            if ev is BEGIN:
+                self.group.groups.append(_build(hdr, name, value, off))
+            elif ev is ATTR:
+                self.group.attributes[name] = value
+            elif ev is COMPLEX:
+                self.group.complex_attributes.append((name, value))
+        wanted = index["cells"] if names is None else names
+        for cell_name in wanted:
+            span = index["cells"].get(cell_name)
+            if span is None:
+                continue
+            start, end = span
+            stream = events(lexemes(self._chunks(start, end - start), base=start))
+            for ev, name, value, off, _ in stream:
+                if ev is BEGIN:
+                    yield _build(stream, name, value, off)
+                    break
+
+
+def build_cell_index(path, chunk_size=CHUNK_SIZE):
+    """Scan a library once; return {"version", "header_end", "cells"}.
+
+    cells maps cell name -> [start, end) byte offsets in the decompressed
+    file; header_end is where the first cell starts.
+    """
+    stream = events(lexemes(open_chunks(path, chunk_size)))
+    cells = {}
+    header_end = None
+    depth = 0
+    for ev, name, value, off, _ in stream:
+        if ev is BEGIN:
+            depth += 1
+            if depth == 2 and name == "cell":
+                if header_end is None:
+                    header_end = off
+                end = _skip(stream)
+                depth -= 1
+                cells[value[0] if value else ""] = [off, end]
+        elif ev is END:
+            depth -= 1
+    if header_end is None:
+        header_end = 0
+    return {"version": INDEX_VERSION, "header_end": header_end, "cells": cells}
+
+
+def write_cell_index(index, path):
+    with open(path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+
+def read_cell_index(path):
+    with open(path) as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise LibertyError(
+            "{}: unsupported Liberty index version {}".format(
+                path, index.get("version")
+            )
+        )
+    return index
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("index", "cells"):
+        print(__doc__.split("Usage:", 1)[1], file=sys.stderr)
+        return 1
+    if sys.argv[1] == "index":
+        if len(sys.argv) != 4:
+            print(
+                f"Usage: {sys.argv[0]} index <lib[.gz]> <index.json>", file=sys.stderr
+            )
+            return 1
+        index = build_cell_index(sys.argv[2])
+        write_cell_index(index, sys.argv[3])
+        print(f"Indexed {len(index['cells'])} cells into {sys.argv[3]}")
+        return 0
+    for cell in Library(sys.argv[2]).cells():
+        print(cell.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
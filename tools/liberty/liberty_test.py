@@ -0,0 +1,188 @@
+"""Tests for liberty.py — streaming Liberty tokenizer and group-tree parser."""
+
+import gzip
+import textwrap
+
+import pytest
+
+from liberty import (
+    ATTR,
+    BEGIN,
+    COMPLEX,
+    END,
+    Library,
+    LibertyError,
+    build_cell_index,
+    events,
+    lexemes,
+    read_cell_index,
+    write_cell_index,
+)
+
+LIB = textwrap.dedent(
+    """\
+    /* header comment */
+    library (demo) {
+      time_unit : "1ns";
+      capacitive_load_unit (1, ff);
+      lu_table_template (tmpl) {
+        variable_1 : input_net_transition;
+        index_1 ("1, 2");
+      }
+      cell (INV) {
+        area : 1.5;
+        pin (A) { direction : input; }
+        pin (Y) {
+          direction : output;
+          function : "!A";
+          timing () {
+            related_pin : "A";
+            cell_rise (tmpl) {
+              values ("0.1, 0.2", \\
+                      "0.3, 0.4");
+            }
+          }
+        }
+      }
+      cell ("DFF") {
+        ff (IQ, IQN) { next_state : "D"; clocked_on : "CLK"; }
+        pin (D) { direction : input; }
+      }
+    }
+    """
+)
+
+
+def _chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class TestLexemes:
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 20])
+    def test_lossless_across_chunk_sizes(self, size):
+        lexed = list(lexemes(_chunked(LIB, size)))
+        assert "".join(text for _, text, _ in lexed) == LIB
+        assert all(LIB.startswith(text, off) for _, text, off in lexed)
+
+    def test_unterminated_string(self):
+        with pytest.raises(LibertyError, match="unterminated string at offset 7"):
+            list(lexemes(['area : "1.5;\n']))
+
+    def test_unterminated_comment(self):
+        with pytest.raises(LibertyError, match="unterminated comment"):
+            list(lexemes(["a : 1; /* open"]))
+
+
+class TestEvents:
+    def test_statement_kinds(self):
+        evs = [
+            (kind, name, value)
+            for kind, name, value, _, _ in events(lexemes([LIB]))
+            if kind in (BEGIN, ATTR, COMPLEX)
+        ]
+        assert evs[:4] == [
+            (BEGIN, "library", ["demo"]),
+            (ATTR, "time_unit", "1ns"),
+            (COMPLEX, "capacitive_load_unit", ["1", "ff"]),
+            (BEGIN, "lu_table_template", ["tmpl"]),
+        ]
+        assert (COMPLEX, "values", ["0.1, 0.2", "0.3, 0.4"]) in evs
+
+    def test_keep_raw_reproduces_input(self):
+        raw = [
+            cell[0]
+            for *_, cells in events(lexemes(_chunked(LIB, 5)), keep_raw=True)
+            for cell in cells
+        ]
+        assert "".join(raw) == LIB
+
+    def test_keep_raw_complex_cells_are_rewritable(self):
+        out = []
+        for kind, name, value, _, raw in events(lexemes([LIB]), keep_raw=True):
+            if kind == COMPLEX and name == "values":
+                for arg, cell in value:
+                    cell[0] = '"' + arg.replace("0.", "9.") + '"'
+            out.extend(cell[0] for cell in raw)
+        text = "".join(out)
+        assert '"9.1, 9.2"' in text and '"9.3, 9.4"' in text
+        assert text.replace("9.", "0.") == LIB.replace("9.", "0.")
+
+    def test_end_offset_is_after_brace(self):
+        text = "g () { a : 1; }"
+        ends = [off for kind, _, _, off, _ in events(lexemes([text])) if kind == END]
+        assert ends == [len(text)]
+
+    def test_missing_close_paren(self):
+        with pytest.raises(LibertyError, match="missing"):
+            list(events(lexemes(["cell (INV"])))
+
+
+class TestLibrary:
+    def test_cells_and_tree(self):
+        lib = Library.from_text(LIB)
+        cells = list(lib.cells())
+        assert [c.name for c in cells] == ["INV", "DFF"]
+        inv = cells[0]
+        assert inv.get("area") == "1.5"
+        assert [p.name for p in inv.iter("pin")] == ["A", "Y"]
+        y = list(inv.iter("pin"))[1]
+        assert y.get("function") == "!A"
+        table = next(inv.walk("cell_rise"))
+        assert table.complex("values") == [["0.1, 0.2", "0.3, 0.4"]]
+        assert LIB[inv.offset : inv.end].startswith("cell (INV)")
+        assert LIB[inv.offset : inv.end].endswith("}")
+        ff = cells[1].first("ff")
+        assert ff.args == ["IQ", "IQN"]
+        assert ff.get("clocked_on") == "CLK"
+
+    def test_library_group_fills_in(self):
+        lib = Library.from_text(LIB)
+        assert lib.header().name == "demo"
+        assert lib.attributes["time_unit"] == "1ns"
+        assert [g.name for g in lib.group.iter("lu_table_template")] == ["tmpl"]
+        list(lib.cells())
+        assert lib.group.complex("capacitive_load_unit") == [["1", "ff"]]
+
+    def test_names_filter(self):
+        cells = list(Library.from_text(LIB).cells(names={"DFF"}))
+        assert [c.name for c in cells] == ["DFF"]
+
+    @pytest.mark.parametrize("suffix", [".lib", ".lib.gz"])
+    def test_file_source_small_chunks(self, tmp_path, suffix):
+        path = tmp_path / ("demo" + suffix)
+        opener = gzip.open if suffix.endswith(".gz") else open
+        with opener(path, "wt", encoding="latin-1") as f:
+            f.write(LIB)
+        lib = Library(str(path), chunk_size=5)
+        assert [c.name for c in lib.cells()] == ["INV", "DFF"]
+
+
+class TestCellIndex:
+    @pytest.mark.parametrize("suffix", [".lib", ".lib.gz"])
+    def test_index_round_trip(self, tmp_path, suffix):
+        path = tmp_path / ("demo" + suffix)
+        opener = gzip.open if suffix.endswith(".gz") else open
+        with opener(path, "wt", encoding="latin-1") as f:
+            f.write(LIB)
+        index = build_cell_index(str(path))
+        assert set(index["cells"]) == {"INV", "DFF"}
+        assert index["header_end"] == LIB.index("cell (INV)")
+        start, end = index["cells"]["DFF"]
+        assert LIB[start:end].startswith('cell ("DFF")')
+
+        index_path = tmp_path / "demo.index.json"
+        write_cell_index(index, str(index_path))
+        index = read_cell_index(str(index_path))
+
+        lib = Library(str(path))
+        cells = list(lib.cells(names=["DFF"], index=index))
+        assert [c.name for c in cells] == ["DFF"]
+        assert cells[0].offset == start
+        assert lib.attributes["time_unit"] == "1ns"
+        assert [g.name for g in lib.group.iter("lu_table_template")] == ["tmpl"]
+
+    def test_rejects_unknown_version(self, tmp_path):
+        index_path = tmp_path / "bad.json"
+        index_path.write_text('{"version": 0}')
+        with pytest.raises(LibertyError, match="unsupported"):
+            read_cell_index(str(index_path))
@@ -52,11 +52,21 @@ unit tests).
 """
 
 import argparse
+import concurrent.futures
+import functools
+import hashlib
+import importlib.util
+import json
+import mmap
+import os
 import re
 import sys
-from dataclasses import dataclass, field
+import time
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 
+import liberty
+
 
 # ---------------------------------------------------------------------------
 # Idiomatic memory area/delay model — fitted from published data
@@ -385,10 +395,95 @@ def _load_sweep_yaml(path):
     return out
 
 
+def _fit_cache_dir():
+    """Where fitted models are cached: $MEMORY_MACRO_SCALER_CACHE_DIR, else
+    None (no cache). Opt-in, so Bazel actions don't read the host's home."""
+    env = os.environ.get("MEMORY_MACRO_SCALER_CACHE_DIR")
+    return Path(env) if env else None
+
+
+def _fit_key(sweep_raw, data_points):
+    """Digest of everything the fit depends on: the sweep YAML bytes, the
+    built-in points, the port factors and this script (which holds the
+    loader and the fit)."""
+    h = hashlib.sha256(sweep_raw)
+    h.update(repr(data_points).encode())
+    h.update(repr(sorted(PORT_AREA_FACTOR.items())).encode())
+    h.update(Path(__file__).read_bytes())
+    return h.hexdigest()
+
+
+def _model_from_json(entry):
+    return (
+        [tuple(point) for point in entry["data_points"]],
+        {kind: tuple(ab) for kind, ab in entry["area_fit"].items()},
+    )
+
+
+def _load_model(sweep_path, data_points, cache_dir, fit_path=None):
+    """Return (data points, area fit): data_points plus the sweep YAML's
+    rows, and _fit_area_model() over them.
+
+    Parsing the YAML (and importing yaml at all) dominates the cost, so
+    the result is read from fit_path, the committed artifact next to the
+    sweep, when its key matches _fit_key(). Otherwise it is refitted and
+    cached in cache_dir as JSON. Best effort: a bad or stale entry is
+    refitted and write failures are ignored.
+    """
+    try:
+        raw = sweep_path.read_bytes()
+    except OSError:
+        raw = b""
+    key = _fit_key(raw, data_points)
+    if fit_path is not None:
+        try:
+            entry = json.loads(fit_path.read_text())
+            if entry["key"] == key:
+                return _model_from_json(entry)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    # Without yaml the sweep is skipped; don't let that result stand in
+    # for the fit with it.
+    h = hashlib.sha256(key.encode())
+    h.update(b"yaml" if importlib.util.find_spec("yaml") else b"no yaml")
+    path = cache_dir / f"fit-{h.hexdigest()}.json" if cache_dir else None
+    if path is not None:
+        try:
+            return _model_from_json(json.loads(path.read_text()))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    points = data_points + _load_sweep_yaml(sweep_path)
+    fit = _fit_area_model(points)
+    if path is not None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({"data_points": points, "area_fit": fit}))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return points, fit
+
+
+def _pin_fit(sweep_path, data_points, fit_path):
+    """Refit from sweep_path and write the keyed artifact to fit_path."""
+    raw = sweep_path.read_bytes()
+    points = data_points + _load_sweep_yaml(sweep_path)
+    entry = {
+        "key": _fit_key(raw, data_points),
+        "data_points": points,
+        "area_fit": _fit_area_model(points),
+    }
+    fit_path.write_text(json.dumps(entry, indent=1, sort_keys=True) + "\n")
+
+
 # Load committed sweep results (if any) and mix them into the fit.
 _SWEEP_YAML = Path(__file__).parent / "characterization" / "asap7_sweep.yaml"
-MEMORY_DATA_POINTS = MEMORY_DATA_POINTS + _load_sweep_yaml(_SWEEP_YAML)
-_AREA_FIT = _fit_area_model(MEMORY_DATA_POINTS)
+_FIT_JSON = _SWEEP_YAML.with_name("asap7_sweep.fit.json")
+_BUILTIN_DATA_POINTS = MEMORY_DATA_POINTS
+MEMORY_DATA_POINTS, _AREA_FIT = _load_model(
+    _SWEEP_YAML, _BUILTIN_DATA_POINTS, _fit_cache_dir(), _FIT_JSON
+)
 
 
 def predict_area_um2(*, rows, bits, ports_key, kind, tech_nm):
@@ -625,18 +720,94 @@ def lookup_idiomatic(role, tech_nm=DEFAULT_TECH_NM):
     return predict_idiomatic(role, tech_nm=tech_nm)
 
 
+# Columns of predict_batch(), in order: the predict_idiomatic() bucket
+# values, then the bank plan summary and the warning.
+BATCH_COLUMNS = (
+    "clk_period_min_ps",
+    "access_time_ps",
+    "setup_ps",
+    "hold_ps",
+    "transition_ps",
+    "pre_layout_ck_insertion_ps",
+    "post_cts_ck_insertion_ps",
+    "read_energy_fj",
+    "write_energy_fj",
+    "leakage_pw",
+    "width_um",
+    "height_um",
+    "area_um2",
+    "num_banks",
+    "per_bank_ports_key",
+    "warning",
+)
+
+_PORTS_KEY_RE = re.compile(r"(?:(\d+)RW|(\d+)R(\d+)W)")
+
+
+def _ports_from_key(ports_key):
+    """(nR, nW, nRW) for a ports_key such as "1RW" or "2R1W"."""
+    if not ports_key:
+        return 0, 0, 0
+    m = _PORTS_KEY_RE.fullmatch(ports_key)
+    if not m:
+        raise ValueError(f"bad ports_key {ports_key!r}")
+    if m.group(1):
+        return 0, 0, int(m.group(1))
+    return int(m.group(2)), int(m.group(3)), 0
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _predict_row(rows, bits, ports_key, kind, tech_nm):
+    if kind not in ("sram", "ff"):
+        raise ValueError(f"kind must be 'sram' or 'ff', not {kind!r}")
+    nR, nW, nRW = _ports_from_key(ports_key)
+    role = MemoryRole(
+        kind="sram" if kind == "sram" else "flop_memory",
+        rows=rows,
+        bits=bits,
+        nR=nR,
+        nW=nW,
+        nRW=nRW,
+    )
+    bucket, warning = predict_idiomatic(role, tech_nm=tech_nm)
+    plan = bucket["bank_plan"]
+    return tuple(bucket.get(column) for column in BATCH_COLUMNS[:-3]) + (
+        plan.num_banks,
+        _per_bank_ports_key(plan),
+        warning,
+    )
+
+
+def predict_batch(rows, bits, ports_key, kind, tech_nm=DEFAULT_TECH_NM):
+    """predict_idiomatic() over many shapes, as columns.
+
+    Each argument is a sequence, or a scalar applied to every shape;
+    kind is "sram" or "ff" as for the predict_*() functions. Returns
+    {column: [value per shape]} for BATCH_COLUMNS; width_um, height_um
+    and area_um2 are None for "ff". Shapes are evaluated once each, so
+    sweeps that revisit shapes (or repeat across calls) cost a lookup.
+    """
+    args = [rows, bits, ports_key, kind, tech_nm]
+    lengths = set()
+    for i, arg in enumerate(args):
+        if isinstance(arg, (str, int, float)) or arg is None:
+            continue
+        args[i] = list(arg)
+        lengths.add(len(args[i]))
+    if len(lengths) > 1:
+        raise ValueError(f"predict_batch columns differ in length: {sorted(lengths)}")
+    n = lengths.pop() if lengths else 1
+    args = [arg if isinstance(arg, list) else [arg] * n for arg in args]
+    results = [_predict_row(*shape) for shape in zip(*args)]
+    columns = zip(*results) if results else [()] * len(BATCH_COLUMNS)
+    return {name: list(values) for name, values in zip(BATCH_COLUMNS, columns)}
+
+
 # ---------------------------------------------------------------------------
 # .lib classification
 # ---------------------------------------------------------------------------
 
-_LIBRARY_NAME_RE = re.compile(r"^\s*library\s*\(\s*([^\s)]+)\s*\)", re.MULTILINE)
-_CELL_NAME_RE = re.compile(r"^\s*cell\s*\(\s*([^\s)]+)\s*\)", re.MULTILINE)
 _MEMORY_SUFFIX_RE = re.compile(r"_(\d+)x(\d+)(?:_\d+)?$")
-_MEMORY_GROUP_RE = re.compile(
-    r"\bmemory\s*\(\s*\)\s*\{[^}]*?type\s*:\s*ram\b[^}]*?"
-    r"address_width\s*:\s*(\d+)[^}]*?word_width\s*:\s*(\d+)",
-    re.DOTALL,
-)
 
 # Firtool pin-name pattern.  Captures: (kind, port_num, tail).
 # tail in {addr, en, mask, wmask, data, rdata, wdata, wmode, clk}.
@@ -644,18 +815,9 @@ _FIRTOOL_PIN_RE = re.compile(
     r"^(R|RW|W)(\d+)_(addr|en|mask|wmask|data|rdata|wdata|wmode|clk)$"
 )
 
-# Liberty pin/bus declarations: `pin(NAME)` or `bus(NAME)`. Works for both
-# compact single-line and multi-line Liberty.
-_PIN_OR_BUS_RE = re.compile(r"\b(?:pin|bus)\s*\(\s*([A-Za-z_][A-Za-z0-9_]*)\s*\)")
-
-# bus_type NAME_DATA -> bit_width N.  We match `type (<name>) { ... bit_width : N; }`.
-_TYPE_BLOCK_RE = re.compile(
-    r"\btype\s*\(\s*([^\s)]+)\s*\)\s*\{[^}]*?\bbit_width\s*:\s*(\d+)",
-    re.DOTALL,
-)
-
-# ff(IQ,IQN) group marker inside cell(...) — tells us it's a flop cell.
-_FF_GROUP_RE = re.compile(r"\bff\s*\(\s*\w+\s*,\s*\w+\s*\)")
+# Names of pin()/bus() groups that count as ports; per-bit `pin(X[3])`
+# entries inside a bus are not.
+_PORT_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
 
 
 @dataclass
@@ -697,37 +859,51 @@ def classify(lib_text):
     Returns a MemoryRole. Never raises on non-memory input — falls through to
     kind="non_memory".
     """
-    lib_m = _LIBRARY_NAME_RE.search(lib_text)
-    cell_m = _CELL_NAME_RE.search(lib_text)
-    library_name = lib_m.group(1) if lib_m else ""
-    cell_name = cell_m.group(1) if cell_m else library_name
+    lib = liberty.Library.from_text(lib_text)
+    cell = next(lib.cells(), None)
+    library_name = lib.name
+    cell_name = cell.name if cell is not None else library_name
     role = MemoryRole(
         kind="non_memory",
         library_name=library_name,
         cell_name=cell_name,
     )
+    groups = list(cell.walk()) if cell is not None else []
 
     # Layer 1: memory() group declares ram directly.
-    mem_m = _MEMORY_GROUP_RE.search(lib_text)
-    if mem_m:
-        addr_bits = int(mem_m.group(1))
-        role.kind = "sram"
-        role.rows = 2**addr_bits
-        role.bits = int(mem_m.group(2))
-        _count_ports_firtool(role, lib_text)
-        if role.nR == 0 and role.nW == 0 and role.nRW == 0:
-            # memory() group said "ram" but no firtool pins — assume 1RW.
-            role.nRW = 1
-        return role
+    pins = [
+        g.name
+        for g in groups
+        if g.kind in ("pin", "bus")
+        and len(g.args) == 1
+        and _PORT_NAME_RE.fullmatch(g.name)
+    ]
+    for mem in groups:
+        if (
+            mem.kind == "memory"
+            and mem.get("type") == "ram"
+            and mem.get("address_width", "").isdigit()
+            and mem.get("word_width", "").isdigit()
+        ):
+            role.kind = "sram"
+            role.rows = 2 ** int(mem.get("address_width"))
+            role.bits = int(mem.get("word_width"))
+            _count_ports_firtool(role, pins)
+            if role.nR == 0 and role.nW == 0 and role.nRW == 0:
+                # memory() group said "ram" but no firtool pins — assume 1RW.
+                role.nRW = 1
+            return role
 
     # Layer 2: firtool-style pin names.
-    pins = _PIN_OR_BUS_RE.findall(lib_text)
     firtool_hits = [_FIRTOOL_PIN_RE.match(p) for p in pins]
     firtool_hits = [m for m in firtool_hits if m]
     if firtool_hits:
         role.kind = "sram"
-        _count_ports_firtool(role, lib_text)
-        role.rows, role.bits = _infer_dims_from_pin_widths(lib_text, firtool_hits)
+        _count_ports_firtool(role, pins)
+        types = list(lib.group.walk("type")) + [g for g in groups if g.kind == "type"]
+        role.rows, role.bits = _infer_dims_from_pin_widths(
+            types, [g for g in groups if g.kind == "bus"], firtool_hits
+        )
         if role.rows == 0 or role.bits == 0:
             # Fall back to library/cell name suffix if pins didn't pin
             # the dimensions (e.g. tests that omit type() blocks).
@@ -738,7 +914,7 @@ def classify(lib_text):
 
     # Layer 3: name suffix + ff() group => flop_memory.
     dims = _dims_from_name(cell_name or library_name)
-    if dims and _FF_GROUP_RE.search(lib_text):
+    if dims and any(g.kind == "ff" and len(g.args) == 2 for g in groups):
         role.kind = "flop_memory"
         role.read_mode = "async"
         role.rows, role.bits = dims
@@ -753,11 +929,11 @@ def _dims_from_name(name):
     return (int(m.group(1)), int(m.group(2))) if m else None
 
 
-def _count_ports_firtool(role, lib_text):
+def _count_ports_firtool(role, pins):
     """Populate nR/nW/nRW from firtool-style pin names in the lib."""
     seen = {"R": set(), "W": set(), "RW": set()}
     port_pin_names = {}
-    for name in _PIN_OR_BUS_RE.findall(lib_text):
+    for name in pins:
         m = _FIRTOOL_PIN_RE.match(name)
         if not m:
             continue
@@ -770,22 +946,18 @@ def _count_ports_firtool(role, lib_text):
     role.port_pin_names = port_pin_names
 
 
-def _infer_dims_from_pin_widths(lib_text, firtool_hits):
-    """Return (rows, bits) from type() blocks referenced by the pin set.
+def _infer_dims_from_pin_widths(type_groups, bus_groups, firtool_hits):
+    """Return (rows, bits) from type() groups referenced by the pin set.
 
     rows derived from the widest addr bus (2 ** addr_width); bits from the
     widest data bus.  Returns (0, 0) if the .lib omits type() blocks.
     """
-    types = {name: int(width) for name, width in _TYPE_BLOCK_RE.findall(lib_text)}
-
-    # Find each bus's bus_type using a simple regex; not a full LEF/lib parser.
-    bus_types = dict(
-        re.findall(
-            r"\bbus\s*\(\s*([A-Za-z_][A-Za-z0-9_]*)\s*\)\s*\{[^}]*?bus_type\s*:\s*([A-Za-z_][A-Za-z0-9_]*)",
-            lib_text,
-            flags=re.DOTALL,
-        )
-    )
+    types = {
+        g.name: int(g.get("bit_width"))
+        for g in type_groups
+        if g.get("bit_width", "").isdigit()
+    }
+    bus_types = {g.name: g.get("bus_type") for g in bus_groups if g.get("bus_type")}
 
     addr_bits = 0
     data_bits = 0
@@ -805,27 +977,138 @@ def _infer_dims_from_pin_widths(lib_text, firtool_hits):
 # ---------------------------------------------------------------------------
 # .lib scaling (dual-characterization aware)
 # ---------------------------------------------------------------------------
-# Lifted from ascenium/hardware/tile/scale_lib.py — a line-by-line walker
-# tracking brace depth and the open timing()/internal_power() group.
-# Extended here to accept per-timing-type scale factors so we can hit the
-# idiomatic numbers without squashing the rise/fall ratio or slew/load LUT
-# shape of the input.
+# Walks the liberty event stream tracking the open timing() and
+# internal_power() groups, and rewrites only the numeric `values` tables
+# (single numbers and multi-row NLDM tables alike), so the output is
+# otherwise byte-identical to the input. Accepts per-timing-type scale
+# factors so we can hit the idiomatic numbers without squashing the
+# rise/fall ratio or slew/load LUT shape of the input.
+#
+# Each table is parsed into rows of floats once and transformed as a whole;
+# ScaledLibTemplate keeps the parsed tables so one reference can be
+# rendered for many corners without re-tokenizing it.
 
 _CLOCK_TREE_TYPES = frozenset({"min_clock_tree_path", "max_clock_tree_path"})
 _TIMING_OPEN = "__timing__"
 _POWER_OPEN = "__power__"
+_SCALAR_VALUE_RE = re.compile(r"-?[\d.]+(?:[eE][+-]?\d+)?")
 
+# What a values table is scaled by, from the innermost tagged open group.
+_ROLE_TIMING = "timing"
+_ROLE_CLOCK_TREE = "clock_tree"
+_ROLE_POWER = "power"
 
-def _scale_values_line(line, factor):
-    def repl(m):
-        val = float(m.group(2)) * factor
-        return m.group(1) + f"{val:.6g}" + m.group(3)
+DEFAULT_PRECISION = 6  # significant digits written for scaled values
 
-    return re.sub(
-        r'(values\s*\(\s*")(-?[\d.]+(?:[eE][+-]?\d+)?)("\s*\))',
-        repl,
-        line,
-    )
+
+def _scalar_values(args):
+    """The value of a `values ("<number>")` attribute, else None."""
+    if len(args) == 1 and _SCALAR_VALUE_RE.fullmatch(args[0]):
+        return float(args[0])
+    return None
+
+
+def _table_rows(value):
+    """Rows of floats for a keep_raw `values (...)` event, else None.
+
+    Every argument must be one string lexeme of comma-separated numbers,
+    e.g. `values ("0.1, 0.2", "0.3, 0.4")`.
+    """
+    rows = []
+    for arg, cell in value:
+        fields = arg.split(",")
+        if cell is None or not all(
+            _SCALAR_VALUE_RE.fullmatch(f.strip()) for f in fields
+        ):
+            return None
+        try:
+            rows.append([float(f) for f in fields])
+        except ValueError:  # e.g. "." or "1.2.3"
+            return None
+    return rows or None
+
+
+def _table_role(stack):
+    tag = next((t for t in reversed(stack) if t is not None), None)
+    if tag == _POWER_OPEN:
+        return _ROLE_POWER
+    if tag is None or tag == _TIMING_OPEN:
+        return None
+    if tag in _CLOCK_TREE_TYPES:
+        return _ROLE_CLOCK_TREE
+    return _ROLE_TIMING
+
+
+def _scan_values_tables(chunks):
+    """Walk a Liberty stream; yield (raw, table) once per event.
+
+    raw is the event's list of [text] cells. table is None, or
+    (role, time_unit_factor, rows, cells) for a numeric `values` table
+    that scaling applies to, where cells[i] holds row i's string lexeme.
+    """
+    stack = []  # one tag (or None) per open group
+    time_unit_factor = 1e-9  # Liberty default until time_unit is seen
+
+    for ev, name, value, _, raw in liberty.events(
+        liberty.lexemes(chunks), keep_raw=True
+    ):
+        table = None
+        if ev is liberty.BEGIN:
+            if name == "timing":
+                stack.append(_TIMING_OPEN)
+            elif name == "internal_power":
+                stack.append(_POWER_OPEN)
+            else:
+                stack.append(None)
+        elif ev is liberty.END:
+            if stack:
+                stack.pop()
+        elif ev is liberty.ATTR:
+            if name == "timing_type":
+                for idx in range(len(stack) - 1, -1, -1):
+                    if stack[idx] == _TIMING_OPEN:
+                        stack[idx] = value
+                        break
+            elif name == "time_unit" and len(stack) == 1:
+                time_unit_factor = _parse_time_unit(value)
+        elif ev is liberty.COMPLEX and name == "values":
+            role = _table_role(stack)
+            rows = _table_rows(value) if role is not None else None
+            if rows is not None:
+                cells = [cell for _, cell in value]
+                table = (role, time_unit_factor, rows, cells)
+        yield raw, table
+
+
+def _scaled_table(table, timing_scale, ck_insertion_ps, power_scale, precision):
+    """Formatted row strings (with quotes) for a scanned table."""
+    role, time_unit_factor, rows, _ = table
+    if role == _ROLE_CLOCK_TREE and ck_insertion_ps is not None:
+        # time_unit lets us convert ck_insertion_ps -> library units.
+        target = ck_insertion_ps * 1e-12 / time_unit_factor
+        scaled = [[target] * len(row) for row in rows]
+    else:
+        factor = power_scale if role == _ROLE_POWER else timing_scale
+        scaled = [[v * factor for v in row] for row in rows]
+    fmt = f"{{:.{precision}g}}".format
+    return ['"' + ", ".join(map(fmt, row)) + '"' for row in scaled]
+
+
+def _clock_tree_s(tables):
+    """Largest clock-tree arc value, in seconds, over scanned tables;
+    None when there is none."""
+    values = [
+        max(max(row) for row in rows) * time_unit_factor
+        for role, time_unit_factor, rows, _ in tables
+        if role == _ROLE_CLOCK_TREE
+    ]
+    return max(values) if values else None
+
+
+def clock_tree_insertion_s(chunks):
+    """Largest min/max_clock_tree_path value of a Liberty chunk stream,
+    in seconds; None when it has no clock-tree arcs."""
+    return _clock_tree_s(table for _, table in _scan_values_tables(chunks) if table)
 
 
 def scale_lib_text(
@@ -834,6 +1117,7 @@ def scale_lib_text(
     timing_scale=1.0,
     ck_insertion_ps=None,
     power_scale=1.0,
+    precision=DEFAULT_PRECISION,
 ):
     """Return a scaled copy of a Liberty file's text.
 
@@ -845,69 +1129,121 @@ def scale_lib_text(
                    same value to both).  If None, leaves clock-tree arcs
                    unchanged.
     power_scale    multiplier for internal_power tables.
+    precision      significant digits written for every rewritten value.
     """
-    out = []
-    brace_depth = 0
-    stack = []  # (tag, enter_depth)
-
-    # time_unit lets us convert ck_insertion_ps -> library unit value.
-    time_unit_factor = _parse_time_unit(text)  # e.g. 1e-9 for "1ns"
-    ck_target = (
-        (ck_insertion_ps * 1e-12 / time_unit_factor)
-        if ck_insertion_ps is not None
-        else None
+    return "".join(
+        scale_lib_chunks(
+            [text],
+            timing_scale=timing_scale,
+            ck_insertion_ps=ck_insertion_ps,
+            power_scale=power_scale,
+            precision=precision,
+        )
     )
 
-    for line in text.splitlines(keepends=True):
-        opens = line.count("{")
-        closes = line.count("}")
-        if re.search(r"\btiming\s*\(\s*\)\s*\{", line):
-            stack.append((_TIMING_OPEN, brace_depth + opens))
-        elif re.search(r"\binternal_power\s*\(\s*\)\s*\{", line):
-            stack.append((_POWER_OPEN, brace_depth + opens))
-
-        m = re.search(r"\btiming_type\s*:\s*(\w+)", line)
-        if m:
-            for idx in range(len(stack) - 1, -1, -1):
-                if stack[idx][0] == _TIMING_OPEN:
-                    stack[idx] = (m.group(1), stack[idx][1])
-                    break
 
-        scale = None
-        absolute_value = None
-        for tag, _ in reversed(stack):
-            if tag == _POWER_OPEN:
-                scale = power_scale
-                break
-            if tag == _TIMING_OPEN:
-                break
-            if tag in _CLOCK_TREE_TYPES:
-                if ck_target is not None:
-                    absolute_value = ck_target
-                    break
-                scale = timing_scale
-                break
-            scale = timing_scale
-            break
-
-        if absolute_value is not None:
-            line = re.sub(
-                r'(values\s*\(\s*")(-?[\d.]+(?:[eE][+-]?\d+)?)("\s*\))',
-                lambda m: m.group(1) + f"{absolute_value:.6g}" + m.group(3),
-                line,
+def scale_lib_chunks(
+    chunks,
+    *,
+    timing_scale=1.0,
+    ck_insertion_ps=None,
+    power_scale=1.0,
+    precision=DEFAULT_PRECISION,
+):
+    """Streaming scale_lib_text(): yield scaled text for a chunk stream.
+
+    Use with liberty.open_chunks() to scale a .lib/.lib.gz without
+    holding it in memory.
+    """
+    for raw, table in _scan_values_tables(chunks):
+        if table is not None:
+            rows = _scaled_table(
+                table, timing_scale, ck_insertion_ps, power_scale, precision
             )
-        elif scale is not None:
-            line = _scale_values_line(line, scale)
+            for cell, row in zip(table[3], rows):
+                cell[0] = row
+        for piece in raw:
+            yield piece[0]
 
-        out.append(line)
-        brace_depth += opens - closes
-        stack = [(tag, d) for tag, d in stack if d <= brace_depth]
 
-    return "".join(out)
+def scale_lib_into(chunks, outputs, *, precision=DEFAULT_PRECISION):
+    """Scale one Liberty chunk stream into several files in one pass.
+
+    outputs is [(writable text file, scale_lib_text() keyword arguments)];
+    each file receives what scale_lib_chunks() would yield for its
+    arguments, while the input is tokenized only once.
+    """
+    for raw, table in _scan_values_tables(chunks):
+        for f, kwargs in outputs:
+            if table is not None:
+                rows = _scaled_table(
+                    table,
+                    kwargs.get("timing_scale", 1.0),
+                    kwargs.get("ck_insertion_ps"),
+                    kwargs.get("power_scale", 1.0),
+                    precision,
+                )
+                for cell, row in zip(table[3], rows):
+                    cell[0] = row
+            f.write("".join(piece[0] for piece in raw))
+
+
+class ScaledLibTemplate:
+    """A Liberty text tokenized once, for rendering at many scale settings.
+
+    render() takes the same keyword arguments as scale_lib_text() and
+    returns the same text; only the numeric tables are recomputed.
+    """
+
+    def __init__(self, text):
+        self._pieces = []
+        self._tables = []  # (table, piece index of each row)
+        for raw, table in _scan_values_tables([text]):
+            if table is not None:
+                ids = {id(cell): i for i, cell in enumerate(raw)}
+                base = len(self._pieces)
+                slots = [base + ids[id(cell)] for cell in table[3]]
+                self._tables.append((table, slots))
+            self._pieces.extend(piece[0] for piece in raw)
+        self.clock_tree_s = _clock_tree_s(table for table, _ in self._tables)
+
+    def render(
+        self,
+        *,
+        timing_scale=1.0,
+        ck_insertion_ps=None,
+        power_scale=1.0,
+        precision=DEFAULT_PRECISION,
+    ):
+        pieces = list(self._pieces)
+        for table, slots in self._tables:
+            rows = _scaled_table(
+                table, timing_scale, ck_insertion_ps, power_scale, precision
+            )
+            for slot, row in zip(slots, rows):
+                pieces[slot] = row
+        return "".join(pieces)
 
 
-def _parse_time_unit(text):
-    m = re.search(r'\btime_unit\s*:\s*"\s*(\d+(?:\.\d+)?)\s*(ps|ns|us)\s*"', text)
+def scale_lib_batch(texts, corners, *, precision=DEFAULT_PRECISION):
+    """Scale every Liberty text for every corner in one call.
+
+    texts maps a key (e.g. macro name) to Liberty text; corners maps a
+    corner name to scale_lib_text() keyword arguments (timing_scale,
+    ck_insertion_ps, power_scale). Each text is tokenized once, however
+    many corners it is rendered for. Returns {(key, corner): text}.
+    """
+    out = {}
+    for key, text in texts.items():
+        template = ScaledLibTemplate(text)
+        for corner, kwargs in corners.items():
+            out[key, corner] = template.render(precision=precision, **kwargs)
+    return out
+
+
+def _parse_time_unit(value):
+    """Seconds per library time unit from a time_unit value like "1ns"."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ps|ns|us)\s*", value)
     if not m:
         return 1e-9  # Liberty default
     val, unit = float(m.group(1)), m.group(2)
@@ -925,13 +1261,20 @@ def compute_timing_scale(role, bucket, reference_text):
     if bucket is None:
         return 1.0
     target = bucket.get("access_time_ps", bucket.get("setup_ps", 0.0)) * 1e-12
-    time_unit = _parse_time_unit(reference_text)
-    vals = [
-        float(m.group(1))
-        for m in re.finditer(
-            r'values\s*\(\s*"(-?[\d.]+(?:[eE][+-]?\d+)?)"\s*\)', reference_text
-        )
-    ]
+    time_unit = 1e-9
+    vals = []
+    depth = 0
+    for ev, name, value, _, _ in liberty.events(liberty.lexemes([reference_text])):
+        if ev is liberty.BEGIN:
+            depth += 1
+        elif ev is liberty.END:
+            depth -= 1
+        elif ev is liberty.ATTR and name == "time_unit" and depth == 1:
+            time_unit = _parse_time_unit(value)
+        elif ev is liberty.COMPLEX and name == "values":
+            val = _scalar_values(value)
+            if val is not None:
+                vals.append(val)
     if not vals or target == 0.0:
         return 1.0
     # Use the max data-path value as the "characteristic" delay.
@@ -942,19 +1285,371 @@ def compute_timing_scale(role, bucket, reference_text):
 
 
 # ---------------------------------------------------------------------------
-# .lef rewrite
+# .lef model and rewrite
 # ---------------------------------------------------------------------------
-# We do not parse the full LEF grammar. We preserve the preamble, rewrite the
-# MACRO outline, re-emit pins in idiomatic positions, and write one OBS
-# rectangle covering the interior.
+# A LEF is parsed into LefFile / LefMacro / LefPin records: the outline and,
+# per pin, its direction, use and port geometry. Statements we don't act on
+# (FOREIGN, SYMMETRY, PROPERTY, SHAPE, ...) are carried verbatim. Placed
+# signal pins are held per edge as a PinBank — a list of names plus the
+# arithmetic that puts pin i on its track — and only become text in the
+# writer, so re-pinning a macro with thousands of pins never builds a
+# per-pin object.
+#
+# rewrite_lef() keeps its historic output: the preamble, the rewritten
+# MACRO outline, pins re-emitted in idiomatic positions and one OBS
+# rectangle covering the interior. repin_lef() does the same for any
+# hard macro, keyed on the pins' own DIRECTION/USE.
 
 _M4_PITCH_UM = 0.048  # ASAP7 M4 track pitch
 _M5_PITCH_UM = 0.068  # ASAP7 M5 track pitch
 
 
+@dataclass
+class LefPin:
+    name: str
+    direction: str = ""
+    use: str = ""
+    # Other PIN statements, verbatim without the ";" (e.g. "SHAPE ABUTMENT").
+    statements: list = field(default_factory=list)
+    # One list of geometry statements per PORT ("LAYER M4", "RECT 0 0 1 1").
+    ports: list = field(default_factory=list)
+
+
+@dataclass
+class PinBank:
+    """Pins placed along one edge: pin i sits at (x + dx*(i+1), y + dy*(i+1))."""
+
+    names: list
+    direction: str
+    layer: str
+    x: float
+    y: float
+    dx: float
+    dy: float
+    w: float
+    h: float
+    use: str = ""
+    # name -> the LefPin being re-placed, whose DIRECTION, USE and other
+    # statements are written instead of the bank's; empty for new pins.
+    pins: dict = field(default_factory=dict)
+
+
+@dataclass
+class LefMacro:
+    name: str
+    macro_class: str = "BLOCK"
+    origin: tuple = ("0", "0")
+    size: tuple = ("0", "0")  # (width, height) as written
+    statements: list = field(default_factory=list)  # other MACRO statements
+    banks: list = field(default_factory=list)  # PinBank, written first
+    pins: list = field(default_factory=list)  # LefPin
+    obs: list = None  # geometry statements; None for no OBS block
+    density: list = None  # DENSITY statements; None for no DENSITY block
+
+    @property
+    def width(self):
+        return float(self.size[0])
+
+    @property
+    def height(self):
+        return float(self.size[1])
+
+
+@dataclass
+class LefFile:
+    header: str = ""  # verbatim text before the first MACRO
+    macros: list = field(default_factory=list)
+    trailer: str = ""  # statements after the last END <macro>, e.g. END LIBRARY
+    # macro name -> statements between its END and the next MACRO (SITE, ...)
+    between: dict = field(default_factory=dict)
+
+
+# A MACRO statement is alone on its line (PROPERTYDEFINITIONS has "MACRO
+# name type ;" lines too). Literal first: a ^-anchored pattern is tried at
+# every line of a multi-megabyte file.
+_LEF_MACRO_RE = re.compile(r"MACRO[ \t]+(\S+)[ \t]*\r?$", re.MULTILINE)
+_LEF_COMMENT_RE = re.compile(r"#[^\n]*")
+
+
+def _lef_tokens(text):
+    """Whitespace-separated LEF tokens; quoted strings stay one token."""
+    if "#" in text:
+        text = _LEF_COMMENT_RE.sub("", text)
+    tokens = text.split()
+    if '"' not in text:
+        return tokens
+    out = []
+    for tok in tokens:
+        if (
+            out
+            and out[-1].startswith('"')
+            and (len(out[-1]) == 1 or not out[-1].endswith('"'))
+        ):
+            out[-1] += " " + tok
+        else:
+            out.append(tok)
+    return out
+
+
+def _parse_lef_macro(tokens, name):
+    """(LefMacro, index after its END <name>) from the tokens after MACRO.
+
+    One pass over the tokens; statements are everything up to a ";",
+    PIN/PORT/OBS/END open and close blocks.
+    """
+    macro = LefMacro(name, macro_class="", origin=None, size=None)
+    index = tokens.index
+    i = 0
+    pin = None
+    geometry = None  # statements of the open PORT or OBS
+    while True:
+        tok = tokens[i]
+        if tok == "END":
+            if geometry is not None:
+                geometry = None
+                i += 1
+                continue
+            closing = pin.name if pin is not None else name
+            if tokens[i + 1] != closing:
+                raise ValueError(f"expected END {closing}, got END {tokens[i + 1]}")
+            if pin is None:
+                return macro, i + 2
+            pin = None
+            i += 2
+            continue
+        if geometry is None:
+            if tok == "PORT" and pin is not None:
+                geometry = []
+                pin.ports.append(geometry)
+                i += 1
+                continue
+            if tok == "PIN" and pin is None:
+                pin = LefPin(tokens[i + 1])
+                macro.pins.append(pin)
+                i += 2
+                continue
+            if tok == "OBS" and pin is None:
+                geometry = macro.obs = []
+                i += 1
+                continue
+            if tok == "DENSITY" and pin is None:
+                geometry = macro.density = []
+                i += 1
+                continue
+        j = index(";", i)
+        if geometry is not None:
+            geometry.append(" ".join(tokens[i:j]))
+        elif pin is not None:
+            if tok == "DIRECTION":
+                pin.direction = " ".join(tokens[i + 1 : j])
+            elif tok == "USE":
+                pin.use = " ".join(tokens[i + 1 : j])
+            else:
+                pin.statements.append(" ".join(tokens[i:j]))
+        elif tok == "CLASS":
+            macro.macro_class = " ".join(tokens[i + 1 : j])
+        elif tok == "ORIGIN":
+            macro.origin = tuple(tokens[i + 1 : j])
+        elif tok == "SIZE":
+            macro.size = (tokens[i + 1], tokens[i + 3])
+        else:
+            macro.statements.append(" ".join(tokens[i:j]))
+        i = j + 1
+
+
+def parse_lef(lef_text):
+    """Parse the MACROs of a LEF into a LefFile.
+
+    Raises ValueError on a MACRO that isn't closed by END <name>.
+    """
+    starts = [
+        m
+        for m in _LEF_MACRO_RE.finditer(lef_text)
+        if not lef_text[lef_text.rfind("\n", 0, m.start()) + 1 : m.start()].strip()
+    ]
+    if not starts:
+        return LefFile(header=lef_text)
+    lef = LefFile(header=lef_text[: starts[0].start()])
+    ends = [m.start() for m in starts[1:]] + [len(lef_text)]
+    for m, stop in zip(starts, ends):
+        name = m.group(1)
+        tokens = _lef_tokens(lef_text[m.end() : stop])
+        try:
+            macro, used = _parse_lef_macro(tokens, name)
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"MACRO {name}: malformed LEF ({e})") from None
+        lef.macros.append(macro)
+        if used == len(tokens):
+            continue
+        # Statements after END <name>: a SITE or the like before the next
+        # macro, and typically END LIBRARY after the last one.
+        rest = " ".join(tokens[used:]) + "\n"
+        if stop < len(lef_text):
+            lef.between[name] = rest
+        else:
+            lef.trailer = rest
+    return lef
+
+
+def _geometry_lines(geometry, indent):
+    """Geometry statements, one line per LAYER: "LAYER M4 ; RECT ... ;"."""
+    lines = []
+    for statement in geometry:
+        if lines and not statement.startswith("LAYER"):
+            lines[-1] += f" {statement} ;"
+        else:
+            lines.append(f"{indent}{statement} ;")
+    return "".join(line + "\n" for line in lines)
+
+
+def _pin_head(direction, use, statements=()):
+    """The DIRECTION, USE and other statement lines of a PIN."""
+    text = f"    DIRECTION {direction} ;\n" if direction else ""
+    if use:
+        text += f"    USE {use} ;\n"
+    return text + "".join(f"    {statement} ;\n" for statement in statements)
+
+
+def _bank_text(bank):
+    template = (
+        "  PIN {0}\n{5}    PORT\n"
+        f"      LAYER {bank.layer} ; "
+        "RECT {1:.3f} {2:.3f} {3:.3f} {4:.3f} ;\n    END\n  END {0}\n"
+    )
+    head = _pin_head(bank.direction, bank.use)
+    x, y, dx, dy, w, h = bank.x, bank.y, bank.dx, bank.dy, bank.w, bank.h
+    pieces = []
+    for i, name in enumerate(bank.names, 1):
+        px = x + dx * i
+        py = y + dy * i
+        pin = bank.pins.get(name)
+        if pin is not None:
+            pin_head = _pin_head(
+                pin.direction or bank.direction, pin.use or bank.use, pin.statements
+            )
+        else:
+            pin_head = head
+        pieces.append(template.format(name, px, py, px + w, py + h, pin_head))
+    return "".join(pieces)
+
+
+def _pin_text(pin):
+    text = f"  PIN {pin.name}\n" + _pin_head(pin.direction, pin.use, pin.statements)
+    for port in pin.ports:
+        text += "    PORT\n" + _geometry_lines(port, "      ") + "    END\n"
+    return text + f"  END {pin.name}\n"
+
+
+def _macro_chunks(macro):
+    yield f"MACRO {macro.name}\n"
+    if macro.macro_class:
+        yield f"  CLASS {macro.macro_class} ;\n"
+    if macro.origin is not None:
+        yield f"  ORIGIN {' '.join(macro.origin)} ;\n"
+    if macro.size is not None:
+        yield f"  SIZE {macro.size[0]} BY {macro.size[1]} ;\n"
+    for statement in macro.statements:
+        yield f"  {statement} ;\n"
+    for bank in macro.banks:
+        yield _bank_text(bank)
+    for pin in macro.pins:
+        yield _pin_text(pin)
+    if macro.obs is not None:
+        yield "  OBS\n" + _geometry_lines(macro.obs, "    ") + "  END\n"
+    if macro.density is not None:
+        yield "  DENSITY\n" + _geometry_lines(macro.density, "    ") + "  END\n"
+    yield f"END {macro.name}\n"
+
+
+def lef_chunks(lef):
+    """Yield the text of a LefFile piece by piece (one per pin edge/pin)."""
+    if lef.header:
+        yield lef.header.rstrip("\n") + "\n"
+    for macro in lef.macros:
+        yield from _macro_chunks(macro)
+        if macro.name in lef.between:
+            yield "\n" + lef.between[macro.name]
+    if lef.trailer:
+        yield "\n" + lef.trailer
+
+
+def write_lef(lef, f):
+    """Stream a LefFile into a writable text file."""
+    for chunk in lef_chunks(lef):
+        f.write(chunk)
+
+
+def format_lef(lef):
+    return "".join(lef_chunks(lef))
+
+
+def _track_step(edge_count, edge_length, pitch):
+    # Evenly space pins along the edge, but snap the spacing to a
+    # multiple of `pitch` so every pin lands on a routing track.
+    # OpenROAD's macro placer rejects off-grid pins on RightWayOnGridOnly
+    # layers (MPL-0005), so this snap is load-bearing.
+    ideal_step = edge_length / (edge_count + 1)
+    return max(pitch, round(ideal_step / pitch) * pitch)
+
+
+def place_pin_banks(inputs, outputs, clocks, width, height):
+    """PinBanks for the idiomatic ASAP7 layout of a width x height macro.
+
+    Inputs on the left edge and outputs on the right edge, on M4; clocks
+    on the top edge, on M5. Each list is placed in the order given.
+    """
+    banks = []
+    if inputs:
+        step = _track_step(len(inputs), height, _M4_PITCH_UM)
+        banks.append(
+            PinBank(
+                inputs, "INPUT", "M4", 0.0, 0.0, 0.0, step, _M4_PITCH_UM, _M4_PITCH_UM
+            )
+        )
+    if outputs:
+        step = _track_step(len(outputs), height, _M4_PITCH_UM)
+        banks.append(
+            PinBank(
+                outputs,
+                "OUTPUT",
+                "M4",
+                width - _M4_PITCH_UM,
+                0.0,
+                0.0,
+                step,
+                _M4_PITCH_UM,
+                _M4_PITCH_UM,
+            )
+        )
+    if clocks:
+        step = _track_step(len(clocks), width, _M5_PITCH_UM)
+        banks.append(
+            PinBank(
+                clocks,
+                "INPUT",
+                "M5",
+                0.0,
+                height - _M5_PITCH_UM,
+                step,
+                0.0,
+                _M5_PITCH_UM,
+                _M5_PITCH_UM,
+                use="CLOCK",
+            )
+        )
+    return banks
+
+
+def _rect(x0, y0, x1, y1):
+    return f"RECT {x0:.3f} {y0:.3f} {x1:.3f} {y1:.3f}"
+
+
 # Per-bit pin entries (e.g. R0_data[5]) classify the same as the parent
 # bus, so strip a trailing [N] before matching.
 _BIT_SUFFIX_RE = re.compile(r"\[\d+\]$")
+_OUTPUT_PIN_RE = re.compile(r"^R\d+_(data|rdata)$|^RW\d+_rdata$")
+_CLOCK_PIN_RE = re.compile(r"^R\d+_clk$|^W\d+_clk$|^RW\d+_clk$")
+_POWER_PIN_NAMES = frozenset({"VDD", "VSS", "VDDPE", "VSSE", "VDDCE"})
 
 
 def _strip_bit(name):
@@ -962,19 +1657,16 @@ def _strip_bit(name):
 
 
 def _is_output_pin(name):
-    base = _strip_bit(name)
-    return bool(re.match(r"^R\d+_(data|rdata)$|^RW\d+_rdata$", base))
+    return bool(_OUTPUT_PIN_RE.match(_strip_bit(name)))
 
 
 def _is_clock_pin(name):
     base = _strip_bit(name)
-    return base.lower() in ("clk", "clock") or bool(
-        re.match(r"^R\d+_clk$|^W\d+_clk$|^RW\d+_clk$", base)
-    )
+    return base.lower() in ("clk", "clock") or bool(_CLOCK_PIN_RE.match(base))
 
 
 def _is_power_pin(name):
-    return _strip_bit(name).upper() in ("VDD", "VSS", "VDDPE", "VSSE", "VDDCE")
+    return _strip_bit(name).upper() in _POWER_PIN_NAMES
 
 
 def _is_input_pin(name):
@@ -983,26 +1675,35 @@ def _is_input_pin(name):
     return True  # everything else goes on the input (left) edge
 
 
-def rewrite_lef(lef_text, role, bucket):
-    """Rewrite the LEF so outline and pins land on idiomatic ASAP7 positions.
+def _memory_pin_edges(pin_names):
+    """{"input"|"output"|"clock"|"power": sorted names}, by firtool naming.
 
-    Returns the new LEF text. For non-SRAM roles, returns lef_text unchanged.
+    Bits of a bus share the classification of their base name, so each
+    base is classified once.
     """
-    if role.kind != "sram" or bucket is None:
-        return lef_text
+    edges = {"input": [], "output": [], "clock": [], "power": []}
+    edge_of_base = {}
+    for name in pin_names:
+        base = _strip_bit(name) if name.endswith("]") else name
+        edge = edge_of_base.get(base)
+        if edge is None:
+            if _is_power_pin(base):
+                edge = "power"
+            elif _is_output_pin(base):
+                edge = "output"
+            elif _is_clock_pin(base):
+                edge = "clock"
+            else:
+                edge = "input"
+            edge_of_base[base] = edge
+        edges[edge].append(name)
+    for names in edges.values():
+        names.sort()
+    return edges
 
-    # Preserve the preamble (everything up to the first MACRO line).
-    macro_m = re.search(r"^MACRO\s+(\S+)\s*$", lef_text, re.MULTILINE)
-    if not macro_m:
-        return lef_text
-    preamble = lef_text[: macro_m.start()]
-    macro_name = macro_m.group(1)
-    pins = _PIN_OR_BUS_RE.findall(lef_text) or []
-    # Extract all PIN names from LEF (distinct from .lib pins).
-    pin_names = [
-        m.group(1) for m in re.finditer(r"^\s*PIN\s+(\S+)\s*$", lef_text, re.MULTILINE)
-    ]
 
+def _memory_macro(name, pin_names, role, bucket):
+    """LefMacro with the idiomatic outline, pins and blockage for a memory."""
     width = bucket["width_um"]
     height = bucket["height_um"]
     aspect = max(width, height) / min(width, height)
@@ -1011,59 +1712,12 @@ def rewrite_lef(lef_text, role, bucket):
             f"idiomatic bucket for {role.cell_name} has aspect {aspect:.2f}, "
             f"outside 1:1..1:4 window"
         )
-
-    inputs = sorted([p for p in pin_names if _is_input_pin(p)])
-    outputs = sorted([p for p in pin_names if _is_output_pin(p)])
-    clocks = sorted([p for p in pin_names if _is_clock_pin(p)])
-    powers = sorted([p for p in pin_names if _is_power_pin(p)])
-
-    def _bank(edge_count, edge_length, pitch):
-        # Evenly space pins along the edge, but snap the spacing to a
-        # multiple of `pitch` so every pin lands on a routing track.
-        # OpenROAD's macro placer rejects off-grid pins on RightWayOnGridOnly
-        # layers (MPL-0005), so this snap is load-bearing.
-        if edge_count == 0:
-            return []
-        ideal_step = edge_length / (edge_count + 1)
-        step = max(pitch, round(ideal_step / pitch) * pitch)
-        return [step * (i + 1) for i in range(edge_count)]
-
-    lines = [preamble.rstrip("\n") + "\n" if preamble else ""]
-    lines.append(f"MACRO {macro_name}\n")
-    lines.append("  CLASS BLOCK ;\n")
-    lines.append("  ORIGIN 0 0 ;\n")
-    lines.append(f"  SIZE {width:.3f} BY {height:.3f} ;\n")
-
-    # Inputs on the left edge (x=0), on M4.
-    for name, y in zip(inputs, _bank(len(inputs), height, _M4_PITCH_UM)):
-        _emit_pin(
-            lines, name, "INPUT", layer="M4", x=0.0, y=y, w=_M4_PITCH_UM, h=_M4_PITCH_UM
-        )
-    # Outputs on the right edge (x=width), on M4.
-    for name, y in zip(outputs, _bank(len(outputs), height, _M4_PITCH_UM)):
-        _emit_pin(
-            lines,
-            name,
-            "OUTPUT",
-            layer="M4",
-            x=width - _M4_PITCH_UM,
-            y=y,
-            w=_M4_PITCH_UM,
-            h=_M4_PITCH_UM,
-        )
-    # Clocks on the top edge (y=height), on M5.
-    for name, x in zip(clocks, _bank(len(clocks), width, _M5_PITCH_UM)):
-        _emit_pin(
-            lines,
-            name,
-            "INPUT",
-            layer="M5",
-            x=x,
-            y=height - _M5_PITCH_UM,
-            w=_M5_PITCH_UM,
-            h=_M5_PITCH_UM,
-            use="CLOCK",
-        )
+    edges = _memory_pin_edges(pin_names)
+    macro = LefMacro(name, size=(f"{width:.3f}", f"{height:.3f}"))
+    macro.banks = place_pin_banks(
+        edges["input"], edges["output"], edges["clock"], width, height
+    )
+    powers = edges["power"]
     # Power pins as full-width horizontal M4 stripes — PDN searches for
     # USE POWER / USE GROUND macro pins on a stripe layer and stitches them
     # to the parent grid via vias. Small disconnected rects (the previous
@@ -1073,29 +1727,28 @@ def rewrite_lef(lef_text, role, bucket):
     # saw zero macro power. The fakeram_*.lef shipped with the asap7
     # platform uses exactly this shape (multiple full-width M4 stripes per
     # rail); one stripe per rail is the minimum that PDN can find.
-    for i, name in enumerate(powers):
-        is_power = name.upper().startswith("VDD")
+    for pin_name in powers:
+        is_power = pin_name.upper().startswith("VDD")
         # Two stripes per macro evenly split the interior on the y axis;
         # alternate VDD high / VSS low so the rails don't collide.
         y_frac = 0.66 if is_power else 0.33
         stripe_y = y_frac * height - _M4_PITCH_UM / 2.0
-        _emit_pin(
-            lines,
-            name,
-            "INOUT",
-            layer="M4",
-            x=0.0,
-            y=stripe_y,
-            w=width,
-            h=_M4_PITCH_UM,
-            use="POWER" if is_power else "GROUND",
+        macro.pins.append(
+            LefPin(
+                pin_name,
+                "INOUT",
+                "POWER" if is_power else "GROUND",
+                ports=[
+                    ["LAYER M4", _rect(0.0, stripe_y, width, stripe_y + _M4_PITCH_UM)]
+                ],
+            )
         )
 
     # One OBS rectangle covering the interior (conservative blockage). Carve
     # out the M4 stripe rows so PDN sees the PG pin geometry, otherwise the
     # blockage hides the stripes from the macro-pin search.
     inset = _M4_PITCH_UM
-    lines.append("  OBS\n")
+    macro.obs = []
     pg_y_fracs = sorted(
         set(0.66 if n.upper().startswith("VDD") else 0.33 for n in powers)
     )
@@ -1103,30 +1756,78 @@ def rewrite_lef(lef_text, role, bucket):
     cur_y = inset
     for cy in cuts:
         if cy > cur_y:
-            lines.append(
-                f"    LAYER M4 ; RECT {inset:.3f} {cur_y:.3f} "
-                f"{width - inset:.3f} {cy:.3f} ;\n"
-            )
+            macro.obs += ["LAYER M4", _rect(inset, cur_y, width - inset, cy)]
         cur_y = cy + _M4_PITCH_UM
     if cur_y < height - inset:
-        lines.append(
-            f"    LAYER M4 ; RECT {inset:.3f} {cur_y:.3f} "
-            f"{width - inset:.3f} {height - inset:.3f} ;\n"
-        )
-    lines.append("  END\n")
-    lines.append(f"END {macro_name}\n")
-    return "".join(lines)
+        macro.obs += ["LAYER M4", _rect(inset, cur_y, width - inset, height - inset)]
+    return macro
 
 
-def _emit_pin(lines, name, direction, *, layer, x, y, w, h, use=None):
-    lines.append(f"  PIN {name}\n")
-    lines.append(f"    DIRECTION {direction} ;\n")
-    if use:
-        lines.append(f"    USE {use} ;\n")
-    lines.append("    PORT\n")
-    lines.append(f"      LAYER {layer} ; RECT {x:.3f} {y:.3f} {x+w:.3f} {y+h:.3f} ;\n")
-    lines.append("    END\n")
-    lines.append(f"  END {name}\n")
+def rewrite_lef(lef_text, role, bucket):
+    """Rewrite the LEF so outline and pins land on idiomatic ASAP7 positions.
+
+    Returns the new LEF text: the preamble and the first MACRO, rebuilt.
+    For non-SRAM roles, returns lef_text unchanged.
+    """
+    if role.kind != "sram" or bucket is None:
+        return lef_text
+    lef = parse_lef(lef_text)
+    if not lef.macros:
+        return lef_text
+    macro = lef.macros[0]
+    # Only the pin names carry over; geometry comes from the bucket.
+    pin_names = [pin.name for pin in macro.pins]
+    return format_lef(
+        LefFile(lef.header, [_memory_macro(macro.name, pin_names, role, bucket)])
+    )
+
+
+def _lef_pin_edge(pin):
+    """Edge for a pin of an arbitrary hard macro, from its DIRECTION/USE."""
+    use = pin.use.upper()
+    if use in ("POWER", "GROUND"):
+        return "power"
+    if use == "CLOCK":
+        return "clock"
+    if pin.direction.upper() == "OUTPUT":
+        return "output"
+    return "input"
+
+
+def repin_lef(lef_text, *, width=None, height=None):
+    """Re-place the signal pins of every MACRO in a LEF on ASAP7 tracks.
+
+    Works for any hard macro: USE CLOCK pins go on the top edge, OUTPUT
+    pins on the right and the other signal pins on the left, each in LEF
+    order. Each pin keeps its DIRECTION, USE and other statements (SHAPE,
+    ANTENNA*, ...); only its ports are replaced. width/height (µm)
+    replace the outline if given. Power/ground pins, OBS, DENSITY and
+    other statements are kept as they are. Returns the new LEF text.
+    """
+    lef = parse_lef(lef_text)
+    for macro in lef.macros:
+        if width is not None or height is not None:
+            macro.size = (
+                f"{width:.3f}" if width is not None else macro.size[0],
+                f"{height:.3f}" if height is not None else macro.size[1],
+            )
+        edges = {"input": [], "output": [], "clock": [], "power": []}
+        kept = []
+        moved = {}
+        for pin in macro.pins:
+            edge = _lef_pin_edge(pin)
+            if edge == "power":
+                kept.append(pin)
+            else:
+                edges[edge].append(pin.name)
+                moved[pin.name] = pin
+        macro.pins = kept
+        macro.banks = place_pin_banks(
+            edges["input"], edges["output"], edges["clock"], macro.width, macro.height
+        )
+        for bank in macro.banks:
+            bank.pins = moved
+    return format_lef(lef)
 
 
 # ---------------------------------------------------------------------------
@@ -1456,8 +2157,8 @@ def generate_lef(role, tech_nm=DEFAULT_TECH_NM):
     """Return LEF text for the role, synthesized from scratch.
 
     Outline from the fitted area model; pin layout from the idiomatic
-    ASAP7 convention (addr/ctrl left, data-out right, clk top) already
-    implemented in rewrite_lef(). For non-SRAM roles (flop-memory
+    ASAP7 convention (addr/ctrl left, data-out right, clk top) shared
+    with rewrite_lef(). For non-SRAM roles (flop-memory
     becomes a standard-cell placement rather than a macro), returns a
     null LEF so the downstream flow is informed the macro has no
     outline — caller decides whether to skip or flatten.
@@ -1466,20 +2167,9 @@ def generate_lef(role, tech_nm=DEFAULT_TECH_NM):
     if bucket is None or "width_um" not in bucket:
         return ""
     name = role.cell_name or role.library_name or f"mem_{role.rows}x{role.bits}"
-    # Build a stub LEF with just the name and a placeholder outline, then
-    # let rewrite_lef() do the real pin placement from our known pin set.
-    stub = [
-        f"VERSION 5.8 ;",
-        f'BUSBITCHARS "[]" ;',
-        f'DIVIDERCHAR "/" ;',
-        f"",
-        f"MACRO {name}",
-        f"  CLASS BLOCK ;",
-        f"  ORIGIN 0 0 ;",
-        f"  SIZE 1 BY 1 ;",
-    ]
     addr_w = _addr_bits(role.rows)
     data_w = role.bits
+    pin_names = []
     for port in _port_pin_names(role).values():
         for pn, direction, is_bus in port:
             # For bus pins, emit one PIN entry per bit (PIN R0_addr[0], …).
@@ -1493,36 +2183,17 @@ def generate_lef(role, tech_nm=DEFAULT_TECH_NM):
                     bus_w = role.pin_widths.get(pn, data_w)
                 else:
                     bus_w = role.pin_widths.get(pn, 1)
-                names = [f"{pn}[{b}]" for b in range(bus_w)]
+                pin_names.extend(f"{pn}[{b}]" for b in range(bus_w))
             else:
-                names = [pn]
-            for nm in names:
-                stub.append(f"  PIN {nm}")
-                stub.append(
-                    f"    DIRECTION {'OUTPUT' if direction == 'output' else 'INPUT'} ;"
-                )
-                if nm.endswith("_clk"):
-                    stub.append(f"    USE CLOCK ;")
-                    stub.append(f"    PORT LAYER M5 ; RECT 0 0 0.1 0.1 ; END")
-                else:
-                    stub.append(f"    PORT LAYER M4 ; RECT 0 0 0.1 0.1 ; END")
-                stub.append(f"  END {nm}")
-    # Power/ground pins. rewrite_lef() turns these into full-width M4
+                pin_names.append(pn)
+    # Power/ground pins. _memory_macro() turns these into full-width M4
     # stripes that PDN can stitch to the parent power grid; without them
     # the floorplan's PDN stage warns PDN-0231 "<inst> not connected to
     # any power/ground nets" for every behavioral macro and the parent's
-    # downstream power analysis sees zero macro power. _is_power_pin()
-    # already classifies VDD / VSS, so only the stub entries are new.
-    for pg, use in (("VDD", "POWER"), ("VSS", "GROUND")):
-        stub.append(f"  PIN {pg}")
-        stub.append(f"    DIRECTION INOUT ;")
-        stub.append(f"    USE {use} ;")
-        stub.append(f"    PORT LAYER M4 ; RECT 0 0 0.1 0.1 ; END")
-        stub.append(f"  END {pg}")
-    stub.append(f"END {name}")
-    stub.append("")
-    stub.append("END LIBRARY")
-    return rewrite_lef("\n".join(stub) + "\n", role, bucket)
+    # downstream power analysis sees zero macro power.
+    pin_names += ["VDD", "VSS"]
+    header = 'VERSION 5.8 ;\nBUSBITCHARS "[]" ;\nDIVIDERCHAR "/" ;\n'
+    return format_lef(LefFile(header, [_memory_macro(name, pin_names, role, bucket)]))
 
 
 # ---------------------------------------------------------------------------
@@ -1536,7 +2207,89 @@ def generate_lef(role, tech_nm=DEFAULT_TECH_NM):
 # an orfs_macro() per memory module — no synthesis, no P&R, no ORFS run.
 # ---------------------------------------------------------------------------
 
-_VERILOG_MODULE_HEADER_RE = re.compile(r"^\s*module\s+(\w+)\b", re.MULTILINE)
+# Prefilters for the scan. Patterns that start with a literal run much
+# faster on big inputs than ^-anchored ones, so both are found by their
+# literal part first and verified after.
+_MODULE_KEYWORD = r"module(?<=\bmodule)\s+(\w+)\b"
+_MODULE_KEYWORD_RE = re.compile(_MODULE_KEYWORD)
+_MODULE_KEYWORD_BYTES_RE = re.compile(_MODULE_KEYWORD.encode())
+# A module can only classify as sram if one of its port names follows
+# the firtool convention (see _FIRTOOL_PIN_RE).
+_FIRTOOL_TAIL = r"_(?:addr|en|mask|wmask|data|rdata|wdata|wmode|clk)\b"
+_FIRTOOL_PIN_WORD = r"\b(?:R|RW|W)\d+" + _FIRTOOL_TAIL
+_FIRTOOL_TAIL_RE = re.compile(_FIRTOOL_TAIL)
+_FIRTOOL_TAIL_BYTES_RE = re.compile(_FIRTOOL_TAIL.encode())
+_FIRTOOL_PIN_WORD_RE = re.compile(_FIRTOOL_PIN_WORD)
+_FIRTOOL_PIN_WORD_BYTES_RE = re.compile(_FIRTOOL_PIN_WORD.encode())
+_SCAN_STR = (_MODULE_KEYWORD_RE, _FIRTOOL_TAIL_RE, _FIRTOOL_PIN_WORD_RE, "\n")
+_SCAN_BYTES = (
+    _MODULE_KEYWORD_BYTES_RE,
+    _FIRTOOL_TAIL_BYTES_RE,
+    _FIRTOOL_PIN_WORD_BYTES_RE,
+    b"\n",
+)
+# Longest "R<n>" in front of a firtool pin tail that the scan looks back for.
+_FIRTOOL_PREFIX_MAX = 8
+
+
+def _scan_module(name, body):
+    """MemoryRole for one module's text, or None if it is not a memory."""
+    pins = _extract_verilog_pins(body)
+    if not pins:
+        return None
+    role = _classify_verilog_pins(name, pins)
+    if role.kind == "sram":
+        role.read_mode = _detect_read_mode(body, role)
+    if role.kind in ("sram", "flop_memory"):
+        return role
+    return None
+
+
+def _module_headers(buf, patterns, start, end):
+    """Yield (line start, name match) for each `module <name>` that
+    starts a line (after indentation) at or after start and before end."""
+    keyword_re, newline = patterns[0], patterns[3]
+    for m in keyword_re.finditer(buf, start, end):
+        line = buf.rfind(newline, 0, m.start()) + 1
+        if not buf[line : m.start()].strip():
+            yield line, m
+
+
+def _has_firtool_pin(buf, patterns, start, stop):
+    """Whether buf[start:stop] mentions a firtool-convention pin name."""
+    _, tail_re, pin_re, _ = patterns
+    for m in tail_re.finditer(buf, start, stop):
+        if pin_re.search(buf, max(start, m.start() - _FIRTOOL_PREFIX_MAX), m.end()):
+            return True
+    return False
+
+
+def _scan_modules(buf, patterns, start=0, end=None, decode=str):
+    """Yield (name, role) for memory modules whose header starts in
+    buf[start:end]; buf is a str, or a bytes-like object such as an mmap
+    with patterns=_SCAN_BYTES.
+
+    A module's body runs to the next module header. Modules that can
+    neither be a firtool SRAM (no firtool pin name in the body) nor a
+    flop memory (no _<rows>x<bits> name suffix) are skipped without
+    copying their body out of buf.
+    """
+    end = len(buf) if end is None else end
+    headers = list(_module_headers(buf, patterns, start, end))
+    if not headers:
+        return
+    following = next(_module_headers(buf, patterns, end, len(buf)), None)
+    stops = [line for line, _ in headers[1:]]
+    stops.append(following[0] if following else len(buf))
+    for (line, m), stop in zip(headers, stops):
+        name = decode(m.group(1))
+        if not _dims_from_name(name) and not _has_firtool_pin(
+            buf, patterns, m.end(), stop
+        ):
+            continue
+        role = _scan_module(name, decode(buf[line:stop]))
+        if role is not None:
+            yield name, role
 
 
 def scan_verilog_for_memories(text):
@@ -1550,27 +2303,7 @@ def scan_verilog_for_memories(text):
     The returned roles carry rows/bits/nR/nW/nRW inferred directly from
     the module header + port list — no `.lib` needed.
     """
-    out = {}
-    # Split the text into per-module bodies using module header positions.
-    headers = list(_VERILOG_MODULE_HEADER_RE.finditer(text))
-    for i, m in enumerate(headers):
-        start = m.start()
-        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
-        body = text[start:end]
-        name = m.group(1)
-        # Build a minimal Liberty-shaped "cell(name) { …body… }" string so
-        # classify() can reuse its pin regex without a real .lib. The
-        # pin(NAME) / bus(NAME) captures inside classify() match here
-        # if we rewrite `input [N:0] R0_addr` → emit a synthetic cell.
-        pins = _extract_verilog_pins(body)
-        if not pins:
-            continue
-        role = _classify_verilog_pins(name, pins)
-        if role.kind == "sram":
-            role.read_mode = _detect_read_mode(body, role)
-        if role.kind in ("sram", "flop_memory"):
-            out[name] = role
-    return out
+    return dict(_scan_modules(text, _SCAN_STR))
 
 
 def _detect_read_mode(body, role):
@@ -1593,18 +2326,7 @@ def _detect_read_mode(body, role):
     if not output_pins:
         return role.read_mode
 
-    # Collect signals assigned non-blocking inside a posedge-always block —
-    # those are registered, so even a continuous-assign of an rdata pin
-    # from one of them is still a sync read.
-    registered = set()
-    for m in _POSEDGE_ALWAYS_RE.finditer(body):
-        # Scan the block body until the matching end / endalways heuristic.
-        # The firtool style always places the NBA on the very next lines,
-        # so a bounded window is plenty.
-        window = body[m.end() : m.end() + 2000]
-        for nm in _NONBLOCKING_LHS_RE.finditer(window):
-            registered.add(nm.group(1))
-
+    registered = None  # computed on first use
     for pn in output_pins:
         # Non-blocking assignment to the rdata pin directly ⇒ sync.
         if re.search(rf"\b{re.escape(pn)}\s*<=", body):
@@ -1614,6 +2336,8 @@ def _detect_read_mode(body, role):
             rhs = am.group(1)
             # assign rdata = some_reg;  where some_reg is registered ⇒ sync.
             rhs_ident = re.match(r"\s*(\w+)\s*$", rhs)
+            if rhs_ident and registered is None:
+                registered = _registered_signals(body)
             if rhs_ident and rhs_ident.group(1) in registered:
                 return "sync"
             # assign rdata = Memory[...]  or assign rdata = <non-registered> ⇒ async.
@@ -1625,18 +2349,91 @@ _POSEDGE_ALWAYS_RE = re.compile(r"\balways(?:_ff)?\s*@\s*\(\s*posedge\b")
 _NONBLOCKING_LHS_RE = re.compile(r"\b(\w+)\s*<=")
 
 
-def scan_verilog_files(paths):
-    """Aggregate scan_verilog_for_memories across multiple files/folders."""
-    out = {}
+def _registered_signals(body):
+    """Signals assigned non-blocking inside a posedge-always block —
+    those are registered, so even a continuous-assign of an rdata pin
+    from one of them is still a sync read."""
+    registered = set()
+    for m in _POSEDGE_ALWAYS_RE.finditer(body):
+        # Scan the block body until the matching end / endalways heuristic.
+        # The firtool style always places the NBA on the very next lines,
+        # so a bounded window is plenty.
+        for nm in _NONBLOCKING_LHS_RE.finditer(body, m.end(), m.end() + 2000):
+            registered.add(nm.group(1))
+    return registered
+
+
+# Files larger than this are split, at line starts, into shards that
+# are scanned in parallel.
+SCAN_SHARD_BYTES = 64 << 20
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+def _scan_shard(path, start, end):
+    """([(name, role)], seconds) for the modules whose header starts in
+    bytes [start, end) of the file at path, scanned over an mmap."""
+    t0 = time.perf_counter()
+    if start >= end:
+        return [], 0.0  # empty file; mmap refuses those
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            found = list(_scan_modules(mm, _SCAN_BYTES, start, end, _decode))
+    return found, time.perf_counter() - t0
+
+
+def _shards(path, shard_bytes):
+    """[(path, start, end)] covering the file. Boundaries sit at line
+    starts, so a module header is never cut in two."""
+    size = os.path.getsize(path)
+    if size <= shard_bytes:
+        return [(path, 0, size)]
+    bounds = [0]
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            at = shard_bytes
+            while at < size:
+                nl = mm.find(b"\n", at)
+                if nl < 0:
+                    break
+                bounds.append(nl + 1)
+                at = nl + 1 + shard_bytes
+    bounds.append(size)
+    return [(path, a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def _verilog_files(paths):
+    """Files in paths, directories expanded to their .sv then .v files."""
     for p in paths:
         p = Path(p)
         if p.is_dir():
-            for sub in p.rglob("*.sv"):
-                out.update(scan_verilog_for_memories(sub.read_text()))
-            for sub in p.rglob("*.v"):
-                out.update(scan_verilog_for_memories(sub.read_text()))
+            found = [sub for sub in p.rglob("*") if sub.suffix in (".sv", ".v")]
+            found.sort(key=lambda sub: sub.suffix != ".sv")
+            yield from (sub for sub in found if sub.is_file())
         else:
-            out.update(scan_verilog_for_memories(p.read_text()))
+            yield p
+
+
+def scan_verilog_files(paths, jobs=1, timings=None, shard_bytes=SCAN_SHARD_BYTES):
+    """Aggregate scan_verilog_for_memories across multiple files/folders.
+
+    Files are scanned over mmaps in shards of about shard_bytes, on up
+    to `jobs` processes. When timings is a dict, each file's scan time
+    (summed over its shards) is stored in it, keyed by path.
+    """
+    tasks = [shard for f in _verilog_files(paths) for shard in _shards(f, shard_bytes)]
+    if jobs <= 1 or len(tasks) <= 1:
+        results = [_scan_shard(*task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(min(jobs, len(tasks))) as pool:
+            results = list(pool.map(_scan_shard, *zip(*tasks)))
+    out = {}
+    for (path, _, _), (found, seconds) in zip(tasks, results):
+        out.update(found)
+        if timings is not None:
+            timings[str(path)] = timings.get(str(path), 0.0) + seconds
     return out
 
 
@@ -1721,8 +2518,8 @@ def scale_reference(
     Raises ValueError if two .libs are supplied and disagree about
     library/cell name.
     """
-    role = classify(lib_post_cts_text)
-    bucket, warning = lookup_idiomatic(role)
+    scaling = MacroScaling(lib_post_cts_text, timing_scale_override)
+    role = scaling.role
 
     if lib_pre_layout_text is not None:
         pre_role = classify(lib_pre_layout_text)
@@ -1732,35 +2529,104 @@ def scale_reference(
                 f"pre-layout='{pre_role.library_name}'"
             )
 
-    timing_scale = (
-        timing_scale_override
-        if timing_scale_override is not None
-        else compute_timing_scale(role, bucket, lib_post_cts_text)
+    post_template = ScaledLibTemplate(lib_post_cts_text)
+    scaled_post = post_template.render(**scaling.post_cts_kwargs())
+
+    if lib_pre_layout_text is not None:
+        pre_template = ScaledLibTemplate(lib_pre_layout_text)
+    elif emit_pre_layout:
+        pre_template = post_template
+    else:
+        pre_template = None
+    scaled_pre = (
+        pre_template.render(**scaling.pre_layout_kwargs())
+        if pre_template is not None
+        else None
     )
+    scaled_lef = scaling.rewrite_lef(lef_text)
+    return scaled_post, scaled_pre, scaled_lef, role, scaling.bucket, scaling.warning
 
-    post_ck = bucket["post_cts_ck_insertion_ps"] if bucket else None
-    pre_ck = bucket["pre_layout_ck_insertion_ps"] if bucket else None
 
-    scaled_post = scale_lib_text(
-        lib_post_cts_text,
-        timing_scale=timing_scale,
-        ck_insertion_ps=post_ck,
-    )
+class MacroScaling:
+    """What scale_reference() derives from a macro's reference .lib.
 
-    pre_source = lib_pre_layout_text
-    if pre_source is None and emit_pre_layout:
-        pre_source = lib_post_cts_text
-    scaled_pre = (
-        scale_lib_text(
-            pre_source,
-            timing_scale=timing_scale,
-            ck_insertion_ps=pre_ck,
+    The role, idiomatic bucket and data-path timing scale are computed
+    once, from one corner; every other corner of the same macro is then
+    scaled with them. Clock-tree arcs are set to the bucket's insertion
+    delay times the corner's own clock-tree delay over the reference's,
+    so the spread between corners is preserved on both paths.
+    """
+
+    def __init__(self, reference_lib_text, timing_scale_override=None):
+        self.role = classify(reference_lib_text)
+        self.bucket, self.warning = lookup_idiomatic(self.role)
+        self.timing_scale = (
+            timing_scale_override
+            if timing_scale_override is not None
+            else compute_timing_scale(self.role, self.bucket, reference_lib_text)
         )
-        if pre_source is not None
-        else None
+        self._reference_lib_text = reference_lib_text
+
+    @functools.cached_property
+    def reference_clock_tree_s(self):
+        return clock_tree_insertion_s([self._reference_lib_text])
+
+    def _kwargs(self, ck_key, clock_tree_s):
+        ck_insertion_ps = self.bucket[ck_key] if self.bucket else None
+        if ck_insertion_ps is not None and clock_tree_s and self.reference_clock_tree_s:
+            ck_insertion_ps *= clock_tree_s / self.reference_clock_tree_s
+        return dict(timing_scale=self.timing_scale, ck_insertion_ps=ck_insertion_ps)
+
+    def post_cts_kwargs(self, clock_tree_s=None):
+        """scale_lib_text() keyword arguments for a post-CTS .lib.
+
+        clock_tree_s is the corner's clock_tree_insertion_s(); None
+        means the reference corner.
+        """
+        return self._kwargs("post_cts_ck_insertion_ps", clock_tree_s)
+
+    def pre_layout_kwargs(self, clock_tree_s=None):
+        """scale_lib_text() keyword arguments for a pre-layout .lib."""
+        return self._kwargs("pre_layout_ck_insertion_ps", clock_tree_s)
+
+    def rewrite_lef(self, lef_text):
+        return rewrite_lef(lef_text, self.role, self.bucket)
+
+
+def scale_corners(*, corner_libs, lef_text, reference_corner=None, **kwargs):
+    """scale_reference() for a macro characterized at several corners.
+
+    corner_libs maps a corner name to its post-CTS Liberty text. The
+    reference corner (default: the first) is classified and sets the
+    timing scale and clock insertion delay, which each corner scales by
+    its own clock-tree delay; every corner is then scaled in one pass, its
+    post-CTS and pre-layout outputs rendered from one tokenization. kwargs
+    (timing_scale_override) go to MacroScaling.
+
+    Returns ({corner: (scaled_post_cts, scaled_pre_layout)}, scaled_lef,
+    role, bucket, warning).
+    """
+    if not corner_libs:
+        raise ValueError("scale_corners needs at least one corner")
+    if reference_corner is None:
+        reference_corner = next(iter(corner_libs))
+    if reference_corner not in corner_libs:
+        raise ValueError(f"reference corner {reference_corner!r} not in corner_libs")
+    scaling = MacroScaling(corner_libs[reference_corner], **kwargs)
+    scaled = {}
+    for corner, text in corner_libs.items():
+        template = ScaledLibTemplate(text)
+        scaled[corner] = (
+            template.render(**scaling.post_cts_kwargs(template.clock_tree_s)),
+            template.render(**scaling.pre_layout_kwargs(template.clock_tree_s)),
+        )
+    return (
+        scaled,
+        scaling.rewrite_lef(lef_text),
+        scaling.role,
+        scaling.bucket,
+        scaling.warning,
     )
-    scaled_lef = rewrite_lef(lef_text, role, bucket)
-    return scaled_post, scaled_pre, scaled_lef, role, bucket, warning
 
 
 def _log_role(role, bucket, warning):
@@ -1782,12 +2648,103 @@ def _log_role(role, bucket, warning):
     print("memory_macro_scaler: " + " ".join(parts), file=sys.stderr)
 
 
+# Cell name the per-shape texts are generated under; each module's name
+# is substituted for it.
+_SHAPE_NAME = "__memory_macro_shape__"
+
+
+def _shape_key(role):
+    """Everything generate_lib()/generate_lef() read from a role except
+    its name. Modules with equal keys get identical abstracts."""
+    return (
+        role.kind,
+        role.rows,
+        role.bits,
+        role.nR,
+        role.nW,
+        role.nRW,
+        role.read_mode,
+        tuple(sorted(role.pin_widths.items())),
+    )
+
+
+def _shape_texts(role, tech_nm):
+    """(lib, pre-layout lib, lef) text for role's shape, named _SHAPE_NAME."""
+    role = replace(role, library_name=_SHAPE_NAME, cell_name=_SHAPE_NAME)
+    lib_text = generate_lib(role, tech_nm=tech_nm)
+    # Pre-layout = ideal-clock version of the same .lib (ck_insertion=0).
+    pre_layout_text = scale_lib_text(lib_text, timing_scale=1.0, ck_insertion_ps=0.0)
+    lef_text = generate_lef(role, tech_nm=tech_nm)
+    return lib_text, pre_layout_text, lef_text
+
+
+_MODEL_HASH = None
+
+
+def _model_hash():
+    """Digest of the fitted model's inputs and of the generator's code:
+    this script and liberty.py, which scale_lib_text() runs through."""
+    global _MODEL_HASH
+    if _MODEL_HASH is None:
+        h = hashlib.sha256()
+        h.update(repr(MEMORY_DATA_POINTS).encode())
+        h.update(repr(_AREA_FIT).encode())
+        h.update(Path(__file__).read_bytes())
+        h.update(Path(liberty.__file__).read_bytes())
+        _MODEL_HASH = h.hexdigest()
+    return _MODEL_HASH
+
+
+class ShapeCache:
+    """On-disk cache of _shape_texts(), one JSON file per (shape, tech_nm,
+    model) key. Best effort: unreadable entries are regenerated and write
+    failures are ignored."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, key, tech_nm):
+        digest = hashlib.sha256(
+            json.dumps([key, tech_nm, _model_hash()]).encode()
+        ).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def load(self, key, tech_nm):
+        try:
+            entry = json.loads(self._path(key, tech_nm).read_text())
+            return entry["lib"], entry["pre_layout_lib"], entry["lef"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store(self, key, tech_nm, texts):
+        path = self._path(key, tech_nm)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        entry = dict(zip(("lib", "pre_layout_lib", "lef"), texts))
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(entry))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+def _generate_shapes(roles, tech_nm, jobs):
+    """_shape_texts() for each role, on up to `jobs` processes."""
+    if jobs <= 1 or len(roles) <= 1:
+        return [_shape_texts(role, tech_nm) for role in roles]
+    with concurrent.futures.ProcessPoolExecutor(min(jobs, len(roles))) as pool:
+        return list(pool.map(_shape_texts, roles, [tech_nm] * len(roles)))
+
+
 def generate_abstracts_from_verilog(
     *,
     verilog_paths,
     out_dir,
     module_filter=None,
     tech_nm=DEFAULT_TECH_NM,
+    jobs=1,
+    cache_dir=None,
+    scan_timings=None,
 ):
     """Generate .lib + .lef pairs for every memory module found in verilog_paths.
 
@@ -1795,23 +2752,42 @@ def generate_abstracts_from_verilog(
     detected memory module is written into out_dir. Returns the dict of
     {module_name: role}. Skips non-memory modules.
 
+    Modules that share a shape (see _shape_key()) differ only in their
+    name, so the texts are generated once per shape, on up to `jobs`
+    processes, and the module name is substituted in. With cache_dir,
+    per-shape texts are also kept on disk across runs. scan_timings is
+    passed on to scan_verilog_files().
+
     This is the fast path: O(milliseconds) per macro, no ORFS runs.
     """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    roles = scan_verilog_files(verilog_paths)
+    roles = scan_verilog_files(verilog_paths, jobs=jobs, timings=scan_timings)
     if module_filter is not None:
         roles = {n: r for n, r in roles.items() if n in module_filter}
+    shapes = {}
+    for role in roles.values():
+        shapes.setdefault(_shape_key(role), role)
+    cache = ShapeCache(cache_dir) if cache_dir else None
+    texts = {}
+    if cache is not None:
+        for key in shapes:
+            cached = cache.load(key, tech_nm)
+            if cached is not None:
+                texts[key] = cached
+    todo = [key for key in shapes if key not in texts]
+    generated = _generate_shapes([shapes[key] for key in todo], tech_nm, jobs)
+    for key, shape_texts in zip(todo, generated):
+        texts[key] = shape_texts
+        if cache is not None:
+            cache.store(key, tech_nm, shape_texts)
     for name, role in roles.items():
-        lib_text = generate_lib(role, tech_nm=tech_nm)
-        # Pre-layout = ideal-clock version of the same .lib (ck_insertion=0).
-        pre_layout_text = scale_lib_text(
-            lib_text, timing_scale=1.0, ck_insertion_ps=0.0
+        lib_text, pre_layout_text, lef_text = texts[_shape_key(role)]
+        (out_dir / f"{name}.lib").write_text(lib_text.replace(_SHAPE_NAME, name))
+        (out_dir / f"{name}_pre_layout.lib").write_text(
+            pre_layout_text.replace(_SHAPE_NAME, name)
         )
-        lef_text = generate_lef(role, tech_nm=tech_nm)
-        (out_dir / f"{name}.lib").write_text(lib_text)
-        (out_dir / f"{name}_pre_layout.lib").write_text(pre_layout_text)
-        (out_dir / f"{name}.lef").write_text(lef_text)
+        (out_dir / f"{name}.lef").write_text(lef_text.replace(_SHAPE_NAME, name))
     return roles
 
 
@@ -1824,9 +2800,17 @@ def main(argv=None):
         --in-lib-post-cts A.lib [--in-lib-pre-layout B.lib] --in-lef A.lef
         --out-lib-post-cts X.lib --out-lib-pre-layout Y.lib --out-lef X.lef
 
+      scale one macro characterized at several corners:
+        --in-corner-lib ss=A_ss.lib --in-corner-lib ff=A_ff.lib …
+        [--reference-corner ss] --in-lef A.lef --out-dir DIR --out-lef X.lef
+        (writes DIR/<corner>.lib and DIR/<corner>_pre_layout.lib)
+
       generate abstracts from Verilog (the "behavioral-memory" flow):
         --verilog path/ [--verilog file.sv …] --out-dir DIR
-        [--module NAME …] [--tech-nm N]
+        [--module NAME …] [--tech-nm N] [--jobs N] [--cache-dir DIR]
+
+      refresh the committed fit after editing the sweep YAML or this script:
+        --pin-fit
     """
     p = argparse.ArgumentParser(description=__doc__)
     # Scaling-mode inputs/outputs (all optional at arg-parse time).
@@ -1843,6 +2827,21 @@ def main(argv=None):
         help="Override the computed data-path timing scale.",
     )
 
+    # Multi-corner scaling inputs.
+    p.add_argument(
+        "--in-corner-lib",
+        action="append",
+        default=None,
+        metavar="CORNER=PATH",
+        help="Post-CTS .lib (or .lib.gz) of one corner; repeat per corner. "
+        "Triggers multi-corner mode; outputs go to --out-dir.",
+    )
+    p.add_argument(
+        "--reference-corner",
+        default=None,
+        help="Corner that sets the timing scale (default: the first).",
+    )
+
     # Verilog-mode inputs.
     p.add_argument(
         "--verilog",
@@ -1857,7 +2856,7 @@ def main(argv=None):
         "--out-dir",
         type=Path,
         default=None,
-        help="Output directory for behavioral-memory mode.",
+        help="Output directory for behavioral-memory and multi-corner modes.",
     )
     p.add_argument(
         "--module",
@@ -1866,14 +2865,43 @@ def main(argv=None):
         help="Only emit this module name (repeatable).",
     )
     p.add_argument("--tech-nm", type=int, default=DEFAULT_TECH_NM)
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes scanning Verilog shards and generating distinct "
+        "memory shapes in parallel.",
+    )
+    p.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=os.environ.get("MEMORY_MACRO_SCALER_CACHE_DIR") or None,
+        help="Keep generated per-shape abstracts here across runs "
+        "(default: $MEMORY_MACRO_SCALER_CACHE_DIR, else no cache).",
+    )
+
+    p.add_argument(
+        "--pin-fit",
+        action="store_true",
+        help="Refit from the sweep YAML and write "
+        "characterization/asap7_sweep.fit.json (into the source tree "
+        "under `bazel run`).",
+    )
 
     p.add_argument("--dry-run", action="store_true")
     args = p.parse_args(argv)
 
+    if args.pin_fit:
+        return _main_pin_fit(p)
+
     if args.verilog:
         if args.out_dir is None:
             p.error("--out-dir is required with --verilog")
         return _main_from_verilog(args)
+    if args.in_corner_lib:
+        if args.in_lef is None or args.out_dir is None or args.out_lef is None:
+            p.error("--in-corner-lib requires --in-lef, --out-dir and --out-lef")
+        return _main_scale_corners(p, args)
     if (
         args.in_lib_post_cts is None
         or args.in_lef is None
@@ -1887,15 +2915,39 @@ def main(argv=None):
     return _main_scale(p, args)
 
 
+def _main_pin_fit(p):
+    if importlib.util.find_spec("yaml") is None:
+        p.error("--pin-fit needs PyYAML to read the sweep")
+    fit_path = _FIT_JSON
+    workspace = os.environ.get("BUILD_WORKSPACE_DIRECTORY")
+    if workspace:
+        fit_path = (
+            Path(workspace)
+            / "tools/memory_macro_scaler/characterization"
+            / _FIT_JSON.name
+        )
+    _pin_fit(_SWEEP_YAML, _BUILTIN_DATA_POINTS, fit_path)
+    print(f"wrote {fit_path}")
+    return 0
+
+
 def _main_from_verilog(args):
+    timings = {}
     roles = generate_abstracts_from_verilog(
         verilog_paths=args.verilog,
         out_dir=args.out_dir,
         module_filter=set(args.module) if args.module else None,
         tech_nm=args.tech_nm,
+        jobs=args.jobs,
+        cache_dir=args.cache_dir,
+        scan_timings=timings,
     )
+    for path, seconds in timings.items():
+        print(f"memory_macro_scaler: scanned {path} in {seconds:.2f}s", file=sys.stderr)
+    shapes = len({_shape_key(role) for role in roles.values()})
     print(
-        f"memory_macro_scaler: wrote {len(roles)} macro abstract(s) to "
+        f"memory_macro_scaler: wrote {len(roles)} macro abstract(s) "
+        f"({shapes} distinct shape(s)) to "
         f"{args.out_dir} (tech_nm={args.tech_nm})",
         file=sys.stderr,
     )
@@ -1939,5 +2991,56 @@ def _main_scale(p, args):
     return 0
 
 
+def _main_scale_corners(p, args):
+    """Multi-corner mode: classify once, then stream-scale every corner."""
+    corners = {}
+    for spec in args.in_corner_lib:
+        corner, sep, path = spec.partition("=")
+        if not sep or not corner or not path:
+            p.error(f"--in-corner-lib expects CORNER=PATH, got {spec!r}")
+        if corner in corners:
+            p.error(f"corner {corner!r} given twice")
+        corners[corner] = Path(path)
+    reference = args.reference_corner or next(iter(corners))
+    if reference not in corners:
+        p.error(f"--reference-corner {reference!r} is not an --in-corner-lib")
+
+    scaling = MacroScaling(
+        "".join(liberty.open_chunks(corners[reference])), args.timing_scale
+    )
+    _log_role(scaling.role, scaling.bucket, scaling.warning)
+    if args.dry_run:
+        return 0
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for corner, path in corners.items():
+        # The clock insertion delay depends on the corner's own clock-tree
+        # arcs, which can follow the data-path tables; read them first.
+        clock_tree_s = (
+            None
+            if corner == reference
+            else clock_tree_insertion_s(liberty.open_chunks(path))
+        )
+        post = args.out_dir / f"{corner}.lib"
+        pre = args.out_dir / f"{corner}_pre_layout.lib"
+        with open(post, "w", encoding="latin-1") as post_f, open(
+            pre, "w", encoding="latin-1"
+        ) as pre_f:
+            scale_lib_into(
+                liberty.open_chunks(path),
+                [
+                    (post_f, scaling.post_cts_kwargs(clock_tree_s)),
+                    (pre_f, scaling.pre_layout_kwargs(clock_tree_s)),
+                ],
+            )
+    args.out_lef.write_text(scaling.rewrite_lef(args.in_lef.read_text()))
+    print(
+        f"memory_macro_scaler: scaled {len(corners)} corner(s) to {args.out_dir} "
+        f"(reference {reference}, timing_scale={scaling.timing_scale:.4g})",
+        file=sys.stderr,
+    )
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -3,12 +3,15 @@
 All fixtures are inline strings — no filesystem access, no subprocess.
 """
 
+import gzip
 import io
+import json
 import re
 import tempfile
 import textwrap
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import memory_macro_scaler as mms
 
@@ -461,6 +464,90 @@ class TestScaleLibText(unittest.TestCase):
         for v in _extract_ck_values(scaled):
             self.assertAlmostEqual(v, 0.3, places=6)
 
+    def test_chunked_stream_matches_whole_text(self):
+        text = _firtool_sram_lib(ck_path_value=0.3)
+        whole = mms.scale_lib_text(text, timing_scale=0.5, ck_insertion_ps=220.0)
+        chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+        streamed = "".join(
+            mms.scale_lib_chunks(chunks, timing_scale=0.5, ck_insertion_ps=220.0)
+        )
+        self.assertEqual(streamed, whole)
+
+
+_TABLE_LIB = textwrap.dedent(
+    """\
+    library(tbl) {
+      time_unit : "1ns";
+      cell(m) {
+        pin(Q) {
+          timing() {
+            timing_type : rising_edge;
+            cell_rise(delay_template) {
+              values ("0.1, 0.2, 0.4", \\
+                      "1e-1, 0.3, 0.5");
+            }
+          }
+          timing() {
+            timing_type : max_clock_tree_path;
+            cell_rise(delay_template) {
+              values ("0.3, 0.3", "0.3, 0.3");
+            }
+          }
+          internal_power() {
+            rise_power(power_template) {
+              values ("10, 20");
+            }
+          }
+          timing() {
+            timing_type : setup_rising;
+            rise_constraint(c) { values ("a, b"); }
+          }
+        }
+      }
+    }
+    """
+)
+
+
+class TestScaleLibTables(unittest.TestCase):
+    def test_multi_row_table_scaled_in_place(self):
+        scaled = mms.scale_lib_text(_TABLE_LIB, timing_scale=2.0, power_scale=0.5)
+        self.assertIn('values ("0.2, 0.4, 0.8", \\\n', scaled)
+        self.assertIn('"0.2, 0.6, 1");', scaled)
+        self.assertIn('values ("0.6, 0.6", "0.6, 0.6");', scaled)
+        self.assertIn('values ("5, 10");', scaled)
+
+    def test_ck_insertion_fills_whole_table(self):
+        scaled = mms.scale_lib_text(_TABLE_LIB, ck_insertion_ps=150.0)
+        self.assertIn('values ("0.15, 0.15", "0.15, 0.15");', scaled)
+
+    def test_non_numeric_table_untouched(self):
+        scaled = mms.scale_lib_text(_TABLE_LIB, timing_scale=2.0)
+        self.assertIn('values ("a, b");', scaled)
+
+    def test_precision(self):
+        scaled = mms.scale_lib_text(_TABLE_LIB, timing_scale=1 / 3, precision=3)
+        self.assertIn('values ("0.0333, 0.0667, 0.133", ', scaled)
+
+    def test_template_and_batch_match_scale_lib_text(self):
+        corners = {
+            "post": dict(timing_scale=0.7, ck_insertion_ps=220.0),
+            "pre": dict(timing_scale=0.7, ck_insertion_ps=0.0, power_scale=2.0),
+        }
+        texts = {"tbl": _TABLE_LIB, "fir": _firtool_sram_lib(ck_path_value=0.3)}
+        batch = mms.scale_lib_batch(texts, corners)
+        self.assertEqual(len(batch), 4)
+        for key, text in texts.items():
+            template = mms.ScaledLibTemplate(text)
+            for corner, kwargs in corners.items():
+                expected = mms.scale_lib_text(text, **kwargs)
+                self.assertEqual(batch[key, corner], expected)
+                self.assertEqual(template.render(**kwargs), expected)
+        # Rendering leaves the template reusable.
+        template = mms.ScaledLibTemplate(_TABLE_LIB)
+        template.render(timing_scale=5.0)
+        self.assertEqual(template.render(), mms.scale_lib_text(_TABLE_LIB))
+
 
 # ---------------------------------------------------------------------------
 # End-to-end
@@ -588,6 +675,148 @@ class TestScaleReference(unittest.TestCase):
         )
 
 
+_BLOCK_LEF = textwrap.dedent(
+    """\
+    VERSION 5.8 ;
+    PROPERTYDEFINITIONS
+      MACRO kind STRING ;
+    END PROPERTYDEFINITIONS
+
+    MACRO block
+      CLASS BLOCK ;
+      FOREIGN block 0 0 ;
+      ORIGIN 0 0 ;
+      SIZE 20.5 BY 10.25 ;
+      SYMMETRY X Y ;
+      PROPERTY kind "hard block" ;
+      PIN din # a comment
+        DIRECTION INPUT ;
+        USE SIGNAL ;
+        ANTENNAGATEAREA 0.05 LAYER M4 ;
+        PORT
+          LAYER M4 ; RECT 1 1 1.1 1.1 ;
+        END
+      END din
+      PIN dout
+        DIRECTION OUTPUT ;
+        SHAPE ABUTMENT ;
+        PORT
+          LAYER M4 ; RECT 2 2 2.1 2.1 ;
+        END
+        PORT
+          LAYER M5 ; RECT 3 3 3.1 3.1 ;
+        END
+      END dout
+      PIN ck
+        DIRECTION INPUT ;
+        USE CLOCK ;
+        PORT
+          LAYER M5 ; RECT 4 4 4.1 4.1 ;
+        END
+      END ck
+      PIN VDD
+        DIRECTION INOUT ;
+        USE POWER ;
+        PORT
+          LAYER M4 ; RECT 0 5 20.5 5.048 ; RECT 0 8 20.5 8.048 ;
+        END
+      END VDD
+      OBS
+        LAYER M4 ; RECT 0.1 0.1 20.4 10.1 ;
+      END
+      DENSITY
+        LAYER M4 ;
+          RECT 0 0 20.5 10.25 40.0 ;
+      END
+    END block
+
+    END LIBRARY
+    """
+)
+
+
+class TestLefModel(unittest.TestCase):
+    def test_parse_and_format_round_trip(self):
+        lef = mms.parse_lef(_BLOCK_LEF)
+        self.assertTrue(lef.header.startswith("VERSION 5.8"))
+        self.assertIn("MACRO kind STRING", lef.header)
+        self.assertEqual(lef.trailer, "END LIBRARY\n")
+        (macro,) = lef.macros
+        self.assertEqual((macro.width, macro.height), (20.5, 10.25))
+        self.assertIn('PROPERTY kind "hard block"', macro.statements)
+        pins = {pin.name: pin for pin in macro.pins}
+        self.assertEqual(pins["dout"].statements, ["SHAPE ABUTMENT"])
+        self.assertEqual(len(pins["dout"].ports), 2)
+        self.assertEqual(macro.density, ["LAYER M4", "RECT 0 0 20.5 10.25 40.0"])
+        self.assertEqual(pins["ck"].use, "CLOCK")
+        self.assertEqual(
+            pins["VDD"].ports,
+            [["LAYER M4", "RECT 0 5 20.5 5.048", "RECT 0 8 20.5 8.048"]],
+        )
+        text = mms.format_lef(lef)
+        again = mms.parse_lef(text)
+        self.assertEqual((again.macros, again.trailer), (lef.macros, lef.trailer))
+        self.assertTrue(text.endswith("END block\n\nEND LIBRARY\n"))
+
+    def test_statements_between_macros_round_trip(self):
+        site = "SITE core\n  CLASS CORE ;\n  SIZE 0.054 BY 0.27 ;\nEND core\n\n"
+        second = _BLOCK_LEF[_BLOCK_LEF.index("MACRO block") :].replace("block", "other")
+        text = _BLOCK_LEF.replace("END LIBRARY\n", site + second)
+        lef = mms.parse_lef(text)
+        self.assertEqual([macro.name for macro in lef.macros], ["block", "other"])
+        self.assertEqual(
+            lef.between,
+            {"block": "SITE core CLASS CORE ; SIZE 0.054 BY 0.27 ; END core\n"},
+        )
+        self.assertEqual(lef.trailer, "END LIBRARY\n")
+        again = mms.parse_lef(mms.format_lef(lef))
+        self.assertEqual(
+            (again.macros, again.between, again.trailer),
+            (lef.macros, lef.between, lef.trailer),
+        )
+        self.assertIn("SITE core", mms.repin_lef(text))
+
+    def test_malformed_macro_raises(self):
+        with self.assertRaisesRegex(ValueError, "MACRO block"):
+            mms.parse_lef(_BLOCK_LEF.replace("  END din\n", ""))
+
+    def test_repin_hard_macro(self):
+        text = mms.repin_lef(_BLOCK_LEF, height=12.0)
+        (macro,) = mms.parse_lef(text).macros
+        self.assertEqual(macro.size, ("20.5", "12.000"))
+        self.assertIn("FOREIGN block 0 0", macro.statements)
+        self.assertEqual(macro.obs, ["LAYER M4", "RECT 0.1 0.1 20.4 10.1"])
+        self.assertEqual(macro.density, ["LAYER M4", "RECT 0 0 20.5 10.25 40.0"])
+        pins = {pin.name: pin for pin in macro.pins}
+        # Re-placed pins keep their own statements.
+        self.assertEqual(pins["din"].use, "SIGNAL")
+        self.assertEqual(pins["din"].statements, ["ANTENNAGATEAREA 0.05 LAYER M4"])
+        self.assertEqual(pins["dout"].statements, ["SHAPE ABUTMENT"])
+        self.assertEqual(pins["ck"].use, "CLOCK")
+        self.assertEqual(
+            pins["VDD"].ports,
+            mms.parse_lef(_BLOCK_LEF).macros[0].pins[3].ports,
+        )
+
+        def rect(name):
+            return [float(v) for v in pins[name].ports[0][1].split()[1:]]
+
+        self.assertEqual(rect("din")[0], 0.0)
+        self.assertAlmostEqual(rect("dout")[2], 20.5, places=3)
+        self.assertEqual(pins["dout"].ports[0][0], "LAYER M4")
+        self.assertAlmostEqual(rect("ck")[3], 12.0, places=3)
+        self.assertEqual(pins["ck"].ports[0][0], "LAYER M5")
+
+    def test_bus_bits_share_their_edge(self):
+        edges = mms._memory_pin_edges(
+            ["R0_data[1]", "R0_data[0]", "R0_addr[0]", "R0_clk", "VSS"]
+        )
+        self.assertEqual(edges["output"], ["R0_data[0]", "R0_data[1]"])
+        self.assertEqual(edges["input"], ["R0_addr[0]"])
+        self.assertEqual(edges["clock"], ["R0_clk"])
+        self.assertEqual(edges["power"], ["VSS"])
+
+
 # ---------------------------------------------------------------------------
 # CLI shim
 # ---------------------------------------------------------------------------
@@ -848,6 +1077,104 @@ class TestVerilogScanner(unittest.TestCase):
         self.assertEqual(r.bits, 32)
 
 
+class TestScaleCorners(unittest.TestCase):
+    def setUp(self):
+        self.ss = _firtool_sram_lib("tiny_128x64", nRW=1, rows=128, bits=64)
+        # A faster corner of the same macro: every table at 0.6x.
+        self.ff = mms.scale_lib_text(self.ss, timing_scale=0.6)
+        self.lef = _tiny_lef("tiny_128x64", ["clk", "RW0_addr", "RW0_rdata"])
+
+    def test_reference_corner_matches_scale_reference(self):
+        with mock.patch.object(mms, "classify", wraps=mms.classify) as classify:
+            scaled, lef, role, bucket, _ = mms.scale_corners(
+                corner_libs={"ss": self.ss, "ff": self.ff}, lef_text=self.lef
+            )
+        self.assertEqual(classify.call_count, 1)
+        post, pre, ref_lef, ref_role, ref_bucket, _ = mms.scale_reference(
+            lib_post_cts_text=self.ss, lef_text=self.lef, emit_pre_layout=True
+        )
+        self.assertEqual(scaled["ss"], (post, pre))
+        self.assertEqual((lef, role), (ref_lef, ref_role))
+        self.assertEqual(bucket["area_um2"], ref_bucket["area_um2"])
+
+    def test_corners_share_the_reference_timing_scale(self):
+        scaling = mms.MacroScaling(self.ss)
+        scaled, *_ = mms.scale_corners(
+            corner_libs={"ss": self.ss, "ff": self.ff}, lef_text=self.lef
+        )
+        ff_clock_tree_s = mms.clock_tree_insertion_s([self.ff])
+        self.assertEqual(
+            scaled["ff"][0],
+            mms.scale_lib_text(self.ff, **scaling.post_cts_kwargs(ff_clock_tree_s)),
+        )
+        self.assertNotEqual(scaled["ff"][0], scaled["ss"][0])
+        ff_first, *_ = mms.scale_corners(
+            corner_libs={"ss": self.ss, "ff": self.ff},
+            lef_text=self.lef,
+            reference_corner="ff",
+        )
+        self.assertNotEqual(ff_first["ff"], scaled["ff"])
+
+    def test_clock_insertion_keeps_the_corner_spread(self):
+        libs = {
+            corner: _firtool_sram_lib(
+                "tiny_128x64", nRW=1, rows=128, bits=64, ck_path_value=ck
+            )
+            for corner, ck in (("tt", 0.3), ("ss", 0.4), ("ff", 0.2))
+        }
+        scaled, _, _, bucket, _ = mms.scale_corners(
+            corner_libs=libs, lef_text=self.lef, reference_corner="tt"
+        )
+        insertion = {
+            corner: mms.clock_tree_insertion_s([post]) * 1e12
+            for corner, (post, _) in scaled.items()
+        }
+        self.assertAlmostEqual(
+            insertion["tt"], bucket["post_cts_ck_insertion_ps"], places=3
+        )
+        self.assertGreater(insertion["ss"], insertion["tt"])
+        self.assertGreater(insertion["tt"], insertion["ff"])
+        self.assertAlmostEqual(insertion["ss"] / insertion["tt"], 0.4 / 0.3, places=5)
+
+    def test_bad_reference_corner(self):
+        with self.assertRaisesRegex(ValueError, "reference corner"):
+            mms.scale_corners(
+                corner_libs={"ss": self.ss}, lef_text=self.lef, reference_corner="tt"
+            )
+
+    def test_cli_streams_every_corner(self):
+        with tempfile.TemporaryDirectory() as d:
+            d = Path(d)
+            (d / "ss.lib").write_text(self.ss)
+            with gzip.open(d / "ff.lib.gz", "wt") as f:
+                f.write(self.ff)
+            (d / "in.lef").write_text(self.lef)
+            rc = mms.main(
+                [
+                    "--in-corner-lib",
+                    f"ss={d / 'ss.lib'}",
+                    "--in-corner-lib",
+                    f"ff={d / 'ff.lib.gz'}",
+                    "--in-lef",
+                    str(d / "in.lef"),
+                    "--out-dir",
+                    str(d / "out"),
+                    "--out-lef",
+                    str(d / "out.lef"),
+                ]
+            )
+            self.assertEqual(rc, 0)
+            scaled, lef, *_ = mms.scale_corners(
+                corner_libs={"ss": self.ss, "ff": self.ff}, lef_text=self.lef
+            )
+            for corner, (post, pre) in scaled.items():
+                self.assertEqual((d / "out" / f"{corner}.lib").read_text(), post)
+                self.assertEqual(
+                    (d / "out" / f"{corner}_pre_layout.lib").read_text(), pre
+                )
+            self.assertEqual((d / "out.lef").read_text(), lef)
+
+
 class TestCli(unittest.TestCase):
     def test_dry_run_on_non_memory(self):
         with tempfile.TemporaryDirectory() as d:
@@ -1307,5 +1634,278 @@ class TestBehavioralMacrosReadMode(unittest.TestCase):
             self.assertNotRegex(q_block, r"timing_type\s*:\s*combinational")
 
 
+def _firtool_sram_sv(name, addr_bits, bits, mask_bits, sync=True):
+    read = (
+        "  always @(posedge R0_clk) R0_data <= Memory[R0_addr];\n"
+        if sync
+        else "  assign R0_data = Memory[R0_addr];\n"
+    )
+    return (
+        f"module {name}(\n"
+        f"  input         R0_clk,\n"
+        f"  input  [{addr_bits - 1}:0]  R0_addr,\n"
+        f"  input         R0_en,\n"
+        f"  output [{bits - 1}:0]  R0_data,\n"
+        f"  input  [{addr_bits - 1}:0]  W0_addr,\n"
+        f"  input         W0_en,\n"
+        f"  input  [{bits - 1}:0]  W0_data,\n"
+        f"  input  [{mask_bits - 1}:0]  W0_mask,\n"
+        f"  input         W0_clk\n"
+        f");\n"
+        f"  reg [{bits - 1}:0] Memory [{(1 << addr_bits) - 1}:0];\n"
+        f"{read}"
+        f"endmodule\n"
+    )
+
+
+class TestAbstractsFromVerilogShapes(unittest.TestCase):
+    """Per-shape generation must match generating every module directly."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.d = Path(tmp.name)
+        self.sv = self.d / "mems.sv"
+        self.sv.write_text(
+            _firtool_sram_sv("mem_a", 6, 32, 32)
+            + _firtool_sram_sv("mem_b", 6, 32, 32)
+            + _firtool_sram_sv("mem_c", 6, 32, 4)
+            + _firtool_sram_sv("mem_d", 6, 32, 32, sync=False)
+            + _firtool_sram_sv("mem_e", 8, 64, 64)
+            + "module regs_16x8(input clk);\nendmodule\n"
+        )
+
+    def _generate(self, out, **kwargs):
+        return mms.generate_abstracts_from_verilog(
+            verilog_paths=[self.sv], out_dir=self.d / out, tech_nm=7, **kwargs
+        )
+
+    def test_matches_per_module_generation(self):
+        roles = self._generate("out")
+        self.assertEqual(len(roles), 6)
+        self.assertEqual(len({mms._shape_key(r) for r in roles.values()}), 5)
+        for name, role in roles.items():
+            lib = mms.generate_lib(role, tech_nm=7)
+            pre = mms.scale_lib_text(lib, timing_scale=1.0, ck_insertion_ps=0.0)
+            lef = mms.generate_lef(role, tech_nm=7)
+            out = self.d / "out"
+            self.assertEqual((out / f"{name}.lib").read_text(), lib)
+            self.assertEqual((out / f"{name}_pre_layout.lib").read_text(), pre)
+            self.assertEqual((out / f"{name}.lef").read_text(), lef)
+
+    def test_parallel_matches_serial(self):
+        self._generate("serial")
+        self._generate("parallel", jobs=2)
+        for path in sorted((self.d / "serial").iterdir()):
+            self.assertEqual(
+                path.read_text(), (self.d / "parallel" / path.name).read_text()
+            )
+
+    def test_cache_generates_only_new_shapes(self):
+        cache = self.d / "cache"
+        calls = []
+        real = mms._shape_texts
+
+        def counting(role, tech_nm):
+            calls.append(mms._shape_key(role))
+            return real(role, tech_nm)
+
+        with mock.patch.object(mms, "_shape_texts", counting):
+            self._generate("first", cache_dir=cache)
+            self.assertEqual(len(calls), 5)
+            self.assertEqual(len(list(cache.glob("*.json"))), 5)
+            self._generate("second", cache_dir=cache)
+            self.assertEqual(len(calls), 5)
+            self.sv.write_text(self.sv.read_text() + _firtool_sram_sv("f", 4, 8, 8))
+            self._generate("third", cache_dir=cache)
+            self.assertEqual(len(calls), 6)
+        self.assertEqual(
+            (self.d / "first" / "mem_b.lib").read_text(),
+            (self.d / "second" / "mem_b.lib").read_text(),
+        )
+        # A corrupt entry is regenerated rather than trusted.
+        for entry in cache.glob("*.json"):
+            entry.write_text("{")
+        self._generate("fourth", cache_dir=cache)
+        self.assertEqual(
+            (self.d / "first" / "mem_e.lef").read_text(),
+            (self.d / "fourth" / "mem_e.lef").read_text(),
+        )
+
+    def test_model_hash_covers_liberty(self):
+        before = mms._model_hash()
+        changed = self.d / "liberty.py"
+        changed.write_text("# a different parser\n")
+        with mock.patch.object(mms, "_MODEL_HASH", None), mock.patch.object(
+            mms.liberty, "__file__", str(changed)
+        ):
+            self.assertNotEqual(mms._model_hash(), before)
+
+
+class TestScanVerilogFiles(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.d = Path(tmp.name)
+        logic = "module Logic_%d(\n  input clk,\n  output [3:0] q\n);\nendmodule\n"
+        parts = []
+        for i in range(40):
+            parts.append(logic % i)
+            parts.append(_firtool_sram_sv(f"mem_{i}", 4 + i % 3, 8, 8, sync=i % 2))
+        parts.append("module regs_16x8(input clk);\nendmodule\n")
+        self.text = "".join(parts)
+        (self.d / "src").mkdir()
+        (self.d / "src" / "big.sv").write_text(self.text)
+        (self.d / "src" / "extra.v").write_text(_firtool_sram_sv("mem_v", 4, 8, 8))
+        (self.d / "src" / "empty.sv").write_text("")
+
+    def test_shards_and_processes_match_text_scan(self):
+        expected = mms.scan_verilog_for_memories(self.text)
+        self.assertEqual(len(expected), 41)
+        big = self.d / "src" / "big.sv"
+        self.assertGreater(len(mms._shards(big, 1000)), 5)
+        for jobs in (1, 2):
+            timings = {}
+            roles = mms.scan_verilog_files(
+                [big], jobs=jobs, timings=timings, shard_bytes=1000
+            )
+            self.assertEqual(roles, expected)
+            self.assertEqual(list(timings), [str(big)])
+
+    def test_directory_scan(self):
+        timings = {}
+        roles = mms.scan_verilog_files([self.d / "src"], timings=timings)
+        self.assertEqual(len(roles), 42)
+        self.assertEqual(roles["mem_v"].rows, 16)
+        self.assertEqual(roles["regs_16x8"].kind, "flop_memory")
+        self.assertEqual(
+            sorted(Path(p).name for p in timings), ["big.sv", "empty.sv", "extra.v"]
+        )
+
+
+class TestPredictBatch(unittest.TestCase):
+    def test_matches_predict_idiomatic(self):
+        shapes = [
+            (rows, bits, ports, kind)
+            for rows in (16, 256, 4096)
+            for bits in (8, 64, 300)
+            for ports in ("1RW", "1R1W", "2R1W")
+            for kind in ("sram", "ff")
+        ]
+        batch = mms.predict_batch(*zip(*shapes))
+        for i, (rows, bits, ports, kind) in enumerate(shapes):
+            nR, nW, nRW = mms._ports_from_key(ports)
+            role = mms.MemoryRole(
+                kind="sram" if kind == "sram" else "flop_memory",
+                rows=rows,
+                bits=bits,
+                nR=nR,
+                nW=nW,
+                nRW=nRW,
+            )
+            bucket, warning = mms.predict_idiomatic(role)
+            self.assertEqual(batch["num_banks"][i], bucket["bank_plan"].num_banks)
+            self.assertEqual(batch["warning"][i], warning)
+            for column in mms.BATCH_COLUMNS[:-3]:
+                self.assertEqual(batch[column][i], bucket.get(column), column)
+
+    def test_scalars_broadcast(self):
+        batch = mms.predict_batch([64, 128], 32, "1RW", "sram", tech_nm=45)
+        self.assertEqual(len(batch["area_um2"]), 2)
+        self.assertLess(batch["area_um2"][0], batch["area_um2"][1])
+        self.assertEqual(mms.predict_batch([], 32, "1RW", "sram")["area_um2"], [])
+
+    def test_bad_input(self):
+        with self.assertRaisesRegex(ValueError, "length"):
+            mms.predict_batch([64, 128], [32], "1RW", "sram")
+        with self.assertRaisesRegex(ValueError, "ports_key"):
+            mms.predict_batch(64, 32, "3X", "sram")
+        with self.assertRaisesRegex(ValueError, "kind"):
+            mms.predict_batch(64, 32, "1RW", "dram")
+
+
+class TestFitCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.d = Path(tmp.name)
+        self.sweep = self.d / "sweep.yaml"
+        self.sweep.write_text(
+            textwrap.dedent(
+                """\
+                runs:
+                  - {tech_nm: 7, rows: 64, bits: 16, ports_key: 1RW,
+                     kind: sram, area_um2: 80.0, access_time_ps: 40.0}
+                """
+            )
+        )
+
+    def test_fit_is_reused_until_the_sweep_changes(self):
+        builtin = mms.MEMORY_DATA_POINTS[:5]
+        cache = self.d / "cache"
+        points, fit = mms._load_model(self.sweep, builtin, cache)
+        if mms.importlib.util.find_spec("yaml"):
+            self.assertEqual(points[-1], (7, 64, 16, "1RW", "sram", 80.0, 40.0))
+        self.assertEqual(len(list(cache.glob("fit-*.json"))), 1)
+        with mock.patch.object(
+            mms, "_load_sweep_yaml", side_effect=AssertionError("refit")
+        ):
+            self.assertEqual(mms._load_model(self.sweep, builtin, cache), (points, fit))
+            self.sweep.write_text("runs: []\n")
+            with self.assertRaisesRegex(AssertionError, "refit"):
+                mms._load_model(self.sweep, builtin, cache)
+
+    def test_code_change_refits(self):
+        builtin = mms.MEMORY_DATA_POINTS[:5]
+        cache = self.d / "cache"
+        mms._load_model(self.sweep, builtin, cache)
+        changed = self.d / "changed.py"
+        changed.write_text("# a different fit\n")
+        with mock.patch.object(mms, "__file__", str(changed)), mock.patch.object(
+            mms, "_load_sweep_yaml", side_effect=AssertionError("refit")
+        ):
+            with self.assertRaisesRegex(AssertionError, "refit"):
+                mms._load_model(self.sweep, builtin, cache)
+
+    def test_cache_is_opt_in(self):
+        with mock.patch.dict("os.environ", clear=True):
+            self.assertIsNone(mms._fit_cache_dir())
+        env = {"MEMORY_MACRO_SCALER_CACHE_DIR": str(self.d)}
+        with mock.patch.dict("os.environ", env):
+            self.assertEqual(mms._fit_cache_dir(), self.d)
+
+    def test_committed_fit_matches_sweep(self):
+        entry = json.loads(mms._FIT_JSON.read_text())
+        key = mms._fit_key(mms._SWEEP_YAML.read_bytes(), mms._BUILTIN_DATA_POINTS)
+        self.assertEqual(
+            entry["key"],
+            key,
+            f"{mms._FIT_JSON.name} is stale; run memory_macro_scaler.py --pin-fit",
+        )
+        self.assertEqual(
+            mms._model_from_json(entry), (mms.MEMORY_DATA_POINTS, mms._AREA_FIT)
+        )
+
+    def test_fit_artifact_is_used_while_current(self):
+        builtin = mms.MEMORY_DATA_POINTS[:5]
+        fit_json = self.d / "sweep.fit.json"
+        mms._pin_fit(self.sweep, builtin, fit_json)
+        pinned = mms._model_from_json(json.loads(fit_json.read_text()))
+        with mock.patch.object(
+            mms, "_load_sweep_yaml", side_effect=AssertionError("refit")
+        ):
+            self.assertEqual(
+                mms._load_model(self.sweep, builtin, None, fit_json), pinned
+            )
+            self.sweep.write_text("runs: []\n")
+            with self.assertRaisesRegex(AssertionError, "refit"):
+                mms._load_model(self.sweep, builtin, None, fit_json)
+
+    def test_no_cache_dir(self):
+        builtin = mms.MEMORY_DATA_POINTS[:5]
+        points, fit = mms._load_model(self.sweep, builtin, None)
+        self.assertEqual(fit, mms._fit_area_model(points))
+
+
 if __name__ == "__main__":
     unittest.main()
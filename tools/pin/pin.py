@@ -2,13 +2,14 @@
 
 import argparse
 import hashlib
+import json
 import os
 import shutil
 import subprocess
-import tarfile
 import tempfile
 import typing
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 class Label(typing.NamedTuple):
@@ -135,20 +136,185 @@ def https(bucket, path):
     )
 
 
-def reset(tarinfo):
-    tarinfo.mtime = 0
-    tarinfo.uid = 0
-    tarinfo.uname = "root"
-    tarinfo.gid = 0
-    tarinfo.gname = "root"
-    return tarinfo
+class GcsStore:
+    """Content-addressed blobs in a Google cloud bucket."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def existing(self, prefix):
+        """Names of the blobs already under prefix."""
+        result = subprocess.run(
+            ["gcloud", "storage", "ls", gs(self.bucket, prefix + "/")],
+            capture_output=True,
+            text=True,
+        )
+        # ls fails when nothing matches the prefix yet; uploads are
+        # no-clobber and verified afterwards, so an empty guess is safe.
+        if result.returncode:
+            return set()
+        return {line.rsplit("/", 1)[-1] for line in result.stdout.split()}
+
+    def upload(self, src, name):
+        subprocess.run(
+            ["gcloud", "storage", "cp", "-n", "-Z", src, gs(self.bucket, name)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def url(self, name):
+        return https(self.bucket, name)
+
+
+class LocalStore:
+    """Content-addressed blobs in a local directory, e.g. to stand in for
+    the bucket in tests; lock files then point at file:// URLs."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def existing(self, prefix):
+        try:
+            return set(os.listdir(os.path.join(self.root, prefix)))
+        except FileNotFoundError:
+            return set()
+
+    def upload(self, src, name):
+        dst = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = "{}.{}.tmp".format(dst, os.getpid())
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def url(self, name):
+        return Path(self.root, name).as_uri()
+
+
+def store(spec):
+    """GcsStore for a bucket name or gs:// URL, LocalStore for a
+    directory or file:// URL."""
+    parsed = urllib.parse.urlparse(spec)
+    if parsed.scheme == "gs":
+        return GcsStore(parsed.netloc)
+    if parsed.scheme == "file":
+        return LocalStore(urllib.parse.unquote(parsed.path))
+    if os.sep in spec or spec.startswith("."):
+        return LocalStore(spec)
+    return GcsStore(spec)
+
+
+class Blob(typing.NamedTuple):
+    src: str
+    sha256: str
+    executable: bool
+
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def expand_dirs(archive_path, src):
+    """Yield (archive path, source path) for src, or for every file under
+    it when src is a directory (a tree artifact), following symlinks like
+    tar's dereference=True."""
+    if not os.path.isdir(src):
+        yield archive_path, src
+        return
+    for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+        dirnames.sort()
+        rel = os.path.relpath(dirpath, src)
+        for name in sorted(filenames):
+            yield (
+                os.path.normpath(os.path.join(archive_path, rel, name)),
+                os.path.join(dirpath, name),
+            )
+
+
+def hash_files(paths, jobs):
+    """{archive path: Blob} for {archive path: source path}, hashed in
+    parallel."""
+    names = sorted(paths)
+    with ThreadPoolExecutor(jobs) as pool:
+        digests = pool.map(digest, [paths[name] for name in names])
+        return {
+            name: Blob(
+                src=paths[name],
+                sha256=sha256,
+                executable=bool(os.stat(paths[name]).st_mode & 0o111),
+            )
+            for name, sha256 in zip(names, digests)
+        }
+
+
+def upload_missing(store, prefix, blobs, jobs):
+    """Upload the blobs whose digest is not in the store yet, at most jobs
+    at a time, and return how many were uploaded.
+
+    A failed upload must never yield a lock file pointing at a missing
+    object: every upload is checked, and the store is listed again to
+    prove all blobs are present before the lock is written.
+    """
+    missing = {}
+    existing = store.existing(prefix)
+    for blob in blobs.values():
+        if blob.sha256 not in existing:
+            missing.setdefault(blob.sha256, blob.src)
+    with ThreadPoolExecutor(jobs) as pool:
+        list(
+            pool.map(
+                lambda item: store.upload(item[1], prefix + "/" + item[0]),
+                sorted(missing.items()),
+            )
+        )
+    absent = {blob.sha256 for blob in blobs.values()} - store.existing(prefix)
+    if absent:
+        raise RuntimeError(
+            "Blobs missing from the store after upload: {}".format(
+                ", ".join(sorted(absent))
+            )
+        )
+    return len(missing)
+
+
+def write_lock(lock_path, store, prefix, blobs):
+    """Write the manifest lock file: one entry per file with its URL and
+    sha256, read by the pin module extension."""
+    manifest = {
+        "version": 2,
+        "files": {
+            name: {
+                "executable": blob.executable,
+                "sha256": blob.sha256,
+                "url": store.url(prefix + "/" + blob.sha256),
+            }
+            for name, blob in sorted(blobs.items())
+        },
+    }
+    with open(lock_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-b", "--bucket", help="Google cloud bucket used for uploads.")
+    parser.add_argument(
+        "-s",
+        "--store",
+        default=os.environ.get("PIN_STORE"),
+        help="Blob store overriding --bucket: a bucket, gs:// URL, directory "
+        "or file:// URL. Defaults to $PIN_STORE.",
+    )
     parser.add_argument("-l", "--lock", help="Lock file.")
     parser.add_argument("-p", "--package", help="Bazel package.")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=8,
+        help="Concurrent hashes and uploads.",
+    )
     parser.add_argument("artifact", action=ArtifactAction, nargs="+")
 
     args = parser.parse_args()
@@ -159,52 +325,33 @@ def main():
 
     path = tempfile.mkdtemp()
     try:
-        tar_path = os.path.join(path, args.lock + ".tar")
-        with tarfile.open(tar_path, "w", dereference=True) as tar:
-            for pkg, artifacts in pkgs.items():
-                pkg_build_path = os.path.join(pkg, "BUILD")
-                build_path = os.path.join(path, pkg_build_path)
-                os.makedirs(os.path.dirname(build_path), exist_ok=True)
-
-                with open(build_path, "w") as build:
-                    build_write(artifacts, build)
-
-                tar.add(build_path, arcname=pkg_build_path, filter=reset)
-                for file in sorted(
-                    frozenset.union(*[artifact.files for artifact in artifacts])
-                ):
-                    tar.add(
-                        file.runfile_path(), arcname=file.archive_path(), filter=reset
-                    )
-
-        with open(tar_path, "rb") as f:
-            sha256 = hashlib.file_digest(f, "sha256")
-
-        dir, _ = os.path.splitext(args.lock)
-        name = os.path.join(args.package, dir, sha256.hexdigest() + ".tar")
-        # A failed upload must never yield a lock file pointing at a
-        # missing object: check=True makes the mv fatal, and the stat
-        # proves the object is actually fetchable before the lock is
-        # written. A no-clobber (-n) skip of an already-present object
-        # still exits 0, so legitimate content-addressed re-pins pass.
-        subprocess.run(
-            ["gcloud", "storage", "mv", "-n", "-Z", tar_path, gs(args.bucket, name)],
-            check=True,
-        )
-        subprocess.run(
-            ["gcloud", "storage", "objects", "describe", gs(args.bucket, name)],
-            check=True,
-        )
-
-        with open(
+        paths = {}
+        for pkg, artifacts in pkgs.items():
+            pkg_build_path = os.path.join(pkg, "BUILD")
+            build_path = os.path.join(path, pkg_build_path)
+            os.makedirs(os.path.dirname(build_path), exist_ok=True)
+
+            with open(build_path, "w") as build:
+                build_write(artifacts, build)
+
+            paths[pkg_build_path] = build_path
+            for file in frozenset.union(*[artifact.files for artifact in artifacts]):
+                paths.update(expand_dirs(file.archive_path(), file.runfile_path()))
+
+        blobs = hash_files(paths, args.jobs)
+        blob_store = store(args.store or args.bucket)
+        prefix = os.path.join(args.package, "blobs", "sha256")
+        uploaded = upload_missing(blob_store, prefix, blobs, args.jobs)
+        print("Pinned {} files, uploaded {} new blobs".format(len(blobs), uploaded))
+
+        write_lock(
             os.path.join(
                 os.environ["BUILD_WORKSPACE_DIRECTORY"], args.package, args.lock
             ),
-            "w",
-        ) as f:
-            f.write(https(args.bucket, name))
-            f.write("@")
-            f.write(sha256.hexdigest())
+            blob_store,
+            prefix,
+            blobs,
+        )
 
     finally:
         shutil.rmtree(path)
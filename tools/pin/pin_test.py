@@ -0,0 +1,149 @@
+"""Unit tests for pin.py content-addressed uploads."""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pin
+
+
+class CountingStore(pin.LocalStore):
+    """LocalStore that records uploads and peak concurrency."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.uploads = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def upload(self, src, name):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.uploads.append(name)
+        try:
+            super().upload(src, name)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class PinTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.runfiles = self.tmp / "runfiles"
+        (self.runfiles / "pkg").mkdir(parents=True)
+        (self.runfiles / "pkg" / "a.odb").write_bytes(b"a")
+        (self.runfiles / "pkg" / "b.odb").write_bytes(b"b")
+        (self.runfiles / "pkg" / "copy.odb").write_bytes(b"a")
+        self.workspace = self.tmp / "ws"
+        (self.workspace / "pkg").mkdir(parents=True)
+        self.store_dir = self.tmp / "store"
+
+    def _pin(self, *names):
+        files = ":".join("bazel-out/bin/pkg/{}@bazel-out/bin@".format(n) for n in names)
+        argv = [
+            "pin.py",
+            "--store",
+            str(self.store_dir),
+            "--lock",
+            "artifacts_lock.txt",
+            "--package",
+            "pkg",
+            "//pkg:slow,,{}".format(files),
+        ]
+        env = {
+            "RUNFILES": str(self.runfiles / "bazel-out" / "bin"),
+            "BUILD_WORKSPACE_DIRECTORY": str(self.workspace),
+        }
+        (self.runfiles / "bazel-out" / "bin").mkdir(parents=True, exist_ok=True)
+        for n in names:
+            link = self.runfiles / "bazel-out" / "bin" / "pkg" / n
+            link.parent.mkdir(exist_ok=True)
+            if not link.exists():
+                link.symlink_to(self.runfiles / "pkg" / n)
+        with mock.patch.object(sys, "argv", argv), mock.patch.dict(os.environ, env):
+            pin.main()
+        with open(self.workspace / "pkg" / "artifacts_lock.txt") as f:
+            return json.load(f)
+
+    def test_lock_is_a_manifest_of_blobs(self):
+        lock = self._pin("a.odb", "copy.odb")
+        self.assertEqual(lock["version"], 2)
+        self.assertEqual(
+            sorted(lock["files"]), ["pkg/BUILD", "pkg/a.odb", "pkg/copy.odb"]
+        )
+        a = lock["files"]["pkg/a.odb"]
+        self.assertEqual(a, lock["files"]["pkg/copy.odb"])
+        self.assertFalse(a["executable"])
+        blob = self.store_dir / "pkg" / "blobs" / "sha256" / a["sha256"]
+        self.assertEqual(a["url"], blob.as_uri())
+        self.assertEqual(blob.read_bytes(), b"a")
+
+    def test_directory_artifact_is_pinned_per_file(self):
+        tree = self.runfiles / "pkg" / "macros"
+        (tree / "sub").mkdir(parents=True)
+        (tree / "x.lef").write_bytes(b"x")
+        (tree / "sub" / "y.lib").write_bytes(b"y")
+        lock = self._pin("a.odb", "macros")
+        self.assertEqual(
+            sorted(lock["files"]),
+            ["pkg/BUILD", "pkg/a.odb", "pkg/macros/sub/y.lib", "pkg/macros/x.lef"],
+        )
+        blob = lock["files"]["pkg/macros/sub/y.lib"]["sha256"]
+        path = self.store_dir / "pkg" / "blobs" / "sha256" / blob
+        self.assertEqual(path.read_bytes(), b"y")
+
+    def test_repin_uploads_only_new_blobs(self):
+        self._pin("a.odb")
+        store = CountingStore(str(self.store_dir))
+        blobs = pin.hash_files(
+            {
+                "pkg/a.odb": str(self.runfiles / "pkg" / "a.odb"),
+                "pkg/b.odb": str(self.runfiles / "pkg" / "b.odb"),
+                "pkg/copy.odb": str(self.runfiles / "pkg" / "copy.odb"),
+            },
+            jobs=2,
+        )
+        prefix = "pkg/blobs/sha256"
+        self.assertEqual(pin.upload_missing(store, prefix, blobs, jobs=2), 1)
+        self.assertEqual(store.uploads, [prefix + "/" + blobs["pkg/b.odb"].sha256])
+        self.assertEqual(pin.upload_missing(store, prefix, blobs, jobs=2), 0)
+
+    def test_concurrency_is_bounded(self):
+        store = CountingStore(str(self.store_dir))
+        paths = {}
+        for i in range(20):
+            path = self.tmp / "f{}".format(i)
+            path.write_bytes(str(i).encode())
+            paths["pkg/f{}".format(i)] = str(path)
+        blobs = pin.hash_files(paths, jobs=4)
+        self.assertEqual(pin.upload_missing(store, "p", blobs, jobs=3), 20)
+        self.assertLessEqual(store.peak, 3)
+
+    def test_missing_after_upload_is_fatal(self):
+        class LossyStore(pin.LocalStore):
+            def upload(self, src, name):
+                pass
+
+        blobs = pin.hash_files({"pkg/a.odb": str(self.runfiles / "pkg" / "a.odb")}, 1)
+        with self.assertRaisesRegex(RuntimeError, "missing from the store"):
+            pin.upload_missing(LossyStore(str(self.store_dir)), "p", blobs, 1)
+
+    def test_store_spec(self):
+        self.assertIsInstance(pin.store("some-bucket"), pin.GcsStore)
+        self.assertEqual(pin.store("gs://some-bucket").bucket, "some-bucket")
+        self.assertEqual(pin.store("file:///tmp/blobs").root, "/tmp/blobs")
+        self.assertIsInstance(pin.store("./blobs"), pin.LocalStore)
+
+
+if __name__ == "__main__":
+    unittest.main()